@@ -9,6 +9,8 @@ class CourseModel {
   final String category;
   final int duration; // in minutes
   final int totalLessons;
+  final int freeLessons;
+  final List<String> lessonIds; // in display order, derived from lessons at seed time
   final double rating;
   final int enrolledCount;
   final String difficulty; // beginner, intermediate, advanced
@@ -27,6 +29,8 @@ class CourseModel {
     required this.category,
     required this.duration,
     required this.totalLessons,
+    this.freeLessons = 0,
+    this.lessonIds = const [],
     required this.rating,
     required this.enrolledCount,
     required this.difficulty,
@@ -47,7 +51,9 @@ class CourseModel {
       category: map['category'] ?? '',
       duration: map['duration'] ?? 0,
       totalLessons: map['totalLessons'] ?? 0,
-      rating: (map['rating'] ?? 0.0).toDouble(),
+      freeLessons: map['freeLessons'] ?? 0,
+      lessonIds: List<String>.from(map['lessonIds'] ?? []),
+      rating: _rating(map),
       enrolledCount: map['enrolledCount'] ?? 0,
       difficulty: map['difficulty'] ?? 'beginner',
       tags: List<String>.from(map['tags'] ?? []),
@@ -58,6 +64,15 @@ class CourseModel {
     );
   }
 
+  // rating is derived from the ratingTotal/ratingCount counters when a course has them
+  static double _rating(Map<String, dynamic> map) {
+    final count = (map['ratingCount'] ?? 0) as num;
+    if (count > 0) {
+      return ((map['ratingTotal'] ?? 0) as num) / count;
+    }
+    return (map['rating'] ?? 0.0).toDouble();
+  }
+
   Map<String, dynamic> toMap() {
     return {
       'id': id,
@@ -68,6 +83,8 @@ class CourseModel {
       'category': category,
       'duration': duration,
       'totalLessons': totalLessons,
+      'freeLessons': freeLessons,
+      'lessonIds': lessonIds,
       'rating': rating,
       'enrolledCount': enrolledCount,
       'difficulty': difficulty,
@@ -88,6 +105,8 @@ class CourseModel {
     String? category,
     int? duration,
     int? totalLessons,
+    int? freeLessons,
+    List<String>? lessonIds,
     double? rating,
     int? enrolledCount,
     String? difficulty,
@@ -106,6 +125,8 @@ class CourseModel {
       category: category ?? this.category,
       duration: duration ?? this.duration,
       totalLessons: totalLessons ?? this.totalLessons,
+      freeLessons: freeLessons ?? this.freeLessons,
+      lessonIds: lessonIds ?? this.lessonIds,
       rating: rating ?? this.rating,
       enrolledCount: enrolledCount ?? this.enrolledCount,
       difficulty: difficulty ?? this.difficulty,
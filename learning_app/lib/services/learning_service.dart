@@ -61,15 +61,40 @@ class LearningService {
     }
   }
 
+  // Must match search_index.py, which writes the searchTokens field
+  static const int _searchMinPrefix = 2;
+  static const int _searchMaxPrefix = 15;
+
+  static List<String> _searchTokens(String query) {
+    return query
+        .toLowerCase()
+        .split(RegExp(r'[^\p{L}\p{N}]+', unicode: true))
+        .where((word) => word.length >= _searchMinPrefix)
+        .toList();
+  }
+
   static Future<List<CourseModel>> searchCourses(String query) async {
     try {
-      final snapshot = await _firestore
+      Query coursesQuery = _firestore
           .collection(_coursesCollection)
-          .where('isPublished', isEqualTo: true)
-          .get();
+          .where('isPublished', isEqualTo: true);
+
+      // Look up the longest word in the searchTokens prefix index so only
+      // candidate courses are downloaded; the filter below still checks
+      // the full query against each candidate
+      final words = _searchTokens(query);
+      if (words.isNotEmpty) {
+        final longest = words.reduce((a, b) => b.length > a.length ? b : a);
+        final token = longest.length > _searchMaxPrefix
+            ? longest.substring(0, _searchMaxPrefix)
+            : longest;
+        coursesQuery = coursesQuery.where('searchTokens', arrayContains: token);
+      }
+
+      final snapshot = await coursesQuery.get();
 
       final courses = snapshot.docs.map((doc) {
-        final data = doc.data();
+        final data = doc.data() as Map<String, dynamic>;
         return CourseModel.fromMap({...data, 'id': doc.id});
       }).toList();
 
@@ -196,14 +221,28 @@ class LearningService {
           }).toList();
 
           // If still no questions, try 'questions' collection at same level
-          // Note: This query requires an index, so we'll only fetch questions without orderBy
+          // Ordered server-side with the quizId + order index from firestore.indexes.json;
+          // question documents need an 'order' field to be returned by this query
           if (questions.isEmpty) {
             print('Trying alternative questions collection...');
             try {
-              final altSnapshot = await _firestore
-                  .collection('questions')
-                  .where('quizId', isEqualTo: quizId)
-                  .get(); // Removed orderBy to avoid index requirement
+              QuerySnapshot<Map<String, dynamic>> altSnapshot;
+              var sortOnDevice = false;
+              try {
+                altSnapshot = await _firestore
+                    .collection('questions')
+                    .where('quizId', isEqualTo: quizId)
+                    .orderBy('order')
+                    .get();
+              } catch (e) {
+                // Index not deployed yet: fetch unordered and sort here instead
+                print('Ordered questions query failed, sorting on the device: $e');
+                altSnapshot = await _firestore
+                    .collection('questions')
+                    .where('quizId', isEqualTo: quizId)
+                    .get();
+                sortOnDevice = true;
+              }
 
               print(
                 'Alternative questions collection: ${altSnapshot.docs.length}',
@@ -214,12 +253,13 @@ class LearningService {
                 return qData;
               }).toList();
 
-              // Sort manually by order field if it exists
-              questions.sort((a, b) {
-                final orderA = a['order'] ?? 0;
-                final orderB = b['order'] ?? 0;
-                return (orderA as int).compareTo(orderB as int);
-              });
+              if (sortOnDevice) {
+                questions.sort((a, b) {
+                  final orderA = (a['order'] ?? 0) as num;
+                  final orderB = (b['order'] ?? 0) as num;
+                  return orderA.compareTo(orderB);
+                });
+              }
             } catch (e) {
               print(
                 'Failed to fetch from alternative questions collection: $e',
@@ -3,84 +3,547 @@
 Script to add sample data to Firebase Firestore using REST API
 """
 
-import requests
-import json
+import argparse
+import itertools
+import os
+import queue
+import threading
 import time
 from datetime import datetime
 
+from catalog_validation import CatalogError, print_problems, validate_catalog
+from course_aggregates import CourseAggregator
+from course_counters import COUNTER_MODES, counter_safe_write, seeded_counters
+from firestore_codec import encode_document
+from json_stream import iter_records
+from run_journal import JournalError, RunJournal, new_run_id
+from run_report import RunReport
+from quiz_builder import QUIZ_LAYOUTS, build_quizzes, quiz_documents
+from search_index import with_search_tokens
+from seed_manifest import SeedManifest, content_hash, manifest_name, manifest_path
+from firestore_http import (DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, FirestoreSession, FirestoreTarget,
+                            configure_session, get_session)
+from upload_engine import DEFAULT_CONCURRENCY, DEFAULT_RATE, MAX_RATE, UploadEngine, is_throttled
+
 # Firebase project configuration
 PROJECT_ID = "interntasktracker-d127c"  # Replace with your project ID
-BASE_URL = f"https://firestore.googleapis.com/v1/projects/{PROJECT_ID}/databases/(default)/documents"
+# Set FIRESTORE_EMULATOR_HOST (e.g. localhost:8080) to seed the local emulator instead
+DEFAULT_TARGET = FirestoreTarget(PROJECT_ID, emulator_host=os.environ.get("FIRESTORE_EMULATOR_HOST"))
+
+# Batched write configuration
+MAX_WRITES_PER_BATCH = 500  # Firestore limit for a single commit/batchWrite request
+MAX_BATCH_RETRIES = 3
+RETRYABLE_HTTP_STATUS = {408, 429, 500, 502, 503, 504}
+# gRPC codes worth retrying: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED, ABORTED, INTERNAL, UNAVAILABLE
+RETRYABLE_RPC_CODES = {4, 8, 10, 13, 14}
+RESOURCE_EXHAUSTED = 8
+# Encoded documents buffered per target of a fan-out run
+FAN_OUT_QUEUE_SIZE = 2 * MAX_WRITES_PER_BATCH
 
-def add_document(collection, doc_id, data):
+def add_document(collection, doc_id, data, target=None):
     """Add a document to Firestore using REST API"""
-    url = f"{BASE_URL}/{collection}/{doc_id}"
+    target = target or DEFAULT_TARGET
+    url = target.document_url(f"{collection}/{doc_id}")
     
     # Convert data to Firestore format
     firestore_data = convert_to_firestore_format(data)
     
-    response = requests.patch(url, json=firestore_data)
-    
-    if response.status_code == 200:
-        print(f"[OK] Added {collection}/{doc_id}")
+    response = get_session().patch(url, json=firestore_data, headers=target.headers)
+    return report_document(f"{collection}/{doc_id}", response)
+
+def build_write(collection, doc_id, data, target=None, report=None):
+    """Build an update write for a commit/batchWrite request"""
+    start = time.perf_counter()
+    document = convert_to_firestore_format(data)
+    if report is not None:
+        report.add_encode_time(f"{collection}/{doc_id}", time.perf_counter() - start)
+    document["name"] = (target or DEFAULT_TARGET).document_name(f"{collection}/{doc_id}")
+    return {"update": document}
+
+def chunked(items, size):
+    """Yield successive lists of at most size items from any iterable"""
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def report_document(key, response):
+    """Print the outcome of a single document write and return whether it succeeded"""
+    if response is not None and response.status_code == 200:
+        print(f"[OK] Added {key}")
         return True
+    print(f"[ERROR] Failed to add {key}: {response.text if response is not None else 'no response'}")
+    return False
+
+def post_batch(batch, atomic=False, target=None, session=None):
+    """POST one batch of (key, write) pairs to :batchWrite, or :commit in atomic mode"""
+    target = target or DEFAULT_TARGET
+    url = target.commit_url if atomic else target.batch_write_url
+    return (session or get_session()).post(url, json={"writes": [write for _, write in batch]},
+                                           headers=target.headers)
+
+def batch_failures(batch, response, atomic=False):
+    """Map a batch response back to the writes that failed
+
+    Each failure is a (key, write, message, retryable, throttled) tuple. In
+    atomic mode the batch went through :commit, so any error fails every write
+    in it. A 200 response that is not a batchWrite result (e.g. from a proxy)
+    fails every write as retryable, and so does every write the response has
+    no status for.
+    """
+    if response is None or response.status_code != 200:
+        message = response.text if response is not None else "no response"
+        retryable = response is None or response.status_code in RETRYABLE_HTTP_STATUS
+        throttled = response is not None and is_throttled(response)
+        return [(key, write, message, retryable, throttled) for key, write in batch]
+    if atomic:
+        return []
+
+    # batchWrite applies writes independently and reports a status per write
+    try:
+        statuses = response.json().get("status") or []
+    except (ValueError, AttributeError):
+        message = f"unexpected response: {response.text[:200]}"
+        return [(key, write, message, True, False) for key, write in batch]
+    failures = []
+    for (key, write), status in zip(batch, statuses):
+        code = status.get("code", 0)
+        if code:
+            failures.append((key, write, status.get("message", ""), code in RETRYABLE_RPC_CODES,
+                             code == RESOURCE_EXHAUSTED))
+    failures += [(key, write, "no status in the batchWrite response", True, False)
+                 for key, write in batch[len(statuses):]]
+    return failures
+
+def batch_write_documents(documents, atomic=False, engine=None, on_written=None, target=None,
+                          report=None, prepare_write=None):
+    """Write an iterable of (collection, doc_id, data) tuples using batched requests
+
+    Batches are built lazily and sent concurrently through the upload engine.
+    Only the writes that failed with a retryable error are sent again, regrouped
+    into new batches, so one bad document never forces the rest of its batch
+    to be resent; writes that still fail are reported as collection/doc_id.
+    on_written(key) is called for every write that succeeded, and
+    prepare_write(write), when given, may rewrite each Write message.
+    Returns the list of collection/doc_id keys that could not be written.
+    """
+    prepare_write = prepare_write or (lambda write: write)
+    pending = ((f"{collection}/{doc_id}",
+                prepare_write(build_write(collection, doc_id, data, target, report)))
+               for collection, doc_id, data in documents)
+    return send_writes(pending, atomic, engine, on_written, target)
+
+def send_writes(pending, atomic=False, engine=None, on_written=None, target=None, session=None,
+                label="batch"):
+    """Send an iterable of (key, write) pairs in batches, retrying failed writes on their own
+
+    Lets callers send prepared Write messages (e.g. with an updateMask or
+    field transforms). Returns the keys that could not be written.
+    """
+    engine = engine or UploadEngine()
+    failed = []
+
+    for attempt in range(MAX_BATCH_RETRIES + 1):
+        if attempt:
+            print(f"[RETRY] Retrying {len(pending)} failed writes (attempt {attempt}/{MAX_BATCH_RETRIES})")
+            time.sleep(2 ** (attempt - 1))
+
+        retry = []
+
+        def on_done(label, batch, response):
+            failures = batch_failures(batch, response, atomic)
+            if any(throttled for *_, throttled in failures):
+                engine.controller.on_throttle()
+            written = len(batch) - len(failures)
+            status = "[OK]" if not failures else "[WARN]" if written else "[ERROR]"
+            print(f"{status} Wrote {written}/{len(batch)} documents in {label}")
+            if on_written is not None:
+                failed_keys = {key for key, *_ in failures}
+                for key, _ in batch:
+                    if key not in failed_keys:
+                        on_written(key)
+            for key, write, message, retryable, _ in failures:
+                if retryable and attempt < MAX_BATCH_RETRIES:
+                    retry.append((key, write))
+                else:
+                    print(f"[ERROR] Failed to add {key}: {message}")
+                    failed.append(key)
+
+        batches = ((f"{label} {n}", batch)
+                   for n, batch in enumerate(chunked(pending, MAX_WRITES_PER_BATCH), 1))
+        engine.run(batches, lambda batch: post_batch(batch, atomic, target, session), on_done)
+
+        if not retry:
+            break
+        pending = retry
+
+    return failed
+
+def upload_documents(collection, documents, batch=False, atomic=False, engine=None, manifest=None,
+                     target=None, report=None, journal=None, fan_out=None, prepare_write=None):
+    """Upload an iterable of documents (dicts carrying an 'id' key) to a collection
+
+    Documents are consumed lazily, so a generator of any length can be
+    streamed with memory bounded by the requests in flight. With a manifest,
+    only documents whose content hash differs from the one last pushed are
+    sent, and every successful write is recorded in it.
+    """
+    return upload_entries(((collection, doc) for doc in documents), batch=batch, atomic=atomic,
+                          engine=engine, manifest=manifest, target=target, report=report,
+                          journal=journal, fan_out=fan_out, prepare_write=prepare_write,
+                          label=collection)
+
+def upload_entries(entries, batch=False, atomic=False, engine=None, manifest=None, target=None,
+                   report=None, journal=None, fan_out=None, prepare_write=None, label="documents"):
+    """Upload an iterable of (collection, document) pairs that may span collections
+
+    Used when one stream feeds several collections, e.g. quizzes together
+    with their questions sub-collections. Behaves like upload_documents.
+    With a journal, documents the run already wrote are skipped and every
+    other document is planned before it is sent and acknowledged after.
+    prepare_write(write) rewrites each Write message (e.g. to add an
+    updateMask or field transforms) and implies batched writes.
+    """
+    if fan_out:
+        return fan_out_entries(entries, fan_out, atomic=atomic, prepare_write=prepare_write,
+                               label=label)
+    engine = engine or UploadEngine()
+    target = target or DEFAULT_TARGET
+    in_flight_hashes = {}
+    skipped = 0
+    resumed = 0
+
+    def journaled_entries(source):
+        nonlocal resumed
+        for collection, doc in source:
+            key = f"{collection}/{doc['id']}"
+            digest = content_hash(doc)
+            if journal.is_acked(key, digest):
+                resumed += 1
+                # Written before the interruption; the manifest must still learn about it
+                if manifest is not None:
+                    in_flight_hashes.pop(key, None)
+                    manifest.record(key, digest)
+                continue
+            journal.plan(key, digest)
+            yield collection, doc
+
+    def changed_entries(source):
+        nonlocal skipped
+        for collection, doc in source:
+            key = f"{collection}/{doc['id']}"
+            digest = content_hash(doc)
+            if manifest.is_changed(key, digest):
+                in_flight_hashes[key] = digest
+                yield collection, doc
+            else:
+                skipped += 1
+
+    def on_written(key):
+        if journal is not None:
+            journal.ack(key)
+        digest = in_flight_hashes.pop(key, None)
+        if digest is not None:
+            manifest.record(key, digest)
+
+    if manifest is not None:
+        entries = changed_entries(entries)
+    if journal is not None:
+        entries = journaled_entries(entries)
+
+    failed = []
+    if batch or prepare_write is not None:
+        failed = batch_write_documents(
+            ((collection, doc["id"], doc) for collection, doc in entries),
+            atomic=atomic, engine=engine, on_written=on_written, target=target, report=report,
+            prepare_write=prepare_write,
+        )
     else:
-        print(f"[ERROR] Failed to add {collection}/{doc_id}: {response.text}")
-        return False
+        def send(entry):
+            collection, doc = entry
+            path = f"{collection}/{doc['id']}"
+            start = time.perf_counter()
+            document = convert_to_firestore_format(doc)
+            if report is not None:
+                report.add_encode_time(path, time.perf_counter() - start)
+            return get_session().patch(target.document_url(path), json=document,
+                                       headers=target.headers)
+
+        def on_done(key, entry, response):
+            if report_document(key, response):
+                on_written(key)
+            else:
+                failed.append(key)
+
+        engine.run(((f"{collection}/{doc['id']}", (collection, doc)) for collection, doc in entries),
+                   send, on_done)
+
+    if skipped:
+        print(f"[SKIP] {skipped} unchanged {label} documents")
+    if resumed:
+        print(f"[RESUME] {resumed} {label} documents already written by this run")
+    return failed
+
+def fan_out_entries(entries, uploads, atomic=False, prepare_write=None, label="documents"):
+    """Encode each (collection, document) pair once and write it to every fan-out target
+
+    Every target drains its own bounded queue of encoded documents on its own
+    thread, through its own session and engine, so a slow or throttled target
+    only holds the others back once its queue is full. Returns the failed
+    keys as "target: collection/doc_id".
+    """
+    queues = [queue.Queue(maxsize=FAN_OUT_QUEUE_SIZE) for _ in uploads]
+    results = [[] for _ in uploads]
+    errors = []
+    threads = [threading.Thread(target=_deliver, args=(options, items, atomic, prepare_write, label,
+                                                       failed, errors))
+               for options, items, failed in zip(uploads, queues, results)]
+    for thread in threads:
+        thread.start()
+    try:
+        for collection, doc in entries:
+            key = f"{collection}/{doc['id']}"
+            start = time.perf_counter()
+            fields = convert_to_firestore_format(doc)["fields"]
+            seconds = time.perf_counter() - start
+            item = (key, content_hash(doc), fields)
+            for options, items in zip(uploads, queues):
+                if options["report"] is not None:
+                    options["report"].add_encode_time(key, seconds)
+                items.put(item)
+    finally:
+        for items in queues:
+            items.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    failed = []
+    for options, target_failed in zip(uploads, results):
+        options["failed"] += target_failed
+        failed += [f"{options['target']}: {key}" for key in target_failed]
+    return failed
+
+def _deliver(options, items, atomic, prepare_write, label, failed, errors):
+    """Send the encoded documents queued for one fan-out target until None arrives"""
+    target, manifest, journal = options["target"], options["manifest"], options["journal"]
+    prepare_write = prepare_write or (lambda write: write)
+    in_flight_hashes = {}
+    skipped = resumed = 0
+
+    def writes():
+        nonlocal skipped, resumed
+        for key, digest, fields in iter(items.get, None):
+            if manifest is not None and not manifest.is_changed(key, digest):
+                skipped += 1
+                continue
+            if journal is not None:
+                if journal.is_acked(key, digest):
+                    resumed += 1
+                    if manifest is not None:
+                        manifest.record(key, digest)
+                    continue
+                journal.plan(key, digest)
+            in_flight_hashes[key] = digest
+            yield key, prepare_write({"update": {"name": target.document_name(key), "fields": fields}})
+
+    def on_written(key):
+        if journal is not None:
+            journal.ack(key)
+        digest = in_flight_hashes.pop(key, None)
+        if manifest is not None and digest is not None:
+            manifest.record(key, digest)
+        with options["lock"]:
+            options["written"] += 1
+
+    try:
+        failed += send_writes(writes(), atomic, options["engine"], on_written, target,
+                              options["session"], label=f"{target} batch")
+    except Exception as e:
+        print(f"[ERROR] Upload to {target} stopped: {e}")
+        errors.append(e)
+        # Keep draining so the encoder never blocks on this target's full queue
+        for _ in iter(items.get, None):
+            pass
+    if skipped:
+        print(f"[SKIP] {target}: {skipped} unchanged {label} documents")
+    if resumed:
+        print(f"[RESUME] {target}: {resumed} {label} documents already written by this run")
+
+def delete_documents(keys, engine=None, target=None, session=None):
+    """Delete collection/doc_id documents and return the keys that could not be deleted"""
+    engine = engine or UploadEngine()
+    target = target or DEFAULT_TARGET
+    session = session or get_session()
+    failed = []
+
+    def send(key):
+        return session.delete(target.document_url(key), headers=target.headers)
+
+    def on_done(key, _, response):
+        if response is not None and response.status_code == 200:
+            print(f"[OK] Deleted {key}")
+        else:
+            print(f"[ERROR] Failed to delete {key}: {response.text if response is not None else 'no response'}")
+            failed.append(key)
+
+    engine.run(((key, key) for key in keys), send, on_done)
+    return failed
+
+def prune_removed_documents(manifest, collections, engine=None, target=None, session=None):
+    """Delete documents that were seeded before but are no longer in the catalog
+
+    A collection with no document at all in this run is left alone, since an
+    empty run is far more likely a broken input than a deleted catalog.
+    """
+    failed = []
+    for collection in collections:
+        if not manifest.saw_any(collection):
+            print(f"[SKIP] No {collection} documents in this run; not pruning {collection}")
+            continue
+        removed = manifest.removed(collection)
+        if not removed:
+            continue
+        print(f"Deleting {len(removed)} removed {collection} documents...")
+        errors = delete_documents(removed, engine, target, session)
+        for key in set(removed) - set(errors):
+            manifest.forget(key)
+        failed += errors
+    return failed
 
 def convert_to_firestore_format(data):
     """Convert Python data to Firestore format"""
-    result = {"fields": {}}
-    
-    for key, value in data.items():
-        if value is None:
-            result["fields"][key] = {"nullValue": None}
-        elif isinstance(value, bool):
-            # Check bool BEFORE int because bool is a subclass of int in Python
-            result["fields"][key] = {"booleanValue": value}
-        elif isinstance(value, int):
-            result["fields"][key] = {"integerValue": str(value)}
-        elif isinstance(value, float):
-            result["fields"][key] = {"doubleValue": value}
-        elif isinstance(value, str):
-            result["fields"][key] = {"stringValue": value}
-        elif isinstance(value, list):
-            # Handle arrays by checking the type of elements
-            if not value:
-                # Empty array
-                result["fields"][key] = {"arrayValue": {"values": []}}
-            else:
-                # Convert each element based on its type
-                converted_values = []
-                for item in value:
-                    if item is None:
-                        converted_values.append({"nullValue": None})
-                    elif isinstance(item, bool):
-                        converted_values.append({"booleanValue": item})
-                    elif isinstance(item, int):
-                        converted_values.append({"integerValue": str(item)})
-                    elif isinstance(item, float):
-                        converted_values.append({"doubleValue": item})
-                    elif isinstance(item, str):
-                        converted_values.append({"stringValue": str(item)})
-                    elif isinstance(item, dict):
-                        # Recursively convert nested objects
-                        converted_values.append({"mapValue": convert_to_firestore_format(item)})
-                    elif isinstance(item, list):
-                        # Handle nested arrays (rare, but possible)
-                        nested_array = convert_to_firestore_format({"temp": item})
-                        converted_values.append(nested_array["fields"]["temp"])
-                result["fields"][key] = {"arrayValue": {"values": converted_values}}
-        elif isinstance(value, dict):
-            result["fields"][key] = {"mapValue": convert_to_firestore_format(value)}
-        elif isinstance(value, datetime):
-            result["fields"][key] = {"timestampValue": value.isoformat() + "Z"}
-    
-    return result
+    return encode_document(data)
 
-def main():
-    print("Starting to seed Firebase database...")
-    
+def _target_options(target, session, engine, incremental, report_path, prometheus_path, run_id,
+                    journal_name=None, new_run=False):
+    """Engine, manifest, report and journal of one upload target; run_id None means no journal"""
+    manifest = None
+    if incremental:
+        manifest = SeedManifest(manifest_path(target.project_id, target.database,
+                                              emulator=bool(target.emulator_host)))
+    report = None
+    if report_path or prometheus_path:
+        report = RunReport(report_path, prometheus_path)
+        report.attach(session)
+    if run_id is None:
+        return {"engine": engine, "manifest": manifest, "target": target, "report": report,
+                "journal": None}
+    try:
+        journal = RunJournal(run_id, target, journal_name, new=new_run)
+    except JournalError as e:
+        raise SystemExit(f"[ERROR] {e}")
+    if journal.acked or journal.in_flight:
+        print(f"[RESUME] Run {run_id} on {target}: {journal.acked} documents already written, "
+              f"{journal.in_flight} in flight will be sent again")
+    return {"engine": engine, "manifest": manifest, "target": target, "report": report,
+            "journal": journal}
+
+def _suffixed(path, name):
+    """path with name inserted before its extension, e.g. report.json -> report.NAME.json"""
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{name}{ext}"
+
+def start_upload(batch=False, atomic=False, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                 max_rate=MAX_RATE, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 gzip_requests=False, http2=False, incremental=False, prune=False, target=None,
+                 report_path=None, prometheus_path=None, run_id=None, fan_out=None, journal=True):
+    """Configure the shared session and return the keyword options for upload_documents
+
+    Writes are journaled under run_id; passing the ID of an interrupted run
+    resumes it. A new ID is generated when none is given. journal=False
+    skips the journal entirely (e.g. for benchmarks), so the run cannot be resumed.
+
+    fan_out is a list of (FirestoreTarget, rate) pairs that all receive every
+    document. Each target gets its own connection pool, rate limiter (rate,
+    or the default one when None), manifest, journal and report, and uploads
+    always go through batched writes.
+    """
+    new_run = run_id is None
+    if journal:
+        run_id = run_id or new_run_id()
+    else:
+        run_id = None
+    session_options = {"pool_size": max(pool_size, concurrency), "timeout": timeout,
+                       "gzip_requests": gzip_requests, "http2": http2}
+    if fan_out:
+        names = [manifest_name(t.project_id, t.database, bool(t.emulator_host)) for t, _ in fan_out]
+        if len(set(names)) != len(names):
+            raise SystemExit("[ERROR] The same project/database is listed twice in --fan-out")
+        uploads = []
+        for (fan_target, fan_rate), name in zip(fan_out, names):
+            session = FirestoreSession(**session_options)
+            engine = UploadEngine(concurrency=concurrency, rate=fan_rate or rate, max_rate=max_rate)
+            options = _target_options(fan_target, session, engine, incremental or prune,
+                                      _suffixed(report_path, name),
+                                      _suffixed(prometheus_path, name), run_id, journal_name=name,
+                                      new_run=new_run)
+            uploads.append(dict(options, session=session, failed=[], written=0,
+                                lock=threading.Lock()))
+        options = {"batch": True, "atomic": atomic, "fan_out": uploads}
+    else:
+        session = configure_session(**session_options)
+        engine = UploadEngine(concurrency=concurrency, rate=rate, max_rate=max_rate)
+        options = dict(_target_options(target or DEFAULT_TARGET, session, engine,
+                                       incremental or prune, report_path, prometheus_path, run_id,
+                                       new_run=new_run),
+                       batch=batch, atomic=atomic)
+    if run_id is not None:
+        print(f"Run ID {run_id} (rerun with --run-id {run_id} to resume if interrupted)")
+    return options
+
+def upload_targets(upload_options):
+    """Targets an upload started by start_upload() writes to"""
+    return [options["target"] for options in upload_options.get("fan_out") or [upload_options]]
+
+def finish_upload(upload_options, failed, prune_collections=()):
+    """Prune removed documents, save the manifest and print the run summary
+
+    Returns every collection/doc_id that failed, including failed deletes.
+    For a fan-out run each target is finished on its own and failures are
+    returned as "target: collection/doc_id".
+    """
+    if upload_options.get("fan_out"):
+        failed = []
+        for options in upload_options["fan_out"]:
+            target = options["target"]
+            print(f"[REPORT] {target}:")
+            target_failed = finish_upload(options, options["failed"], prune_collections)
+            print(f"[REPORT] {target}: {options['written']} documents written, "
+                  f"{len(target_failed)} failed")
+            failed += [f"{target}: {key}" for key in target_failed]
+        return failed
+
+    session = upload_options.get("session") or get_session()
+    manifest = upload_options["manifest"]
+    if manifest is not None:
+        if prune_collections:
+            failed = failed + prune_removed_documents(manifest, prune_collections,
+                                                      upload_options["engine"],
+                                                      upload_options["target"], session)
+        manifest.save()
+
+    session.print_stats()
+    report = upload_options.get("report")
+    if report is not None:
+        report.add_failures(failed)
+        report.print_summary()
+        report.save(session.stats())
+    journal = upload_options.get("journal")
+    if journal is not None:
+        journal.close(remove=not failed)
+    if failed:
+        print(f"{len(failed)} documents failed: {', '.join(failed)}")
+        if journal is not None:
+            print(f"Rerun with --run-id {journal.run_id} to retry them without re-sending the rest")
+    return failed
+
+def main(prune=False, quiz_workers=1, quiz_layout="embedded", validate_only=False,
+         counters="overwrite", **settings):
     # Expanded courses data
     courses = [
         {
@@ -255,11 +718,6 @@ def main():
         }
     ]
     
-    # Add courses
-    print("Adding courses...")
-    for course in courses:
-        add_document("courses", course["id"], course)
-        time.sleep(0.5)  # Rate limiting
     
     # Expanded lessons data
     lessons = [
@@ -451,79 +909,149 @@ def main():
         }
     ]
     
-    # Add lessons
-    print("Adding lessons...")
-    for lesson in lessons:
-        add_document("lessons", lesson["id"], lesson)
-        time.sleep(0.5)
-    
-    # Read quizzes from quizzes.json file
-    import os
-    # Get the parent directory (project root)
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     quizzes_file_path = os.path.join(project_root, 'quizzes.json')
-    with open(quizzes_file_path, 'r', encoding='utf-8') as f:
-        quizzes_data = json.load(f)
+
+    # Check references between courses, lessons and quizzes before anything is written
+    print("Validating catalog...")
+    try:
+        validator = validate_catalog(courses, lessons, build_quizzes(
+            iter_records(quizzes_file_path, array_key="quizzes"), workers=quiz_workers))
+    except CatalogError as e:
+        print_problems(e)
+        raise SystemExit(f"[ERROR] {e}; nothing was written")
+    print(f"[OK] Catalog is consistent ({validator.summary()})")
+    if validate_only:
+        return
+
+    upload_options = start_upload(prune=prune, **settings)
+    targets = ", ".join(str(target) for target in upload_targets(upload_options))
+    print(f"Starting to seed Firebase database ({targets})...")
+
+    # Add lessons, grouping them by course on the way
+    print("Adding lessons...")
+    aggregator = CourseAggregator()
+    failed = upload_documents("lessons", aggregator.observe(lessons), **upload_options)
     
-    # Convert quizzes from JSON to the format needed for Firestore
-    quizzes = []
-    topic_to_course_map = {
-        "Flutter": ("flutter_basics", "flutter_quiz_lesson", "flutter_quiz"),
-        "React": ("react_advanced", "react_hooks", "react_quiz"),
-        "UI/UX": ("ui_ux_design", "ux_research", "ui_ux_quiz"),
-        "C++": ("python_ml", "ml_intro", "cpp_quiz")  # Using python_ml course for C++ as placeholder
-    }
+    # Add courses with the lesson totals derived above and the prefix tokens
+    # LearningService.searchCourses queries
+    print("Adding courses...")
+    # ratingTotal/ratingCount carry the catalog rating, so counters.py rate adds to it
+    courses = [with_search_tokens(seeded_counters(aggregator.apply(course))) for course in courses]
+    # In increment mode enrolledCount and the rating counters are live (see counters.py)
+    # and are only created, never overwritten
+    prepare_write = counter_safe_write if counters == "increment" else None
+    failed += upload_documents("courses", courses, prepare_write=prepare_write, **upload_options)
     
-    question_counter = 1
-    for topic_data in quizzes_data.get("quizzes", []):
-        topic = topic_data["topic"]
-        mapping = topic_to_course_map.get(topic, ("flutter_basics", "flutter_intro", "flutter_quiz"))
-        course_id, lesson_id, quiz_id = mapping
-        
-        quiz_questions = []
-        for idx, q in enumerate(topic_data["questions"], 1):
-            options = []
-            for opt_idx, option_text in enumerate(q["options"]):
-                is_correct = (opt_idx == q["answer_index"])
-                options.append({
-                    "id": f"opt{question_counter}_{opt_idx}",
-                    "text": option_text,
-                    "isCorrect": is_correct,
-                    "order": opt_idx + 1
-                })
-            
-            quiz_questions.append({
-                "id": f"q{question_counter}",
-                "question": q["question"],
-                "type": "multipleChoice",
-                "options": options,
-                "points": 10,
-                "order": idx
-            })
-            question_counter += 1
-        quizzes.append({
-            "id": quiz_id,
-            "courseId": course_id,
-            "lessonId": lesson_id,
-            "title": f"{topic} Quiz",
-            "description": f"Test your understanding of {topic} fundamentals.",
-            "questions": quiz_questions,
-            "timeLimit": 15,
-            "passingScore": 70,
-            "maxAttempts": 3,
-            "isPublished": True,
-            "createdAt": datetime.now(),
-            "updatedAt": datetime.now()
-        })
+    # Stream quiz topics from quizzes.json one at a time
+    # Topics are transformed (in parallel with quiz_workers > 1) and uploaded as they finish
+    quizzes = build_quizzes(iter_records(quizzes_file_path, array_key="quizzes"),
+                            workers=quiz_workers)
     
-    # Add quizzes
+    # Add quizzes (and their questions sub-collections with quiz_layout="subcollection")
     print("Adding quizzes...")
-    for quiz in quizzes:
-        add_document("quizzes", quiz["id"], quiz)
-        time.sleep(0.5)
+    quiz_entries = itertools.chain.from_iterable(quiz_documents(quiz, quiz_layout) for quiz in quizzes)
+    failed += upload_entries(quiz_entries, label="quiz", **upload_options)
     
-    print("Sample data added successfully!")
+    prune_collections = ["courses", "lessons", "quizzes"] if prune else []
+    if not finish_upload(upload_options, failed, prune_collections):
+        print("Sample data added successfully!")
     print("Note: You may need to authenticate with Firebase to add data to production.")
 
+def add_upload_arguments(parser):
+    """Register the upload options shared by the seeding and import commands"""
+    parser.add_argument("--batch", action="store_true",
+                        help="group writes into batchWrite requests of up to 500 documents")
+    parser.add_argument("--atomic", action="store_true",
+                        help="with --batch, use all-or-nothing :commit requests instead")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"number of requests in flight (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"initial requests per second; adapts to throttling (default {DEFAULT_RATE:g})")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help=f"keep-alive connections to keep open (default {DEFAULT_POOL_SIZE})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT[1],
+                        help=f"per-request read timeout in seconds (default {DEFAULT_TIMEOUT[1]:g})")
+    parser.add_argument("--gzip", action="store_true",
+                        help="gzip request bodies of 1 KB or more (experimental: not yet "
+                             "verified against production Firestore or the emulator)")
+    parser.add_argument("--http2", action="store_true",
+                        help="use HTTP/2 (requires httpx[http2])")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only write documents whose content changed since the last run")
+    parser.add_argument("--prune", action="store_true",
+                        help="with --incremental, also delete documents removed from the catalog")
+    parser.add_argument("--fan-out", action="append", metavar="PROJECT[/DATABASE][@RATE]",
+                        help="write every document to this project/database instead of --project; "
+                             "repeat for each target. Documents are encoded once, and each target "
+                             "gets its own connection pool, rate limiter (RATE overrides --rate), "
+                             "manifest and report")
+    parser.add_argument("--run-id",
+                        help="resume the interrupted run with this ID, skipping documents it "
+                             "already wrote (default: start a new run)")
+    add_target_arguments(parser)
+    parser.add_argument("--report", metavar="PATH",
+                        help="write a JSON performance report (throughput, latency, errors) to PATH")
+    parser.add_argument("--prometheus-textfile", metavar="PATH",
+                        help="write the run's metrics in Prometheus textfile format to PATH")
+
+def add_target_arguments(parser):
+    """Register the options that choose the project/database requests go to"""
+    parser.add_argument("--project", default=PROJECT_ID,
+                        help=f"Firebase project ID (default {PROJECT_ID})")
+    parser.add_argument("--database", default="(default)", help="Firestore database ID")
+    parser.add_argument("--emulator-host", default=os.environ.get("FIRESTORE_EMULATOR_HOST"),
+                        help="host:port of the Firestore emulator or a fake server "
+                             "(default: $FIRESTORE_EMULATOR_HOST)")
+
+def target_from_args(args):
+    """FirestoreTarget for parsed target options"""
+    return FirestoreTarget(args.project, args.database, args.emulator_host)
+
+def upload_settings(args):
+    """Keyword arguments for start_upload() from parsed upload options"""
+    return {
+        "batch": args.batch or args.atomic,
+        "atomic": args.atomic,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "pool_size": args.pool_size,
+        "timeout": (DEFAULT_TIMEOUT[0], args.timeout),
+        "gzip_requests": args.gzip,
+        "http2": args.http2,
+        "incremental": args.incremental,
+        "prune": args.prune,
+        "target": target_from_args(args),
+        "report_path": args.report,
+        "prometheus_path": args.prometheus_textfile,
+        "run_id": args.run_id,
+        "fan_out": [parse_fan_out_target(spec, args.emulator_host) for spec in args.fan_out or []],
+    }
+
+def parse_fan_out_target(spec, emulator_host=None):
+    """(FirestoreTarget, rate or None) from a PROJECT[/DATABASE][@RATE] --fan-out value"""
+    spec, _, rate = spec.partition("@")
+    project_id, _, database = spec.partition("/")
+    return FirestoreTarget(project_id, database or "(default)", emulator_host), (float(rate) if rate else None)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Seed sample data into Firestore")
+    add_upload_arguments(parser)
+    parser.add_argument("--quiz-workers", type=int, default=1,
+                        help="processes used to build quiz topics (0 = one per CPU, default 1)")
+    parser.add_argument("--quiz-layout", choices=QUIZ_LAYOUTS, default="embedded",
+                        help="store questions inside each quiz document, or as documents in "
+                             "quizzes/{id}/questions (default embedded)")
+    parser.add_argument("--counters", choices=COUNTER_MODES, default="overwrite",
+                        help="overwrite enrolledCount/rating with the catalog values, or leave "
+                             "existing counts alone and only create missing counters with "
+                             "increment transforms (default overwrite)")
+    parser.add_argument("--validate-only", action="store_true",
+                        help="check references between courses, lessons and quizzes and exit "
+                             "without writing anything")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(quiz_workers=args.quiz_workers or None, quiz_layout=args.quiz_layout,
+         validate_only=args.validate_only, counters=args.counters, **upload_settings(args))
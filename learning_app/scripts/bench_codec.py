@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the Firestore encoder on large quiz documents
+
+Compares firestore_codec.encode_document with the original isinstance-based
+convert_to_firestore_format, and measures decode throughput.
+
+    python bench_codec.py --questions 2000 --docs 20
+"""
+
+import argparse
+import gc
+import json
+import time
+from datetime import datetime
+
+from firestore_codec import decode_document, encode_document
+
+
+def legacy_convert_to_firestore_format(data):
+    """The seeder's original recursive encoder, kept as a baseline"""
+    result = {"fields": {}}
+    for key, value in data.items():
+        if value is None:
+            result["fields"][key] = {"nullValue": None}
+        elif isinstance(value, bool):
+            result["fields"][key] = {"booleanValue": value}
+        elif isinstance(value, int):
+            result["fields"][key] = {"integerValue": str(value)}
+        elif isinstance(value, float):
+            result["fields"][key] = {"doubleValue": value}
+        elif isinstance(value, str):
+            result["fields"][key] = {"stringValue": value}
+        elif isinstance(value, list):
+            converted_values = []
+            for item in value:
+                if item is None:
+                    converted_values.append({"nullValue": None})
+                elif isinstance(item, bool):
+                    converted_values.append({"booleanValue": item})
+                elif isinstance(item, int):
+                    converted_values.append({"integerValue": str(item)})
+                elif isinstance(item, float):
+                    converted_values.append({"doubleValue": item})
+                elif isinstance(item, str):
+                    converted_values.append({"stringValue": str(item)})
+                elif isinstance(item, dict):
+                    converted_values.append({"mapValue": legacy_convert_to_firestore_format(item)})
+                elif isinstance(item, list):
+                    nested_array = legacy_convert_to_firestore_format({"temp": item})
+                    converted_values.append(nested_array["fields"]["temp"])
+            result["fields"][key] = {"arrayValue": {"values": converted_values}}
+        elif isinstance(value, dict):
+            result["fields"][key] = {"mapValue": legacy_convert_to_firestore_format(value)}
+        elif isinstance(value, datetime):
+            result["fields"][key] = {"timestampValue": value.isoformat() + "Z"}
+    return result
+
+
+def make_quiz(index, questions, options):
+    """Build a quiz document shaped like the ones add_data_rest.py seeds"""
+    now = datetime.now()
+    return {
+        "id": f"quiz_{index}",
+        "courseId": "flutter_basics",
+        "lessonId": "flutter_quiz_lesson",
+        "title": f"Synthetic Quiz {index}",
+        "description": "Generated for encoder benchmarking.",
+        "questions": [
+            {
+                "id": f"q{index}_{q}",
+                "question": f"Question {q}: which option is correct for case {index}?",
+                "type": "multipleChoice",
+                "options": [
+                    {"id": f"opt{q}_{o}", "text": f"Option {o} for question {q}",
+                     "isCorrect": o == q % options, "order": o + 1}
+                    for o in range(options)
+                ],
+                "points": 10,
+                "order": q + 1,
+            }
+            for q in range(questions)
+        ],
+        "timeLimit": 15,
+        "passingScore": 70,
+        "maxAttempts": 3,
+        "isPublished": True,
+        "createdAt": now,
+        "updatedAt": now,
+    }
+
+
+def measure(label, func, docs, repeat, payload_bytes):
+    best = float("inf")
+    for _ in range(repeat):
+        # Like timeit, keep the cyclic GC out of the measurement
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for doc in docs:
+                func(doc)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    print(f"{label:<10} {len(docs) / best:>10.1f} docs/s {payload_bytes / best / 1e6:>8.1f} MB/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Firestore encoder")
+    parser.add_argument("--docs", type=int, default=20, help="quiz documents per round")
+    parser.add_argument("--questions", type=int, default=1000, help="questions per quiz")
+    parser.add_argument("--options", type=int, default=4, help="options per question")
+    parser.add_argument("--repeat", type=int, default=5, help="rounds; the best one is reported")
+    args = parser.parse_args()
+
+    docs = [make_quiz(i, args.questions, args.options) for i in range(args.docs)]
+    encoded = [encode_document(doc) for doc in docs]
+    assert encoded == [legacy_convert_to_firestore_format(doc) for doc in docs]
+    payload_bytes = sum(len(json.dumps(doc)) for doc in encoded)
+
+    print(f"{args.docs} quizzes x {args.questions} questions x {args.options} options, "
+          f"{payload_bytes / len(docs) / 1024:.0f} KiB encoded JSON per quiz")
+    legacy = measure("legacy", legacy_convert_to_firestore_format, docs, args.repeat, payload_bytes)
+    current = measure("encode", encode_document, docs, args.repeat, payload_bytes)
+    measure("decode", decode_document, encoded, args.repeat, payload_bytes)
+    print(f"encode speedup over legacy: {legacy / current:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the quiz build stage on a synthetic question bank
+
+Builds the same bank sequentially and with a process pool, encoding each quiz
+as the uploader would, and checks both runs produce identical IDs.
+
+    python bench_quizzes.py --topics 200 --questions 1000 --workers 8
+"""
+
+import argparse
+import os
+import time
+
+from firestore_codec import encode_document
+from quiz_builder import build_quizzes
+
+
+def make_topic(index, questions, options):
+    return {
+        "topic": f"Topic {index}",
+        "questions": [
+            {
+                "question": f"Synthetic question {q} of topic {index}?",
+                "options": [f"Option {o} for question {q}" for o in range(options)],
+                "answer_index": q % options,
+            }
+            for q in range(questions)
+        ],
+    }
+
+
+def run(topics, workers):
+    """Build and encode every topic; returns (seconds, quiz_id -> question IDs)"""
+    ids = {}
+    start = time.perf_counter()
+    for quiz in build_quizzes(iter(topics), workers=workers):
+        encode_document(quiz)
+        ids[quiz["id"]] = [question["id"] for question in quiz["questions"]]
+    return time.perf_counter() - start, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the quiz build stage")
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=1000, help="questions per topic")
+    parser.add_argument("--options", type=int, default=4, help="options per question")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    topics = [make_topic(i, args.questions, args.options) for i in range(args.topics)]
+    total = args.topics * args.questions
+    print(f"{args.topics} topics x {args.questions} questions = {total} questions")
+
+    sequential, expected = run(topics, 1)
+    print(f"sequential: {sequential:.2f}s ({total / sequential:,.0f} questions/s)")
+    parallel, ids = run(topics, args.workers)
+    print(f"{args.workers} workers: {parallel:.2f}s ({total / parallel:,.0f} questions/s, "
+          f"{sequential / parallel:.2f}x)")
+
+    if ids != expected:
+        raise SystemExit("[ERROR] Parallel build produced different IDs")
+    print("[OK] IDs identical across runs")
+
+
+if __name__ == "__main__":
+    main()
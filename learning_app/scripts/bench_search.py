@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark: full-scan course search versus the searchTokens index
+
+For synthetic catalogs of each size, runs the same queries two ways:
+the current client-side scan (download every published course, substring
+match) and an array-contains lookup on searchTokens followed by the same
+filter on the candidates. Reports query time, documents read, bytes
+downloaded per query and how many scan matches the prefix index finds,
+both for the default token layout and with only whole description words indexed.
+
+    python bench_search.py --sizes 1000,10000,100000 --queries 200
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import defaultdict
+
+from firestore_codec import encode_document
+from search_index import PREFIX_FIELDS, WORD_FIELDS, query_token, with_search_tokens
+
+TOPIC_WORDS = (
+    "flutter dart react hooks python machine learning data science cloud aws devops docker "
+    "kubernetes design figma prototyping node express mongodb api blockchain ethereum angular "
+    "typescript rxjs analytics pandas visualization mobile web security testing performance "
+    "architecture microservices database sql graphql streaming kafka spark terraform linux "
+    "networking algorithms structures interview career agile scrum leadership communication"
+).split()
+SYLLABLES = "ka ri to mu se na lo ve pi du ra mo te li su ne ga bo".split()
+
+# token layout name -> (prefix fields, whole-word fields)
+LAYOUTS = {
+    "default": (PREFIX_FIELDS, WORD_FIELDS),
+    "desc-words": (("title", "tags"), ("description",)),
+}
+
+
+def make_vocabulary(rng, size=5000):
+    """Real topic words followed by pseudo-words, most frequent first"""
+    vocabulary = list(TOPIC_WORDS)
+    seen = set(vocabulary)
+    while len(vocabulary) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5)))
+        if word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+    return vocabulary
+
+
+class WordSampler:
+    """Zipf-distributed word picker, like word frequencies in real text"""
+
+    def __init__(self, vocabulary, rng):
+        self.vocabulary = vocabulary
+        self.rng = rng
+        self.weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+
+    def __call__(self, count=1):
+        return self.rng.choices(self.vocabulary, weights=self.weights, k=count)
+
+
+def make_course(index, sample, rng):
+    title = " ".join(word.capitalize() for word in sample(rng.randint(2, 4)))
+    description = " ".join(sample(rng.randint(12, 30))) + "."
+    return {
+        "id": f"course_{index:07d}",
+        "title": f"{title} {index}",
+        "description": description.capitalize(),
+        "tags": [word.capitalize() for word in sample(rng.randint(2, 5))],
+        "category": "Programming",
+        "difficulty": rng.choice(["Beginner", "Intermediate", "Advanced"]),
+        "isPublished": True,
+    }
+
+
+def make_queries(count, sample, rng):
+    """Mostly whole words and prefixes, plus a few multi-word and no-match queries"""
+    queries = []
+    for _ in range(count):
+        word = sample()[0]
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(word)
+        elif kind < 0.8:
+            queries.append(word[:rng.randint(2, len(word))])
+        elif kind < 0.95:
+            queries.append(f"{word} {sample()[0]}")
+        else:
+            queries.append("zzqx")
+    return queries
+
+
+def matches(course, query):
+    """The substring filter LearningService.searchCourses applies on the device"""
+    search_lower = query.lower()
+    return (search_lower in course["title"].lower()
+            or search_lower in course["description"].lower()
+            or any(search_lower in tag.lower() for tag in course["tags"]))
+
+
+def document_bytes(course):
+    return len(json.dumps(encode_document(course), separators=(",", ":")))
+
+
+def run(courses, queries, layout):
+    size = len(courses)
+    scan_bytes = [document_bytes(course) for course in courses]
+
+    start = time.perf_counter()
+    indexed = [with_search_tokens(course, *LAYOUTS[layout]) for course in courses]
+    index = defaultdict(list)
+    for position, course in enumerate(indexed):
+        for token in course["searchTokens"]:
+            index[token].append(position)
+    build_seconds = time.perf_counter() - start
+    indexed_bytes = [document_bytes(course) for course in indexed]
+
+    scan_time = scan_read = scan_found = 0
+    index_time = index_read = index_found = downloaded = 0
+    for query in queries:
+        start = time.perf_counter()
+        found = [course for course in courses if matches(course, query)]
+        scan_time += time.perf_counter() - start
+        scan_read += len(courses)
+        scan_found += len(found)
+
+        start = time.perf_counter()
+        token = query_token(query)
+        candidates = index.get(token, []) if token else range(len(indexed))
+        hits = [indexed[i] for i in candidates if matches(indexed[i], query)]
+        index_time += time.perf_counter() - start
+        index_read += len(candidates)
+        index_found += len(hits)
+        downloaded += sum(indexed_bytes[i] for i in candidates)
+
+    n = len(queries)
+    return {
+        "size": size,
+        "layout": layout,
+        "tokensPerCourse": round(sum(len(c["searchTokens"]) for c in indexed) / size, 1),
+        "indexBuildSeconds": round(build_seconds, 3),
+        "docBytes": round(sum(scan_bytes) / size),
+        "docBytesWithTokens": round(sum(indexed_bytes) / size),
+        "scanMsPerQuery": round(scan_time / n * 1000, 3),
+        "indexMsPerQuery": round(index_time / n * 1000, 3),
+        "scanDocsPerQuery": round(scan_read / n, 1),
+        "indexDocsPerQuery": round(index_read / n, 1),
+        "scanKbPerQuery": round(sum(scan_bytes) / 1024, 1),
+        "indexKbPerQuery": round(downloaded / n / 1024, 1),
+        "recall": round(index_found / scan_found, 4) if scan_found else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full-scan vs indexed course search")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated catalog sizes (default 1000,10000,100000)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sample = WordSampler(make_vocabulary(rng), rng)
+    queries = make_queries(args.queries, sample, rng)
+    results = []
+    print(f"{'size':>8} {'layout':>13} {'tokens':>7} {'doc B':>6} {'scan ms':>9} {'index ms':>9} "
+          f"{'scan docs':>10} {'index docs':>11} {'scan KB':>9} {'index KB':>9} {'recall':>7}")
+    for size in [int(value) for value in args.sizes.split(",") if value]:
+        courses = [make_course(i, sample, rng) for i in range(size)]
+        for layout in LAYOUTS:
+            result = run(courses, queries, layout)
+            results.append(result)
+            print(f"{size:>8} {layout:>13} {result['tokensPerCourse']:>7} "
+                  f"{result['docBytesWithTokens']:>6} {result['scanMsPerQuery']:>9.3f} "
+                  f"{result['indexMsPerQuery']:>9.3f} {result['scanDocsPerQuery']:>10.1f} "
+                  f"{result['indexDocsPerQuery']:>11.1f} {result['scanKbPerQuery']:>9.1f} "
+                  f"{result['indexKbPerQuery']:>9.1f} {result['recall']:>7.4f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+End-to-end seeding benchmark against the fake Firestore server (or the emulator)
+
+Seeds synthetic catalogs of the requested sizes and reports docs/sec, p50/p99
+request latency and peak RSS. Each size runs in its own process so the RSS
+figure belongs to that run alone.
+
+    python bench_seed.py --sizes 1000,10000,100000 --mode batch
+    python bench_seed.py --sizes 1000 --mode single --latency-ms 20 --error-rate 0.02
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from add_data_rest import start_upload, upload_documents
+from firestore_http import FirestoreTarget, get_session
+from run_report import percentile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_PROJECT = "bench-project"
+BENCH_COLLECTION = "bench_lessons"
+
+
+def make_document(index):
+    """A lesson-shaped synthetic document"""
+    return {
+        "id": f"lesson_{index:07d}",
+        "courseId": f"course_{index // 20:05d}",
+        "title": f"Synthetic Lesson {index}",
+        "description": "Generated for the seeding benchmark. " * 4,
+        "type": "video",
+        "order": index % 20 + 1,
+        "duration": 30 + index % 45,
+        "videoUrl": f"https://example.com/videos/{index}.mp4",
+        "isPublished": True,
+        "isFree": index % 5 == 0,
+        "createdAt": datetime.now(),
+        "updatedAt": datetime.now(),
+        "attachments": [],
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_one(size, mode, emulator_host, concurrency):
+    """Seed `size` documents and return the measurements for this process"""
+    latencies = []
+    target = FirestoreTarget(BENCH_PROJECT, emulator_host=emulator_host)
+    upload_options = start_upload(batch=mode == "batch", concurrency=concurrency,
+                                  rate=1e6, max_rate=1e6, target=target, journal=False)
+    get_session().add_listener(lambda event: latencies.append(event.elapsed))
+
+    documents = (make_document(i) for i in range(size))
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        failed = upload_documents(BENCH_COLLECTION, documents, **upload_options)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "size": size,
+        "mode": mode,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "docsPerSecond": round(size / elapsed, 1),
+        "requests": len(latencies),
+        "p50Ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99Ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "failed": len(failed),
+        "peakRssMb": round(peak_rss_mb(), 1) if resource else None,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Fake Firestore server did not start on port {port}")
+
+
+def start_fake_process(args):
+    """Run the fake server in its own process so it does not skew RSS or CPU"""
+    port = free_port()
+    command = [sys.executable, os.path.join(SCRIPT_DIR, "fake_firestore.py"),
+               "--port", str(port), "--no-store",
+               "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+               "--error-rate", str(args.error_rate),
+               "--write-error-rate", str(args.write_error_rate),
+               "--retry-after", "0.1"]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    wait_for_port(port)
+    return process, f"127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark seeding throughput offline")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated catalog sizes (default 1000,10000,100000)")
+    parser.add_argument("--mode", choices=["batch", "single", "both"], default="batch",
+                        help="batchWrite requests, one PATCH per document, or both")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--emulator-host",
+                        help="benchmark an already running emulator instead of the bundled fake server")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake server latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="fake server latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake server 429/503 rate")
+    parser.add_argument("--write-error-rate", type=float, default=0.0,
+                        help="fake server per-write failure rate")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_one(args.child, args.mode, args.emulator_host, args.concurrency)))
+        return
+
+    server = None
+    emulator_host = args.emulator_host
+    if not emulator_host:
+        server, emulator_host = start_fake_process(args)
+
+    modes = ["batch", "single"] if args.mode == "both" else [args.mode]
+    results = []
+    print(f"{'size':>8} {'mode':>7} {'docs/s':>10} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'requests':>9} {'failed':>7} {'RSS MB':>7}")
+    try:
+        for size in [int(value) for value in args.sizes.split(",") if value]:
+            for mode in modes:
+                command = [sys.executable, os.path.abspath(__file__), "--child", str(size),
+                           "--mode", mode, "--concurrency", str(args.concurrency),
+                           "--emulator-host", emulator_host]
+                output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                results.append(result)
+                print(f"{size:>8} {mode:>7} {result['docsPerSecond']:>10.1f} {result['p50Ms']:>8.2f} "
+                      f"{result['p99Ms']:>8.2f} {result['requests']:>9} {result['failed']:>7} "
+                      f"{result['peakRssMb'] if result['peakRssMb'] is not None else '-':>7}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
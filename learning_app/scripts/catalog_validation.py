@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Referential-integrity checks for the catalog before anything is uploaded
+
+Courses, lessons and quizzes are each read once while hash indexes (course
+IDs, lesson -> course, (course, order) -> lesson) are built on the way, so
+validation is linear in the size of the catalog and quizzes can be streamed
+without being held in memory. Every problem is collected, so one run
+reports all of them instead of stopping at the first.
+"""
+
+# Problems printed in full; the rest are only counted
+MAX_REPORTED = 50
+
+
+class CatalogError(Exception):
+    """The catalog has dangling references or inconsistent lessons/questions"""
+
+    def __init__(self, problems):
+        super().__init__(f"Catalog validation found {len(problems)} problems")
+        self.problems = problems
+
+
+class CatalogValidator:
+    """Indexes of the catalog read so far and the problems found in it"""
+
+    def __init__(self):
+        self.course_ids = set()
+        self.lesson_courses = {}  # lesson_id -> course_id
+        self.lesson_orders = {}  # (course_id, order) -> lesson_id
+        self.quiz_ids = set()
+        self.counts = {"courses": 0, "lessons": 0, "quizzes": 0, "questions": 0}
+        self.problems = []
+
+    def add_courses(self, courses):
+        for course in courses:
+            self.counts["courses"] += 1
+            course_id = course.get("id")
+            if course_id in self.course_ids:
+                self.problems.append(f"courses/{course_id}: duplicate course ID")
+            self.course_ids.add(course_id)
+
+    def add_lessons(self, lessons):
+        """Check lessons against the courses added before them"""
+        for lesson in lessons:
+            self.counts["lessons"] += 1
+            lesson_id = lesson.get("id")
+            course_id = lesson.get("courseId")
+            key = f"lessons/{lesson_id}"
+            if lesson_id in self.lesson_courses:
+                self.problems.append(f"{key}: duplicate lesson ID")
+            self.lesson_courses[lesson_id] = course_id
+            if course_id not in self.course_ids:
+                self.problems.append(f"{key}: courseId {course_id!r} is not a course")
+            order = lesson.get("order")
+            if order is None:
+                continue
+            other = self.lesson_orders.setdefault((course_id, order), lesson_id)
+            if other != lesson_id:
+                self.problems.append(f"{key}: order {order} is already used by {other} "
+                                     f"in course {course_id!r}")
+
+    def add_quizzes(self, quizzes):
+        """Check built quiz documents against the lessons added before them"""
+        for quiz in quizzes:
+            self.counts["quizzes"] += 1
+            quiz_id = quiz.get("id")
+            key = f"quizzes/{quiz_id}"
+            if quiz_id in self.quiz_ids:
+                self.problems.append(f"{key}: duplicate quiz ID")
+            self.quiz_ids.add(quiz_id)
+            lesson_id = quiz.get("lessonId")
+            if lesson_id not in self.lesson_courses:
+                self.problems.append(f"{key}: lessonId {lesson_id!r} is not a lesson")
+            elif self.lesson_courses[lesson_id] != quiz.get("courseId"):
+                self.problems.append(f"{key}: courseId {quiz.get('courseId')!r} does not match "
+                                     f"lesson {lesson_id} in course {self.lesson_courses[lesson_id]!r}")
+            self._check_questions(key, quiz.get("questions") or [])
+
+    def _check_questions(self, key, questions):
+        question_ids = set()
+        for question in questions:
+            self.counts["questions"] += 1
+            question_id = question.get("id")
+            if question_id in question_ids:
+                self.problems.append(f"{key}: duplicate question ID {question_id}")
+            question_ids.add(question_id)
+            correct = sum(1 for option in question.get("options") or [] if option.get("isCorrect"))
+            if correct != 1:
+                self.problems.append(f"{key}: question {question_id} has {correct} correct "
+                                     "options instead of exactly one")
+
+    def check(self):
+        """Raise CatalogError if any problem was found"""
+        if self.problems:
+            raise CatalogError(self.problems)
+
+    def summary(self):
+        return ", ".join(f"{count} {name}" for name, count in self.counts.items())
+
+
+def validate_catalog(courses, lessons, quizzes):
+    """Validate a whole catalog and return its validator; raises CatalogError on problems"""
+    validator = CatalogValidator()
+    validator.add_courses(courses)
+    validator.add_lessons(lessons)
+    validator.add_quizzes(quizzes)
+    validator.check()
+    return validator
+
+
+def print_problems(error, limit=MAX_REPORTED):
+    for problem in error.problems[:limit]:
+        print(f"[ERROR] {problem}")
+    if len(error.problems) > limit:
+        print(f"[ERROR] ... and {len(error.problems) - limit} more")
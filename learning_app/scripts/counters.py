@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Course counters (enrolledCount and rating) kept by server-side field transforms
+
+Seeding with --counters increment leaves the counter fields out of the
+course updateMask, so re-seeding never clobbers live counts, and only adds
+increment-by-zero transforms that create them on new courses. Counts then
+change through increments in :commit requests, never by overwriting:
+
+    python counters.py enroll --course flutter_basics            # enrolledCount += 1
+    python counters.py rate --course flutter_basics --stars 5    # ratingTotal += 5, ratingCount += 1
+
+The rating average is ratingTotal / ratingCount. A high-traffic course can
+be switched to sharded counters, after which increments land on a random
+courses/{id}/counter_shards/{n} document instead of the course itself, and
+the reconcile job sums the shards back into the course document and
+recomputes every rating:
+
+    python counters.py shard --course flutter_basics --shards 10
+    python counters.py reconcile
+"""
+
+import argparse
+import sys
+
+from add_data_rest import (DEFAULT_TARGET, add_target_arguments, chunked, send_writes,
+                           target_from_args)
+from course_counters import (SHARD_COLLECTION, SHARD_FIELDS, increment_write, reconciled,
+                             shard_writes)
+from firestore_codec import decode_document, encode_document
+from firestore_http import configure_session
+from firestore_query import QueryError, iter_query, structured_query
+from upload_engine import DEFAULT_CONCURRENCY, DEFAULT_RATE, UploadEngine
+
+# Reconciled course documents per :batchWrite
+RECONCILE_BATCH = 100
+DEFAULT_SHARDS = 10
+
+
+class CounterError(Exception):
+    """A counter command could not be applied"""
+
+
+def shard_totals(send):
+    """Summed shard fields per course ID, from one scan of every counter shard"""
+    totals = {}
+    for document in iter_query(structured_query(SHARD_COLLECTION, all_descendants=True), send):
+        segments = document["name"].split("/documents/", 1)[1].split("/")
+        if len(segments) != 4 or segments[0] != "courses":
+            continue
+        sums = totals.setdefault(segments[1], dict.fromkeys(SHARD_FIELDS, 0))
+        for field, value in decode_document(document).items():
+            if field in sums and isinstance(value, (int, float)):
+                sums[field] += value
+    return totals
+
+
+class CounterClient:
+    """Session, engine and target shared by the counter commands"""
+
+    def __init__(self, target, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE):
+        self.target = target
+        self.session = configure_session(pool_size=max(concurrency, 4))
+        self.engine = UploadEngine(concurrency=concurrency, rate=rate)
+
+    def query(self, body):
+        return self.engine.send_one(body, lambda job: self.session.post(
+            self.target.run_query_url, json=job, headers=self.target.headers))
+
+    def get(self, path):
+        """(decoded fields, updateTime) of a document"""
+        response = self.session.get(self.target.document_url(path), headers=self.target.headers)
+        if response.status_code == 404:
+            raise CounterError(f"{path} does not exist")
+        if response.status_code != 200:
+            raise CounterError(f"Reading {path} failed: HTTP {response.status_code} {response.text[:200]}")
+        document = response.json()
+        return decode_document(document), document["updateTime"]
+
+    def commit(self, writes, atomic=True):
+        return send_writes(writes, atomic=atomic, engine=self.engine, target=self.target)
+
+
+def add_to_course(client, course_id, deltas):
+    course, _ = client.get(f"courses/{course_id}")
+    shards = int(course.get("counterShards") or 0)
+    key, write = increment_write(client.target, course_id, deltas, shards)
+    if client.commit([(key, write)]):
+        return 1
+    changes = ", ".join(f"{field} {value:+g}" for field, value in deltas.items())
+    print(f"[OK] {key}: {changes}")
+    return 0
+
+
+def shard_course(client, course_id, shards):
+    course, update_time = client.get(f"courses/{course_id}")
+    if course.get("counterShards"):
+        raise CounterError(f"courses/{course_id} already has {course['counterShards']} counter shards")
+    if client.commit(shard_writes(client.target, course_id, course, update_time, shards)):
+        print("[ERROR] The course changed while it was being sharded; run the command again")
+        return 1
+    print(f"[OK] courses/{course_id} now spreads its counters over {shards} shards")
+    return 0
+
+
+def reconcile(client, dry_run=False):
+    """Write the summed shards and recomputed ratings into every course that is out of date"""
+    totals = shard_totals(client.query)
+    updates, courses = [], 0
+    for document in iter_query(structured_query("courses"), client.query):
+        courses += 1
+        course_id = document["name"].rsplit("/", 1)[1]
+        update = reconciled(decode_document(document), totals.get(course_id))
+        if update:
+            updates.append((f"courses/{course_id}", {
+                "update": dict(encode_document(update), name=document["name"]),
+                "updateMask": {"fieldPaths": sorted(update)},
+                "currentDocument": {"exists": True},
+            }))
+    print(f"[REPORT] {courses} courses, {len(totals)} with counter shards, "
+          f"{len(updates)} out of date")
+    if dry_run:
+        for key, write in updates:
+            print(f"[DRY RUN] Would update {key}: {', '.join(write['updateMask']['fieldPaths'])}")
+        return 0
+    failed = []
+    for batch in chunked(updates, RECONCILE_BATCH):
+        failed += client.commit(batch, atomic=False)
+    if failed:
+        print(f"[ERROR] {len(failed)} courses could not be reconciled: {', '.join(failed)}")
+        return 1
+    print(f"[OK] Reconciled {len(updates)} courses")
+    return 0
+
+
+def main(command, target=None, course_id=None, count=1, stars=None, shards=DEFAULT_SHARDS,
+         dry_run=False, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE):
+    client = CounterClient(target or DEFAULT_TARGET, concurrency, rate)
+    if command == "reconcile":
+        return reconcile(client, dry_run)
+    if not course_id:
+        raise CounterError(f"{command} needs --course")
+    if command == "enroll":
+        return add_to_course(client, course_id, {"enrolledCount": count})
+    if command == "rate":
+        if stars is None:
+            raise CounterError("rate needs --stars")
+        return add_to_course(client, course_id, {"ratingTotal": float(stars), "ratingCount": 1})
+    if command == "shard":
+        return shard_course(client, course_id, shards)
+    raise CounterError(f"Unknown command {command}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Update and reconcile course counters")
+    parser.add_argument("command", choices=["enroll", "rate", "shard", "reconcile"],
+                        help="enroll/rate: increment a course's counters; shard: switch a course "
+                             "to sharded counters; reconcile: sum shards into the courses")
+    parser.add_argument("--course", help="course ID for enroll, rate and shard")
+    parser.add_argument("--count", type=int, default=1,
+                        help="enrollments to add; negative to remove (default 1)")
+    parser.add_argument("--stars", type=float, help="rating given, for rate")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS,
+                        help=f"counter shards for shard (default {DEFAULT_SHARDS})")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="with reconcile, print the courses that would change")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"requests in flight (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"initial requests per second (default {DEFAULT_RATE:g})")
+    add_target_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        status = main(args.command, target=target_from_args(args), course_id=args.course,
+                      count=args.count, stars=args.stars, shards=args.shards,
+                      dry_run=args.dry_run, concurrency=args.concurrency, rate=args.rate)
+    except (CounterError, QueryError) as e:
+        print(f"[ERROR] {e}")
+        status = 1
+    sys.exit(status)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Course fields derived from the lessons that are actually seeded
+
+Lessons are grouped by courseId in a single pass while they stream to the
+uploader; each course is then written with its lesson count, total duration,
+free-lesson count and lesson IDs in display order, so the course listing
+can render from one query without reading any lessons.
+"""
+
+
+class CourseAggregator:
+    """Single-pass aggregation of published lessons per course"""
+
+    def __init__(self):
+        self.lessons = {}  # course_id -> [(order, lesson_id, duration, is_free)]
+
+    def add(self, lesson):
+        """Account one lesson; unpublished lessons are not shown to users and are skipped"""
+        if not lesson.get("isPublished", False) or not lesson.get("courseId"):
+            return
+        self.lessons.setdefault(lesson["courseId"], []).append(
+            (lesson.get("order", 0), lesson["id"], lesson.get("duration", 0),
+             bool(lesson.get("isFree", False))))
+
+    def observe(self, lessons):
+        """Pass lessons through unchanged while aggregating them"""
+        for lesson in lessons:
+            self.add(lesson)
+            yield lesson
+
+    def fields(self, course_id):
+        """Derived fields for a course; a course without lessons gets zeros"""
+        lessons = sorted(self.lessons.get(course_id, []))
+        return {
+            "totalLessons": len(lessons),
+            "duration": sum(duration for _, _, duration, _ in lessons),
+            "freeLessons": sum(1 for _, _, _, is_free in lessons if is_free),
+            "lessonIds": [lesson_id for _, lesson_id, _, _ in lessons],
+        }
+
+    def apply(self, course):
+        """Copy of a course with its derived fields filled in"""
+        return dict(course, **self.fields(course["id"]))
+
+    def orphans(self, course_ids):
+        """courseIds referenced by lessons that are not in course_ids"""
+        return sorted(set(self.lessons) - set(course_ids))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Write messages for course counters that only ever change by increments
+
+enrolledCount, ratingTotal and ratingCount are updated with server-side
+increment transforms, never overwritten, and rating is derived as
+ratingTotal / ratingCount. Seeded courses start with the catalog rating
+counted as SEED_RATING_COUNT ratings, so real ratings move the average
+instead of replacing it. A course with counterShards = N keeps its
+counts in courses/{id}/counter_shards/{0..N-1}; the course fields then
+hold the sum of the shards as of the last reconciliation.
+"""
+
+import random
+
+from firestore_codec import encode_document, encode_value
+from firestore_query import field_path
+
+# Course fields owned by the counters rather than the catalog, with their zero values
+COUNTER_FIELDS = {"enrolledCount": 0, "rating": 0.0, "ratingTotal": 0.0, "ratingCount": 0}
+# Fields every shard carries; rating is derived from them
+SHARD_FIELDS = ("enrolledCount", "ratingTotal", "ratingCount")
+SHARD_COLLECTION = "counter_shards"
+COUNTER_MODES = ("overwrite", "increment")
+# How many ratings the catalog rating of a seeded course is worth
+SEED_RATING_COUNT = 10
+
+
+def increment(field, value):
+    """fieldTransform adding value to a numeric field; a missing field starts from value"""
+    return {"fieldPath": field_path(field), "increment": encode_value(value)}
+
+
+def maximum(field, encoded):
+    """fieldTransform raising a numeric field to at least an encoded value; a missing field becomes it"""
+    return {"fieldPath": field_path(field), "maximum": encoded}
+
+
+def seeded_counters(course):
+    """Catalog course with the ratingTotal/ratingCount its rating stands for"""
+    if course.get("rating") is None or course.get("ratingCount"):
+        return course
+    return dict(course, ratingCount=SEED_RATING_COUNT,
+                ratingTotal=float(course["rating"]) * SEED_RATING_COUNT)
+
+
+def counter_safe_write(write):
+    """
+    Course write that leaves live counters alone
+
+    Counter fields are dropped from the update and the updateMask lists the
+    remaining top-level fields, so only catalog fields are replaced (and
+    counterShards, which the catalog never sets, is kept). enrolledCount is
+    incremented by zero, which creates it on a new course. ratingTotal and
+    ratingCount are raised to at least the seeded values, so a new course
+    starts from its catalog rating while live ratings, which only add to the
+    seeded ones, are kept. rating itself is never written: it is derived.
+    """
+    document = write["update"]
+    catalog = document.get("fields", {})
+    fields = {key: value for key, value in catalog.items() if key not in COUNTER_FIELDS}
+    transforms = [increment("enrolledCount", 0)]
+    for field in ("ratingTotal", "ratingCount"):
+        transforms.append(maximum(field, catalog[field]) if field in catalog
+                          else increment(field, COUNTER_FIELDS[field]))
+    return dict(write, update=dict(document, fields=fields),
+                updateMask={"fieldPaths": [field_path(key) for key in fields]},
+                updateTransforms=transforms)
+
+
+def increment_write(target, course_id, deltas, shards=0, rng=random):
+    """(key, write) adding deltas to a course's counters, on a random shard if it is sharded"""
+    if shards:
+        # Shards are created by their first increment
+        key = f"courses/{course_id}/{SHARD_COLLECTION}/{rng.randrange(shards)}"
+    else:
+        key = f"courses/{course_id}"
+    write = {"update": {"name": target.document_name(key), "fields": {}},
+             "updateMask": {"fieldPaths": []},
+             "updateTransforms": [increment(field, value) for field, value in deltas.items()]}
+    if not shards:
+        write["currentDocument"] = {"exists": True}
+    return key, write
+
+
+def shard_writes(target, course_id, course, update_time, shards):
+    """
+    (key, write) pairs that switch a course to sharded counters in one :commit
+
+    The course's current counts move into shard 0, and the updateTime
+    precondition makes the commit fail instead of losing an increment that
+    landed on the course after it was read.
+    """
+    course_key = f"courses/{course_id}"
+    shard_key = f"{course_key}/{SHARD_COLLECTION}/0"
+    carried = {field: course.get(field) or COUNTER_FIELDS[field] for field in SHARD_FIELDS}
+    return [
+        (course_key, {"update": dict(encode_document({"counterShards": shards}),
+                                     name=target.document_name(course_key)),
+                      "updateMask": {"fieldPaths": ["counterShards"]},
+                      "currentDocument": {"updateTime": update_time}}),
+        (shard_key, {"update": {"name": target.document_name(shard_key), "fields": {}},
+                     "updateMask": {"fieldPaths": []},
+                     "updateTransforms": [increment(field, value)
+                                          for field, value in carried.items()]}),
+    ]
+
+
+def reconciled(course, shards):
+    """Counter fields of a course that differ from what its shards and ratings add up to"""
+    fields = {field: course.get(field) for field in SHARD_FIELDS}
+    if course.get("counterShards"):
+        fields.update(shards or dict.fromkeys(SHARD_FIELDS, 0))
+    if fields["ratingCount"]:
+        fields["rating"] = fields["ratingTotal"] / fields["ratingCount"]
+    return {field: value for field, value in fields.items()
+            if value is not None and course.get(field) != value}
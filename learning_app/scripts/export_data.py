@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Export Firestore collections to compressed JSON Lines snapshots
+
+Each collection is split into ranges of document names with the
+partitionQuery API, and the ranges are read concurrently with paged
+runQuery calls. Documents are decoded back to plain JSON (timestamps become
+RFC 3339 strings) and appended to one gzip file per range. Progress is
+checkpointed after every page, so an interrupted export picks up where it
+stopped with --resume.
+
+    python export_data.py --output-dir backup --partitions 8
+    python export_data.py --output-dir backup --resume
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from add_data_rest import DEFAULT_TARGET, add_target_arguments, target_from_args
+from firestore_codec import decode_document, to_json_value
+from firestore_http import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, configure_session
+from upload_engine import DEFAULT_CONCURRENCY, DEFAULT_RATE, MAX_RATE, UploadEngine
+
+DEFAULT_COLLECTIONS = ["courses", "lessons", "quizzes", "quiz_attempts", "course_progress"]
+DEFAULT_PAGE_SIZE = 500
+STATE_FILE = "export_state.json"
+
+
+class ExportError(Exception):
+    """A query failed after every retry"""
+
+
+def name_key(name):
+    """Sort key that orders document names the way Firestore orders __name__"""
+    return tuple(name.split("/"))
+
+
+def collection_query(collection):
+    """Collection-group query over every document of a collection, in name order"""
+    return {
+        "from": [{"collectionId": collection, "allDescendants": True}],
+        "orderBy": [{"field": {"fieldPath": "__name__"}, "direction": "ASCENDING"}],
+    }
+
+
+def reference_cursor(name, before):
+    return {"values": [{"referenceValue": name}], "before": before}
+
+
+def partition_points(collection, partitions, engine, session, target):
+    """Document names that split a collection into at most `partitions` ranges"""
+    if partitions <= 1:
+        return []
+    names, page_token = [], None
+    while True:
+        body = {"structuredQuery": collection_query(collection), "partitionCount": partitions - 1}
+        if page_token:
+            body["pageToken"] = page_token
+        response = engine.send_one(body, lambda job: session.post(
+            target.partition_query_url, json=job, headers=target.headers))
+        if response.status_code != 200:
+            raise ExportError(f"partitionQuery for {collection} failed: "
+                              f"HTTP {response.status_code} {response.text[:200]}")
+        result = response.json()
+        for cursor in result.get("partitions", []):
+            names.extend(value["referenceValue"] for value in cursor.get("values", [])
+                         if "referenceValue" in value)
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            # Cursors from different pages are not guaranteed to be in order
+            return sorted(set(names), key=name_key)
+
+
+def to_record(document, root):
+    """Plain-JSON record of a runQuery document; nested documents keep their path"""
+    path = document["name"][len(root) + 1:]
+    record = to_json_value(decode_document(document))
+    record.setdefault("id", path.rsplit("/", 1)[-1])
+    if path.count("/") > 1:
+        record.setdefault("_path", path)
+    return record
+
+
+class ExportState:
+    """Checkpoint of an export, saved atomically after every page"""
+
+    def __init__(self, output_dir, target):
+        self.path = os.path.join(output_dir, STATE_FILE)
+        self.target = {"project": target.project_id, "database": target.database}
+        self.collections = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Read a previous checkpoint; returns False when there is none for this target"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        if state.get("target") != self.target:
+            raise ExportError(f"{self.path} belongs to an export of {state.get('target')}")
+        self.collections = state.get("collections", {})
+        return True
+
+    def update(self, partition, **fields):
+        """Change a partition's checkpoint fields together and save"""
+        with self.lock:
+            partition.update(fields)
+            self._write()
+
+    def save(self):
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        text = json.dumps({"target": self.target, "collections": self.collections}, indent=2)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+
+
+def export_partition(partition, collection, output_dir, page_size, engine, session, target, state):
+    """Append the partition's remaining pages to its file; returns (documents, bytes) read now"""
+    path = os.path.join(output_dir, partition["file"])
+    root = f"{target.database_path}/documents"
+    documents = bytes_written = 0
+    with open(path, "ab") as f:
+        # Drop a page that was written but not checkpointed before a crash
+        f.truncate(partition["offset"])
+        while not partition["done"]:
+            query = dict(collection_query(collection), limit=page_size)
+            if partition["after"]:
+                query["startAt"] = reference_cursor(partition["after"], before=False)
+            elif partition["start"]:
+                query["startAt"] = reference_cursor(partition["start"], before=True)
+            if partition["end"]:
+                query["endAt"] = reference_cursor(partition["end"], before=True)
+            response = engine.send_one({"structuredQuery": query}, lambda job: session.post(
+                target.run_query_url, json=job, headers=target.headers))
+            if response.status_code != 200:
+                raise ExportError(f"runQuery for {partition['file']} failed: "
+                                  f"HTTP {response.status_code} {response.text[:200]}")
+            page = [item["document"] for item in response.json() if "document" in item]
+            done = len(page) < page_size
+            if not page:
+                state.update(partition, done=done)
+                continue
+            lines = "".join(json.dumps(to_record(document, root), ensure_ascii=False) + "\n"
+                            for document in page)
+            # Each page is a complete gzip member; concatenated members are one valid file
+            f.write(gzip.compress(lines.encode("utf-8")))
+            f.flush()
+            os.fsync(f.fileno())
+            bytes_written += f.tell() - partition["offset"]
+            documents += len(page)
+            state.update(partition, offset=f.tell(), after=page[-1]["name"],
+                         documents=partition["documents"] + len(page), done=done)
+        if not partition["offset"]:
+            # An empty range still gets a valid gzip file: one empty member
+            f.write(gzip.compress(b""))
+            f.flush()
+            os.fsync(f.fileno())
+            bytes_written += f.tell()
+            state.update(partition, offset=f.tell())
+    return documents, bytes_written
+
+
+def export_collection(collection, output_dir, partitions, page_size, engine, session, target, state):
+    """Export one collection and return its summary"""
+    start = time.perf_counter()
+    if collection not in state.collections:
+        points = partition_points(collection, partitions, engine, session, target)
+        bounds = [None] + points + [None]
+        state.collections[collection] = {"partitions": [
+            {"file": f"{collection}-{i:04d}.jsonl.gz", "start": bounds[i], "end": bounds[i + 1],
+             "after": None, "offset": 0, "documents": 0, "done": False}
+            for i in range(len(bounds) - 1)
+        ]}
+        state.save()
+    ranges = state.collections[collection]["partitions"]
+    pending = [partition for partition in ranges if not partition["done"]]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(engine.concurrency, len(pending) or 1))) as pool:
+        futures = [pool.submit(export_partition, partition, collection, output_dir, page_size,
+                               engine, session, target, state) for partition in pending]
+        results = [future.result() for future in futures]
+
+    seconds = time.perf_counter() - start
+    documents = sum(count for count, _ in results)
+    summary = {
+        "partitions": len(ranges),
+        "documents": sum(partition["documents"] for partition in ranges),
+        "documentsThisRun": documents,
+        "bytesWritten": sum(size for _, size in results),
+        "seconds": round(seconds, 3),
+        "docsPerSecond": round(documents / seconds, 1) if seconds else 0.0,
+    }
+    print(f"[EXPORT] {collection}: {summary['documents']} documents in {len(ranges)} files "
+          f"({documents} read now, {summary['bytesWritten'] / 1024:.1f} KB), "
+          f"{summary['seconds']} s, {summary['docsPerSecond']} docs/s")
+    return summary
+
+
+def main(collections=DEFAULT_COLLECTIONS, output_dir="export", resume=False, partitions=None,
+         page_size=DEFAULT_PAGE_SIZE, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+         max_rate=MAX_RATE, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+         target=None, report_path=None):
+    target = target or DEFAULT_TARGET
+    os.makedirs(output_dir, exist_ok=True)
+    state = ExportState(output_dir, target)
+    if resume and state.load():
+        print(f"Resuming export of {target} into {output_dir}...")
+    else:
+        for collection in collections:
+            for name in os.listdir(output_dir):
+                if name.startswith(f"{collection}-") and name.endswith(".jsonl.gz"):
+                    os.remove(os.path.join(output_dir, name))
+        print(f"Exporting {target} into {output_dir}...")
+
+    session = configure_session(pool_size=max(pool_size, concurrency), timeout=timeout)
+    engine = UploadEngine(concurrency=concurrency, rate=rate, max_rate=max_rate)
+    start = time.perf_counter()
+    summaries = {}
+    for collection in collections:
+        summaries[collection] = export_collection(collection, output_dir, partitions or concurrency,
+                                                  page_size, engine, session, target, state)
+
+    seconds = time.perf_counter() - start
+    documents = sum(summary["documentsThisRun"] for summary in summaries.values())
+    report = {
+        "seconds": round(seconds, 3),
+        "documents": sum(summary["documents"] for summary in summaries.values()),
+        "docsPerSecond": round(documents / seconds, 1) if seconds else 0.0,
+        "collections": summaries,
+    }
+    session.print_stats()
+    print(f"[EXPORT] {report['documents']} documents in {report['seconds']} s "
+          f"({report['docsPerSecond']} docs/s)")
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[REPORT] Export report written to {report_path}")
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export Firestore collections to gzipped JSON Lines")
+    parser.add_argument("--collections", default=",".join(DEFAULT_COLLECTIONS),
+                        help=f"comma-separated collection IDs (default {','.join(DEFAULT_COLLECTIONS)})")
+    parser.add_argument("--output-dir", default="export", help="directory for the snapshot files")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the export checkpointed in --output-dir")
+    parser.add_argument("--partitions", type=int,
+                        help="ranges to split each collection into (default: --concurrency)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"documents per runQuery page (default {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"ranges read in parallel (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"initial requests per second; adapts to throttling (default {DEFAULT_RATE:g})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT[1],
+                        help=f"per-request read timeout in seconds (default {DEFAULT_TIMEOUT[1]:g})")
+    add_target_arguments(parser)
+    parser.add_argument("--report", metavar="PATH", help="write a JSON export report to PATH")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        main(collections=[c for c in args.collections.split(",") if c],
+             output_dir=args.output_dir, resume=args.resume, partitions=args.partitions,
+             page_size=args.page_size, concurrency=args.concurrency, rate=args.rate,
+             timeout=(DEFAULT_TIMEOUT[0], args.timeout),
+             target=target_from_args(args),
+             report_path=args.report)
+    except ExportError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Lightweight in-memory fake of the Firestore REST API for offline testing
+
+Implements the document endpoints the scripts use (PATCH/GET/DELETE on
+documents, :batchGet, :batchWrite, :commit, :runQuery and :partitionQuery, including
+currentDocument preconditions and increment/maximum field transforms) with
+configurable latency and error injection. Point the scripts at it like the emulator:
+
+    python fake_firestore.py --port 8085 --latency-ms 20 --error-rate 0.01
+    python add_data_rest.py --emulator-host localhost:8085 --batch
+"""
+
+import argparse
+import functools
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from firestore_codec import GeoPoint, Reference, decode_value
+
+_PATH_RE = re.compile(r"^/v1/(projects/[^/]+/databases/[^/]+/documents)(?:/(.*?))?(?::(\w+))?$")
+
+# gRPC status codes used in per-write statuses
+NOT_FOUND = 5
+ALREADY_EXISTS = 6
+FAILED_PRECONDITION = 9
+UNAVAILABLE = 14
+
+# Firestore's ordering of values of different types
+_TYPE_ORDER = ["nullValue", "booleanValue", "number", "timestampValue", "stringValue",
+               "bytesValue", "referenceValue", "geoPointValue", "arrayValue", "mapValue"]
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class FakeFirestore:
+    """In-memory document store with latency and error injection"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 write_error_rate=0.0, retry_after=1.0, store=True, seed=None):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.write_error_rate = write_error_rate
+        self.retry_after = retry_after
+        self.store = store
+        self.random = random.Random(seed)
+        self.documents = {}
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+    def should_fail(self, rate):
+        return rate > 0 and self.random.random() < rate
+
+    def put(self, name, fields, mask=None):
+        """Create or update a document; a mask limits the update to those top-level fields"""
+        now = _now()
+        with self.lock:
+            existing = self.documents.get(name)
+            if mask is not None and existing is not None:
+                merged = json.loads(json.dumps(existing["fields"]))
+                for path in mask:
+                    _apply_mask_path(merged, fields, _split_path(path))
+                fields = merged
+            document = {
+                "name": name,
+                "fields": fields,
+                "createTime": existing["createTime"] if existing else now,
+                "updateTime": now,
+            }
+            if self.store:
+                self.documents[name] = document
+        return document
+
+    def get(self, name):
+        with self.lock:
+            return self.documents.get(name)
+
+    def delete(self, name):
+        with self.lock:
+            self.documents.pop(name, None)
+
+    def query(self, parent, query):
+        """Documents under parent (a documents root or document name) matching a structuredQuery"""
+        selector = query["from"][0]
+        collection, all_descendants = selector["collectionId"], selector.get("allDescendants", False)
+        with self.lock:
+            candidates = list(self.documents.values())
+        documents = []
+        for document in candidates:
+            if not document["name"].startswith(parent + "/"):
+                continue
+            segments = document["name"][len(parent) + 1:].split("/")
+            if segments[-2] != collection or (len(segments) != 2 and not all_descendants):
+                continue
+            if _matches(document, query.get("where")):
+                documents.append(document)
+
+        orders = [(order["field"]["fieldPath"], order.get("direction", "ASCENDING"))
+                  for order in query.get("orderBy", [])]
+        if not any(path == "__name__" for path, _ in orders):
+            orders.append(("__name__", orders[-1][1] if orders else "ASCENDING"))
+        documents.sort(key=functools.cmp_to_key(
+            lambda a, b: _compare_documents(a, b, orders)))
+
+        start, end = query.get("startAt"), query.get("endAt")
+        if start:
+            documents = [d for d in documents
+                         if _compare_cursor(d, start, orders) >= (0 if start.get("before") else 1)]
+        if end:
+            documents = [d for d in documents
+                         if _compare_cursor(d, end, orders) <= (-1 if end.get("before") else 0)]
+        documents = documents[query.get("offset", 0):]
+        if "limit" in query:
+            documents = documents[:query["limit"]]
+        return documents
+
+    def partition_points(self, parent, query, count):
+        """Up to count document names that split a collection group into even ranges"""
+        documents = self.query(parent, {"from": query["from"]})
+        count = min(count, len(documents) - 1)
+        if count <= 0:
+            return []
+        step = len(documents) / (count + 1)
+        return [documents[int(step * (i + 1))]["name"] for i in range(count)]
+
+    def transform(self, name, transforms):
+        """Apply increment/maximum field transforms to a stored document"""
+        results = []
+        with self.lock:
+            document = self.documents.get(name)
+            if document is None:
+                return results
+            for transform in transforms:
+                path = _split_path(transform["fieldPath"])
+                parent = document["fields"]
+                for segment in path[:-1]:
+                    parent = parent.setdefault(segment, {"mapValue": {"fields": {}}})
+                    parent = parent["mapValue"].setdefault("fields", {})
+                current = parent.get(path[-1])
+                if "increment" in transform:
+                    value = _add(current, transform["increment"])
+                elif "maximum" in transform:
+                    value = _maximum(current, transform["maximum"])
+                else:
+                    raise ValueError(f"Unsupported field transform {transform}")
+                parent[path[-1]] = value
+                results.append(value)
+        return results
+
+    def apply_write(self, write):
+        """Apply one Write message and return its WriteResult; raises WriteError on a precondition"""
+        name = write["delete"] if "delete" in write else write["update"]["name"]
+        precondition = write.get("currentDocument", {})
+        stored = self.get(name)
+        exists = precondition.get("exists")
+        if exists is not None and (stored is not None) != exists:
+            if exists:
+                raise WriteError(404, NOT_FOUND, "NOT_FOUND", f"No document to update: {name}")
+            raise WriteError(409, ALREADY_EXISTS, "ALREADY_EXISTS", f"Document already exists: {name}")
+        update_time = precondition.get("updateTime")
+        if update_time is not None and (stored is None or stored["updateTime"] != update_time):
+            raise WriteError(400, FAILED_PRECONDITION, "FAILED_PRECONDITION",
+                             f"The document was modified since {update_time}: {name}")
+        if "delete" in write:
+            self.delete(name)
+            return {"updateTime": _now()}
+        document = write["update"]
+        mask = write.get("updateMask", {}).get("fieldPaths")
+        stored = self.put(name, document.get("fields", {}), mask)
+        result = {"updateTime": stored["updateTime"]}
+        if write.get("updateTransforms"):
+            result["transformResults"] = self.transform(name, write["updateTransforms"])
+        return result
+
+
+class WriteError(Exception):
+    """A write rejected by its precondition"""
+
+    def __init__(self, http_status, code, status, message):
+        super().__init__(message)
+        self.http_status = http_status
+        self.code = code
+        self.status = status
+
+
+def _number(value):
+    if value and "integerValue" in value:
+        return int(value["integerValue"])
+    if value and "doubleValue" in value:
+        return float(value["doubleValue"])
+    return None
+
+
+def _encode_number(number):
+    return {"integerValue": str(number)} if isinstance(number, int) else {"doubleValue": number}
+
+
+def _add(current, operand):
+    """Firestore increment: a missing or non-numeric field becomes the operand"""
+    base, delta = _number(current), _number(operand)
+    return operand if base is None else _encode_number(base + delta)
+
+
+def _maximum(current, operand):
+    base, other = _number(current), _number(operand)
+    return operand if base is None or other > base else current
+
+
+def _split_path(path):
+    """Segments of a field path, honouring back-quoted segments"""
+    return [quoted.replace("\\`", "`") if quoted else plain
+            for quoted, plain in re.findall(r"`((?:[^`\\]|\\.)*)`|([^.]+)", path)]
+
+
+def _apply_mask_path(target, source, segments):
+    """Copy the value at segments from source fields into target fields (or delete it)"""
+    head, rest = segments[0], segments[1:]
+    if not rest:
+        if head in source:
+            target[head] = source[head]
+        else:
+            target.pop(head, None)
+        return
+    source_child = source.get(head, {}).get("mapValue", {}).get("fields", {})
+    target_value = target.get(head)
+    if target_value is None or "mapValue" not in target_value:
+        target_value = target[head] = {"mapValue": {"fields": {}}}
+    _apply_mask_path(target_value["mapValue"].setdefault("fields", {}), source_child, rest)
+
+
+def _field(document, path):
+    """Raw Firestore value at a dotted field path, or None when missing"""
+    if path == "__name__":
+        return {"referenceValue": document["name"]}
+    value = {"mapValue": {"fields": document.get("fields", {})}}
+    for part in _split_path(path):
+        value = value.get("mapValue", {}).get("fields", {}).get(part)
+        if value is None:
+            return None
+    return value
+
+
+def _sort_key(value):
+    """Comparable key of a raw Firestore value"""
+    kind = next(iter(value))
+    if kind in ("integerValue", "doubleValue"):
+        kind = "number"
+    decoded = decode_value(value)
+    if isinstance(decoded, Reference):
+        decoded = tuple(decoded.name.split("/"))
+    elif isinstance(decoded, GeoPoint):
+        decoded = (decoded.latitude, decoded.longitude)
+    elif isinstance(decoded, list):
+        decoded = tuple(_sort_key(item) for item in value["arrayValue"].get("values", []))
+    elif isinstance(decoded, dict):
+        decoded = tuple(sorted((key, _sort_key(item))
+                               for key, item in value["mapValue"].get("fields", {}).items()))
+    elif decoded is None:
+        decoded = 0
+    return _TYPE_ORDER.index(kind), decoded
+
+
+def _compare(a, b):
+    return (a > b) - (a < b)
+
+
+def _compare_documents(a, b, orders):
+    for path, direction in orders:
+        result = _compare(_sort_key(_field(a, path) or {"nullValue": None}),
+                          _sort_key(_field(b, path) or {"nullValue": None}))
+        if result:
+            return -result if direction == "DESCENDING" else result
+    return 0
+
+
+def _compare_cursor(document, cursor, orders):
+    """Compare a document with a cursor position over the cursor's values"""
+    for (path, direction), value in zip(orders, cursor.get("values", [])):
+        result = _compare(_sort_key(_field(document, path) or {"nullValue": None}),
+                          _sort_key(value))
+        if result:
+            return -result if direction == "DESCENDING" else result
+    return 0
+
+
+def _matches(document, where):
+    """Evaluate a structuredQuery filter (field, unary and AND/OR composite filters)"""
+    if not where:
+        return True
+    if "compositeFilter" in where:
+        composite = where["compositeFilter"]
+        results = (_matches(document, f) for f in composite.get("filters", []))
+        return any(results) if composite.get("op") == "OR" else all(results)
+    if "unaryFilter" in where:
+        unary = where["unaryFilter"]
+        value = _field(document, unary["field"]["fieldPath"])
+        is_null = value is not None and "nullValue" in value
+        return {"IS_NULL": is_null, "IS_NOT_NULL": value is not None and not is_null}.get(
+            unary["op"], False)
+
+    field_filter = where["fieldFilter"]
+    value = _field(document, field_filter["field"]["fieldPath"])
+    op, operand = field_filter["op"], field_filter["value"]
+    if value is None:
+        return False
+    key = _sort_key(value)
+    if op in ("ARRAY_CONTAINS", "ARRAY_CONTAINS_ANY"):
+        items = {_sort_key(item) for item in value.get("arrayValue", {}).get("values", [])}
+        wanted = ([operand] if op == "ARRAY_CONTAINS"
+                  else operand.get("arrayValue", {}).get("values", []))
+        return any(_sort_key(item) in items for item in wanted)
+    if op in ("IN", "NOT_IN"):
+        options = {_sort_key(item) for item in operand.get("arrayValue", {}).get("values", [])}
+        return (key in options) == (op == "IN")
+    other = _sort_key(operand)
+    if key[0] != other[0] and op != "NOT_EQUAL":
+        return False
+    return {
+        "EQUAL": key == other,
+        "NOT_EQUAL": key != other,
+        "LESS_THAN": key < other,
+        "LESS_THAN_OR_EQUAL": key <= other,
+        "GREATER_THAN": key > other,
+        "GREATER_THAN_OR_EQUAL": key >= other,
+    }.get(op, False)
+
+
+class FakeFirestoreHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeFirestore/1.0"
+    # Send headers and body in one segment; avoids Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+    wbufsize = 1 << 16
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return json.loads(body) if body else {}
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_status(self, status, code, message, headers=None):
+        self.send_json(status, {"error": {"code": status, "status": code, "message": message}}, headers)
+
+    def dispatch(self, method):
+        parts = urlsplit(self.path)
+        match = _PATH_RE.match(parts.path)
+        # Always drain the body so keep-alive connections stay usable
+        payload = self.read_json() if method in ("POST", "PATCH") else {}
+        if not match:
+            return self.send_error_status(404, "NOT_FOUND", f"Unknown path {parts.path}")
+
+        root, doc_path, action = match.groups()
+        self.fake.count(f"{method} {action or 'document'}")
+        self.fake.delay()
+        if self.fake.should_fail(self.fake.error_rate):
+            status, code = self.fake.random.choice([(429, "RESOURCE_EXHAUSTED"), (503, "UNAVAILABLE")])
+            return self.send_error_status(status, code, "Injected failure",
+                                          {"Retry-After": f"{self.fake.retry_after:g}"})
+
+        handler = getattr(self, f"handle_{(action or 'document').lower()}", None)
+        if handler is None:
+            return self.send_error_status(404, "NOT_FOUND", f"Unsupported action {action}")
+        handler(method, root, doc_path, payload, parse_qs(parts.query))
+
+    def handle_document(self, method, root, doc_path, payload, query):
+        name = f"{root}/{doc_path}"
+        if method == "PATCH":
+            mask = query.get("updateMask.fieldPaths")
+            return self.send_json(200, self.fake.put(name, payload.get("fields", {}), mask))
+        if method == "DELETE":
+            self.fake.delete(name)
+            return self.send_json(200, {})
+        document = self.fake.get(name)
+        if document is None:
+            return self.send_error_status(404, "NOT_FOUND", f"Document {name} not found")
+        self.send_json(200, document)
+
+    def handle_batchget(self, method, root, doc_path, payload, query):
+        read_time = _now()
+        results = []
+        for name in payload.get("documents", []):
+            document = self.fake.get(name)
+            if document is None:
+                results.append({"missing": name, "readTime": read_time})
+            else:
+                results.append({"found": document, "readTime": read_time})
+        self.send_json(200, results)
+
+    def handle_batchwrite(self, method, root, doc_path, payload, query):
+        results, statuses = [], []
+        for write in payload.get("writes", []):
+            if self.fake.should_fail(self.fake.write_error_rate):
+                results.append({})
+                statuses.append({"code": UNAVAILABLE, "message": "Injected write failure"})
+                continue
+            try:
+                results.append(self.fake.apply_write(write))
+                statuses.append({})
+            except WriteError as e:
+                results.append({})
+                statuses.append({"code": e.code, "message": str(e)})
+        self.send_json(200, {"writeResults": results, "status": statuses})
+
+    def handle_commit(self, method, root, doc_path, payload, query):
+        writes = payload.get("writes", [])
+        if writes and self.fake.should_fail(self.fake.write_error_rate):
+            return self.send_error_status(409, "ABORTED", "Injected commit failure")
+        try:
+            results = [self.fake.apply_write(write) for write in writes]
+        except WriteError as e:
+            return self.send_error_status(e.http_status, e.status, str(e))
+        self.send_json(200, {"writeResults": results, "commitTime": _now()})
+
+    def handle_runquery(self, method, root, doc_path, payload, query):
+        parent = f"{root}/{doc_path}" if doc_path else root
+        documents = self.fake.query(parent, payload.get("structuredQuery", {}))
+        read_time = _now()
+        results = [{"document": document, "readTime": read_time} for document in documents]
+        self.send_json(200, results or [{"readTime": read_time}])
+
+    def handle_partitionquery(self, method, root, doc_path, payload, query):
+        parent = f"{root}/{doc_path}" if doc_path else root
+        names = self.fake.partition_points(parent, payload.get("structuredQuery", {}),
+                                           int(payload.get("partitionCount", 1)))
+        self.send_json(200, {"partitions": [{"values": [{"referenceValue": name}]}
+                                            for name in names]})
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PATCH(self):
+        self.dispatch("PATCH")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+
+def start_fake_server(host="127.0.0.1", port=0, **options):
+    """Start a fake server on a background thread; returns the server (see .fake, .server_port)"""
+    server = ThreadingHTTPServer((host, port), FakeFirestoreHandler)
+    server.daemon_threads = True
+    server.fake = FakeFirestore(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory fake of the Firestore REST API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="+/- random latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 429/503 and Retry-After")
+    parser.add_argument("--write-error-rate", type=float, default=0.0,
+                        help="fraction of batched writes reported as UNAVAILABLE")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on errors")
+    parser.add_argument("--no-store", action="store_true", help="acknowledge writes without keeping them")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), FakeFirestoreHandler)
+    server.daemon_threads = True
+    server.fake = FakeFirestore(args.latency_ms, args.jitter_ms, args.error_rate,
+                                args.write_error_rate, args.retry_after, store=not args.no_store)
+    print(f"Fake Firestore listening on {args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
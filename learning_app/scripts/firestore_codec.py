@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Encoder/decoder between Python values and the Firestore REST value format
+
+Both directions use dispatch tables (Python type -> encoder, Firestore value
+kind -> decoder) instead of isinstance ladders, so every value costs a single
+dict lookup and nested lists/maps are handled by plain recursion.
+"""
+
+import base64
+import math
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+INT64_MIN = -(2 ** 63)
+INT64_MAX = 2 ** 63 - 1
+
+# Firestore-specific value types
+GeoPoint = namedtuple("GeoPoint", ["latitude", "longitude"])
+# Full resource name: projects/{project}/databases/{db}/documents/{path}
+Reference = namedtuple("Reference", ["name"])
+
+
+def _encode_null(value):
+    return {"nullValue": None}
+
+
+def _encode_bool(value):
+    return {"booleanValue": value}
+
+
+def _encode_int(value):
+    if not INT64_MIN <= value <= INT64_MAX:
+        raise OverflowError(f"Integer {value} does not fit in a Firestore 64-bit integer")
+    return {"integerValue": str(value)}
+
+
+def _encode_float(value):
+    if math.isfinite(value):
+        return {"doubleValue": value}
+    # JSON has no NaN/Infinity literals; the REST API accepts these strings
+    if math.isnan(value):
+        return {"doubleValue": "NaN"}
+    return {"doubleValue": "Infinity" if value > 0 else "-Infinity"}
+
+
+def _encode_str(value):
+    return {"stringValue": value}
+
+
+def _encode_bytes(value):
+    return {"bytesValue": base64.b64encode(value).decode("ascii")}
+
+
+def _encode_datetime(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    # Naive datetimes are sent as UTC, as the seeder always did
+    return {"timestampValue": value.isoformat() + "Z"}
+
+
+def _encode_geo_point(value):
+    return {"geoPointValue": {"latitude": float(value.latitude),
+                              "longitude": float(value.longitude)}}
+
+
+def _encode_reference(value):
+    return {"referenceValue": value.name}
+
+
+def _encode_list(value):
+    # Firestore rejects arrays directly inside arrays; they are encoded as-is
+    # and left for the server to report
+    values = []
+    append = values.append
+    for item in value:
+        item_type = type(item)
+        kind = _PASSTHROUGH_KINDS.get(item_type)
+        if kind is not None:
+            append({kind: item})
+        else:
+            append((_ENCODERS.get(item_type) or _resolve_encoder(item_type))(item))
+    return {"arrayValue": {"values": values}}
+
+
+def _encode_dict(value):
+    return {"mapValue": encode_document(value)}
+
+
+# Types whose value is stored unchanged under a fixed key; the hot loops build
+# these inline instead of calling an encoder
+_PASSTHROUGH_KINDS = {
+    type(None): "nullValue",
+    bool: "booleanValue",
+    str: "stringValue",
+}
+
+_ENCODERS = {
+    type(None): _encode_null,
+    bool: _encode_bool,
+    int: _encode_int,
+    float: _encode_float,
+    str: _encode_str,
+    bytes: _encode_bytes,
+    bytearray: _encode_bytes,
+    datetime: _encode_datetime,
+    GeoPoint: _encode_geo_point,
+    Reference: _encode_reference,
+    list: _encode_list,
+    tuple: _encode_list,
+    dict: _encode_dict,
+}
+
+# Subclasses resolve through their MRO; GeoPoint and Reference come first so
+# they are not treated as plain tuples
+_BASE_ENCODERS = [
+    (GeoPoint, _encode_geo_point),
+    (Reference, _encode_reference),
+    (bool, _encode_bool),
+    (int, _encode_int),
+    (float, _encode_float),
+    (str, _encode_str),
+    ((bytes, bytearray), _encode_bytes),
+    (datetime, _encode_datetime),
+    ((list, tuple), _encode_list),
+    (dict, _encode_dict),
+]
+
+
+def _resolve_encoder(value_type):
+    for base, encoder in _BASE_ENCODERS:
+        if issubclass(value_type, base):
+            _ENCODERS[value_type] = encoder
+            return encoder
+    raise TypeError(f"Cannot encode value of type {value_type.__name__} for Firestore")
+
+
+def encode_value(value):
+    """Encode one Python value as a Firestore Value"""
+    encoder = _ENCODERS.get(type(value)) or _resolve_encoder(type(value))
+    return encoder(value)
+
+
+def encode_document(data):
+    """Encode a dict as a Firestore document/map body: {"fields": {...}}"""
+    fields = {}
+    for key, value in data.items():
+        if type(key) is not str:
+            raise TypeError(f"Firestore field names must be strings, got {key!r}")
+        value_type = type(value)
+        kind = _PASSTHROUGH_KINDS.get(value_type)
+        if kind is not None:
+            fields[key] = {kind: value}
+        else:
+            fields[key] = (_ENCODERS.get(value_type) or _resolve_encoder(value_type))(value)
+    return {"fields": fields}
+
+
+_TIMESTAMP_RE = re.compile(
+    r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:\d{2})$"
+)
+
+
+def parse_timestamp(value):
+    """Parse an RFC 3339 timestamp (nanosecond precision allowed) into an aware datetime"""
+    match = _TIMESTAMP_RE.match(value)
+    if not match:
+        raise ValueError(f"Invalid Firestore timestamp: {value!r}")
+    base, fraction, offset = match.groups()
+    parsed = datetime.strptime(base, "%Y-%m-%dT%H:%M:%S")
+    if fraction:
+        parsed = parsed.replace(microsecond=int(fraction[:6].ljust(6, "0")))
+    if offset == "Z":
+        return parsed.replace(tzinfo=timezone.utc)
+    sign = 1 if offset[0] == "+" else -1
+    hours, minutes = int(offset[1:3]), int(offset[4:6])
+    return parsed.replace(tzinfo=timezone(sign * timedelta(hours=hours, minutes=minutes)))
+
+
+def _decode_double(value):
+    return float(value)  # also handles "NaN" / "Infinity" / "-Infinity"
+
+
+def _decode_geo_point(value):
+    return GeoPoint(value.get("latitude", 0.0), value.get("longitude", 0.0))
+
+
+def _decode_array(value):
+    return [decode_value(item) for item in value.get("values", ())]
+
+
+def _decode_map(value):
+    return decode_fields(value.get("fields", {}))
+
+
+_DECODERS = {
+    "nullValue": lambda value: None,
+    "booleanValue": bool,
+    "integerValue": int,
+    "doubleValue": _decode_double,
+    "stringValue": str,
+    "bytesValue": base64.b64decode,
+    "timestampValue": parse_timestamp,
+    "geoPointValue": _decode_geo_point,
+    "referenceValue": Reference,
+    "arrayValue": _decode_array,
+    "mapValue": _decode_map,
+}
+
+
+def decode_value(value):
+    """Decode one Firestore Value into a Python value"""
+    for kind, payload in value.items():
+        decoder = _DECODERS.get(kind)
+        if decoder is None:
+            raise TypeError(f"Unknown Firestore value kind: {kind}")
+        return decoder(payload)
+    raise ValueError("Empty Firestore value")
+
+
+def decode_fields(fields):
+    """Decode a Firestore fields map into a plain dict"""
+    return {key: decode_value(value) for key, value in fields.items()}
+
+
+def decode_document(document):
+    """Decode a Firestore document (as returned by the REST API) into a dict"""
+    return decode_fields(document.get("fields", {}))
+
+
+def to_json_value(value):
+    """Turn a decoded value into plain JSON types (timestamps become RFC 3339 strings)"""
+    if isinstance(value, dict):
+        return {key: to_json_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_json_value(item) for item in value]
+    if isinstance(value, datetime):
+        return value.isoformat().replace("+00:00", "Z")
+    if isinstance(value, GeoPoint):
+        return {"latitude": value.latitude, "longitude": value.longitude}
+    if isinstance(value, Reference):
+        return value.name
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    return value
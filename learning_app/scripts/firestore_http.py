@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for Firestore REST calls
+
+All requests go through one pooled session so TCP/TLS connections are kept
+alive and reused. Large JSON bodies can be gzip-compressed (opt-in until
+compressed request bodies are verified against production Firestore and the
+emulator), every request gets a timeout, and HTTP/2 is available when httpx
+(with h2) is installed.
+"""
+
+import gzip
+import json
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # HTTP/2 support is optional
+    httpx = None
+
+FIRESTORE_HOST = "https://firestore.googleapis.com"
+DEFAULT_POOL_SIZE = 16
+DEFAULT_TIMEOUT = (5.0, 30.0)  # (connect, read) seconds
+GZIP_MIN_BYTES = 1024  # smaller bodies are not worth compressing
+GZIP_LEVEL = 5
+
+# What listeners receive after every request; response is None when it raised
+RequestEvent = namedtuple("RequestEvent", ["method", "url", "payload", "response", "error",
+                                           "elapsed", "body_bytes", "encode_seconds"])
+
+
+class FirestoreTarget:
+    """Project/database that REST calls go to: production, the emulator or a fake server"""
+
+    def __init__(self, project_id, database="(default)", emulator_host=None):
+        self.project_id = project_id
+        self.database = database
+        self.emulator_host = emulator_host
+        if emulator_host:
+            root = emulator_host if "://" in emulator_host else f"http://{emulator_host}"
+        else:
+            root = FIRESTORE_HOST
+        self.database_path = f"projects/{project_id}/databases/{database}"
+        self.base_url = f"{root}/v1/{self.database_path}/documents"
+        self.batch_write_url = f"{self.base_url}:batchWrite"
+        self.commit_url = f"{self.base_url}:commit"
+        self.batch_get_url = f"{self.base_url}:batchGet"
+        self.run_query_url = f"{self.base_url}:runQuery"
+        self.partition_query_url = f"{self.base_url}:partitionQuery"
+        # The emulator treats "owner" as an admin token that bypasses security rules
+        self.headers = {"Authorization": "Bearer owner"} if emulator_host else {}
+
+    def document_url(self, path):
+        """REST URL of a document given its collection/doc_id path"""
+        return f"{self.base_url}/{path}"
+
+    def document_name(self, path):
+        """Full resource name of a document given its collection/doc_id path"""
+        return f"{self.database_path}/documents/{path}"
+
+    def __str__(self):
+        name = self.project_id if self.database == "(default)" else f"{self.project_id}/{self.database}"
+        return f"{name} @ {self.emulator_host}" if self.emulator_host else name
+
+
+class FirestoreSession:
+    """Keep-alive connection pool used for every Firestore REST request"""
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 gzip_requests=False, http2=False):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.gzip_requests = gzip_requests
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+        self.streams = set()
+        self.listeners = []
+
+        if http2 and httpx is None:
+            print("[WARN] httpx is not installed; falling back to HTTP/1.1 (pip install httpx[http2])")
+            http2 = False
+        self.http2 = http2
+
+        if http2:
+            connect, read = timeout
+            self.client = httpx.Client(
+                http2=True,
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(max_connections=pool_size,
+                                    max_keepalive_connections=pool_size),
+            )
+        else:
+            self.client = requests.Session()
+            # Retries are handled by the upload engine, not by urllib3
+            self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size,
+                                       max_retries=0, pool_block=True)
+            self.client.mount("https://", self.adapter)
+            self.client.mount("http://", self.adapter)
+
+    def encode_body(self, payload):
+        """Serialize a JSON payload, gzip-compressing it when large enough"""
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.gzip_requests and len(body) >= GZIP_MIN_BYTES:
+            compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            with self.lock:
+                self.bytes_saved += len(body) - len(compressed)
+            body = compressed
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    def add_listener(self, callback):
+        """Call callback(RequestEvent) after every request"""
+        self.listeners.append(callback)
+
+    def request(self, method, url, json=None, params=None, timeout=None, headers=None):
+        """Send a request with a JSON body through the shared pool"""
+        encode_start = time.perf_counter()
+        body, body_headers = (None, {}) if json is None else self.encode_body(json)
+        encode_seconds = time.perf_counter() - encode_start
+        if headers:
+            body_headers.update(headers)
+        headers = body_headers
+        timeout = timeout or self.timeout
+        start = time.perf_counter()
+
+        try:
+            if self.http2:
+                if isinstance(timeout, tuple):
+                    timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+                response = self.client.request(method, url, content=body, params=params,
+                                               headers=headers, timeout=timeout)
+                stream = response.extensions.get("network_stream")
+            else:
+                response = self.client.request(method, url, data=body, params=params,
+                                               headers=headers, timeout=timeout)
+                stream = None
+        except Exception as e:
+            self.notify(RequestEvent(method, url, json, None, e, time.perf_counter() - start,
+                                     len(body or b""), encode_seconds))
+            raise
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.request_count += 1
+            self.bytes_sent += len(body or b"")
+            if stream is not None:
+                self.streams.add(id(stream))
+        self.notify(RequestEvent(method, url, json, response, None, elapsed,
+                                 len(body or b""), encode_seconds))
+        return response
+
+    def notify(self, event):
+        for listener in self.listeners:
+            listener(event)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def connections_opened(self):
+        """Number of TCP connections opened so far"""
+        if self.http2:
+            return len(self.streams)
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in list(pools.keys()))
+
+    def stats(self):
+        """Request, connection reuse and compression counters"""
+        opened = self.connections_opened()
+        return {
+            "requests": self.request_count,
+            "connectionsOpened": opened,
+            "connectionsReused": max(0, self.request_count - opened),
+            "bytesSent": self.bytes_sent,
+            "gzipBytesSaved": self.bytes_saved,
+            "http2": self.http2,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"[STATS] {stats['requests']} requests over {stats['connectionsOpened']} connections "
+              f"({stats['connectionsReused']} reused), {stats['bytesSent']} bytes sent, "
+              f"{stats['gzipBytesSaved']} bytes saved by gzip")
+
+    def close(self):
+        self.client.close()
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the shared session, creating it with defaults on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = FirestoreSession()
+        return _session
+
+
+def configure_session(**options):
+    """Replace the shared session with one built from the given options"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = FirestoreSession(**options)
+        return _session
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Structured queries and field paths for the Firestore REST API
+
+Builds runQuery bodies from (field, op, value) filters and (field,
+direction) orderings the way the app's `where`/`orderBy` chains read, and
+pages through large results with cursors so they are streamed rather than
+loaded at once.
+"""
+
+import re
+
+from firestore_codec import encode_value
+
+DEFAULT_PAGE_SIZE = 500
+
+# Operators as written in the Dart/JS SDKs -> structuredQuery operators
+OPERATORS = {
+    "==": "EQUAL",
+    "!=": "NOT_EQUAL",
+    "<": "LESS_THAN",
+    "<=": "LESS_THAN_OR_EQUAL",
+    ">": "GREATER_THAN",
+    ">=": "GREATER_THAN_OR_EQUAL",
+    "array-contains": "ARRAY_CONTAINS",
+    "array-contains-any": "ARRAY_CONTAINS_ANY",
+    "in": "IN",
+    "not-in": "NOT_IN",
+}
+
+_SIMPLE_SEGMENT_RE = re.compile(r"^[A-Za-z_][A-Za-z_0-9]*$")
+
+
+class QueryError(Exception):
+    """A runQuery request failed"""
+
+
+def field_path(*segments):
+    """Dotted field path, back-quoting segments that are not plain identifiers"""
+    quoted = []
+    for segment in segments:
+        if not _SIMPLE_SEGMENT_RE.match(segment):
+            segment = "`" + segment.replace("\\", "\\\\").replace("`", "\\`") + "`"
+        quoted.append(segment)
+    return ".".join(quoted)
+
+
+def merge_mask(data, prefix=()):
+    """
+    Update mask for a set() with merge: every leaf field path of data
+
+    Nested maps are merged key by key like the SDKs do, so writing
+    {"lessonProgress": {"l1": 0.5}} leaves the other lessons untouched.
+    """
+    paths = []
+    for key, value in data.items():
+        if isinstance(value, dict) and value:
+            paths.extend(merge_mask(value, prefix + (key,)))
+        else:
+            paths.append(field_path(*prefix, key))
+    return paths
+
+
+def field_filter(path, op, value):
+    return {"fieldFilter": {"field": {"fieldPath": path}, "op": OPERATORS[op],
+                            "value": encode_value(value)}}
+
+
+def structured_query(collection, where=(), order_by=(), limit=None, all_descendants=False):
+    """
+    structuredQuery for a collection
+
+    where is a list of (field, op, value) clauses joined with AND; order_by
+    is a list of field names or (field, "desc") pairs.
+    """
+    selector = {"collectionId": collection}
+    if all_descendants:
+        selector["allDescendants"] = True
+    query = {"from": [selector]}
+    filters = [field_filter(*clause) for clause in where]
+    if len(filters) == 1:
+        query["where"] = filters[0]
+    elif filters:
+        query["where"] = {"compositeFilter": {"op": "AND", "filters": filters}}
+    orders = []
+    for order in order_by:
+        path, direction = (order, "asc") if isinstance(order, str) else order
+        orders.append({"field": {"fieldPath": path},
+                       "direction": "DESCENDING" if direction == "desc" else "ASCENDING"})
+    if orders:
+        query["orderBy"] = orders
+    if limit is not None:
+        query["limit"] = limit
+    return query
+
+
+def query_documents(response):
+    """Documents of a runQuery response; results without a document only carry a readTime"""
+    if response.status_code != 200:
+        raise QueryError(f"runQuery failed: HTTP {response.status_code} {response.text[:200]}")
+    return [item["document"] for item in response.json() if "document" in item]
+
+
+def _raw_value(document, path):
+    if path == "__name__":
+        return {"referenceValue": document["name"]}
+    value = {"mapValue": {"fields": document.get("fields", {})}}
+    for part in path.split("."):
+        value = value["mapValue"]["fields"][part.strip("`")]
+    return value
+
+
+def iter_query(query, send, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Yield every document matching a structuredQuery, one page at a time
+
+    send(body) posts a runQuery body and returns the response. The query is
+    ordered by __name__ after its own orderings so the cursor taken from the
+    last document of a page is unique; the query's own limit is ignored.
+    """
+    orders = list(query.get("orderBy", []))
+    if not any(order["field"]["fieldPath"] == "__name__" for order in orders):
+        direction = orders[-1]["direction"] if orders else "ASCENDING"
+        orders.append({"field": {"fieldPath": "__name__"}, "direction": direction})
+    cursor = None
+    while True:
+        page_query = dict(query, orderBy=orders, limit=page_size)
+        if cursor is not None:
+            page_query["startAt"] = {"values": cursor, "before": False}
+        documents = query_documents(send({"structuredQuery": page_query}))
+        yield from documents
+        if len(documents) < page_size:
+            return
+        last = documents[-1]
+        cursor = [_raw_value(last, order["field"]["fieldPath"]) for order in orders]
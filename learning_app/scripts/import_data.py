@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Stream records from a JSON Lines or JSON file into a Firestore collection
+
+Records flow through a generator pipeline (read -> map -> upload), so memory
+stays bounded no matter how large the input file is.
+
+    python import_data.py --collection courses --input courses.jsonl --batch
+    python import_data.py --collection courses --input catalog.json --array-key courses
+    python import_data.py --collection lessons --input exports/lessons-0000.jsonl.gz
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+from add_data_rest import (add_upload_arguments, finish_upload, start_upload,
+                           upload_documents, upload_settings)
+from firestore_codec import parse_timestamp
+from json_stream import iter_records
+from search_index import PREFIX_FIELDS, with_search_tokens
+
+DEFAULT_TIMESTAMP_FIELDS = ["createdAt", "updatedAt"]
+
+
+def parse_datetime(value):
+    """Parse an ISO 8601 string; values without an offset are kept naive"""
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+
+def to_document(record, id_field, timestamp_fields, now):
+    """Map one input record to a document the uploader understands"""
+    document = dict(record)
+    document["id"] = str(record[id_field])
+    for field in timestamp_fields:
+        value = document.get(field)
+        if value is None:
+            document[field] = now
+        elif isinstance(value, str):
+            document[field] = parse_datetime(value)
+    return document
+
+
+def iter_documents(records, id_field="id", timestamp_fields=DEFAULT_TIMESTAMP_FIELDS, counts=None):
+    """Lazily map records to documents, skipping records without an ID
+
+    counts, when given, is a dict whose "records" and "skipped" entries are
+    updated as records are read.
+    """
+    counts = counts if counts is not None else {}
+    counts.setdefault("records", 0)
+    counts.setdefault("skipped", 0)
+    now = datetime.now()
+    for number, record in enumerate(records, 1):
+        counts["records"] += 1
+        if not isinstance(record, dict) or record.get(id_field) in (None, ""):
+            print(f"[SKIP] Record {number} has no '{id_field}' field")
+            counts["skipped"] += 1
+            continue
+        yield to_document(record, id_field, timestamp_fields, now)
+
+
+def main(collection, input_path, fmt="auto", array_key=None, id_field="id",
+         timestamp_fields=DEFAULT_TIMESTAMP_FIELDS, search_fields=None, search_word_fields=None,
+         prune=False, **settings):
+    print(f"Importing {input_path} into {collection}...")
+    upload_options = start_upload(prune=prune, **settings)
+    records = iter_records(input_path, fmt, array_key)
+    counts = {}
+    documents = iter_documents(records, id_field, timestamp_fields, counts)
+    if search_fields or search_word_fields:
+        documents = (with_search_tokens(doc, search_fields or (), search_word_fields or ())
+                     for doc in documents)
+    failed = upload_documents(collection, documents, **upload_options)
+    all_skipped = counts["records"] and counts["skipped"] == counts["records"]
+    # Never prune after a run that saw no record IDs: it would delete the whole collection
+    failed = finish_upload(upload_options, failed,
+                           [collection] if prune and not all_skipped else [])
+    if all_skipped:
+        raise SystemExit(f"[ERROR] All {counts['records']} records were skipped and nothing was "
+                         f"imported; check --id-field (currently '{id_field}')")
+    return failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream a JSON/JSONL file into a Firestore collection")
+    parser.add_argument("--collection", required=True, help="target collection")
+    parser.add_argument("--input", required=True, help="input .json/.jsonl file (optionally .gz)")
+    parser.add_argument("--format", choices=["auto", "json", "jsonl"], default="auto",
+                        help="input format (default: from the file extension)")
+    parser.add_argument("--array-key",
+                        help="for JSON input, stream the array under this top-level key")
+    parser.add_argument("--id-field", default="id",
+                        help="record field used as the document ID (default: id)")
+    parser.add_argument("--timestamp-fields", default=",".join(DEFAULT_TIMESTAMP_FIELDS),
+                        help="comma-separated fields stored as timestamps; missing ones are set to now")
+    parser.add_argument("--search-fields",
+                        help="comma-separated fields whose word prefixes go into searchTokens "
+                             f"(courses use {','.join(PREFIX_FIELDS)})")
+    parser.add_argument("--search-word-fields",
+                        help="comma-separated fields of which only whole words go into "
+                             "searchTokens, for long text where prefixes cost too much")
+    add_upload_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    timestamp_fields = [field for field in args.timestamp_fields.split(",") if field]
+    search_fields = [field for field in (args.search_fields or "").split(",") if field]
+    search_word_fields = [field for field in (args.search_word_fields or "").split(",") if field]
+    failed = main(args.collection, args.input, fmt=args.format, array_key=args.array_key,
+                  id_field=args.id_field, timestamp_fields=timestamp_fields,
+                  search_fields=search_fields, search_word_fields=search_word_fields,
+                  **upload_settings(args))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+"""
+Offline query-to-index planner for the Flutter app and the scripts
+
+Extracts the where/orderBy chains that lib/**/*.dart builds on Firestore
+collections (including optional clauses added with `query = query.where(...)`
+inside if-blocks) and the structured_query() calls in scripts/*.py, works
+out which composite index each query shape needs, and compares that with
+firestore.indexes.json:
+
+    python index_planner.py                      # report
+    python index_planner.py --check              # exit 1 if an index is missing
+    python index_planner.py --write ../firestore.indexes.json
+
+Index rules follow Firestore: single-field indexes are automatic and several
+equality filters are served by index merging, while an equality or range
+filter combined with an orderBy on another field, or an array-contains
+combined with any other clause, needs a composite index. The planner is
+conservative for array-contains and may ask for an index merging could serve.
+"""
+
+import argparse
+import ast
+import itertools
+import json
+import os
+import re
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SOURCE_DIR = os.path.join(PROJECT_ROOT, "lib")
+DEFAULT_SCRIPT_DIR = os.path.join(PROJECT_ROOT, "scripts")
+DEFAULT_INDEX_FILE = os.path.join(PROJECT_ROOT, "firestore.indexes.json")
+
+MAX_OPTIONAL_CLAUSES = 8  # 2**8 query shapes per chain at most
+
+# Dart where() keyword -> how the filter uses an index
+WHERE_OPERATORS = {
+    "isEqualTo": "equality",
+    "isNull": "equality",
+    "whereIn": "equality",
+    "arrayContains": "array",
+    "arrayContainsAny": "array",
+    "isNotEqualTo": "range",
+    "whereNotIn": "range",
+    "isLessThan": "range",
+    "isLessThanOrEqualTo": "range",
+    "isGreaterThan": "range",
+    "isGreaterThanOrEqualTo": "range",
+}
+
+# structured_query() operator -> how the filter uses an index
+PYTHON_OPERATORS = {
+    "==": "equality",
+    "in": "equality",
+    "array-contains": "array",
+    "array-contains-any": "array",
+    "!=": "range",
+    "not-in": "range",
+    "<": "range",
+    "<=": "range",
+    ">": "range",
+    ">=": "range",
+}
+
+_CONST_RE = re.compile(r"""const\s+(?:String\s+)?(\w+)\s*=\s*['"]([^'"]+)['"]\s*;""")
+_CHAIN_START_RE = re.compile(r"\.(collection|collectionGroup)\s*\(")
+_ASSIGN_RE = re.compile(r"(\w+)\s*=\s*[\w.]+\s*$")  # `query = _firestore` before .collection(
+_WRITE_METHODS = {"doc", "add", "set", "update", "delete"}
+_STRING_RE = re.compile(r"""^\s*(?:r?'([^']*)'|r?"([^"]*)")\s*$""")
+_KEYWORD_RE = re.compile(r"(\w+)\s*:")
+_METHOD_END_RE = re.compile(r"\n  \}[ \t]*\n")
+
+
+class Query:
+    """One query shape: collection group, filters and orderBys, plus where it came from"""
+
+    def __init__(self, group, scope, clauses, location):
+        self.group = group
+        self.scope = scope
+        self.clauses = clauses  # [("where", field, kind) | ("orderBy", field, direction)]
+        self.location = location
+
+    def describe(self):
+        parts = []
+        for clause, field, detail in self.clauses:
+            parts.append(f"where({field} {detail})" if clause == "where"
+                         else f"orderBy({field} {detail.lower()})")
+        return f"{self.group}: " + (" ".join(parts) if parts else "(no clauses)")
+
+
+def line_number(source, pos):
+    return source.count("\n", 0, pos) + 1
+
+
+def read_call(source, pos):
+    """Parse `.name(args)` at pos; returns (name, args, end) or None"""
+    match = re.compile(r"\s*\.\s*(\w+)\s*\(").match(source, pos)
+    if not match:
+        return None
+    depth, i = 1, match.end()
+    quote = None
+    while i < len(source) and depth:
+        char = source[i]
+        if quote:
+            if char == "\\":
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        i += 1
+    return match.group(1), source[match.end():i - 1], i
+
+
+def read_chain(source, pos):
+    """Every consecutive .call(...) starting at pos; returns (calls, end)"""
+    calls = []
+    while True:
+        call = read_call(source, pos)
+        if call is None:
+            return calls, pos
+        calls.append(call[:2])
+        pos = call[2]
+
+
+def split_args(args):
+    """Split a Dart argument list on top-level commas"""
+    parts, depth, start, quote = [], 0, 0, None
+    for i, char in enumerate(args):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(args[start:i])
+            start = i + 1
+    parts.append(args[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def resolve(expression, constants):
+    """Value of a string literal or a const identifier, else None"""
+    match = _STRING_RE.match(expression)
+    if match:
+        return match.group(1) if match.group(1) is not None else match.group(2)
+    return constants.get(expression.strip())
+
+
+def to_clause(name, args, constants):
+    """Translate a where/orderBy call to a clause tuple (None for other calls)"""
+    if name not in ("where", "orderBy"):
+        return None
+    parts = split_args(args)
+    if not parts:
+        return None
+    field = resolve(parts[0], constants)
+    if field is None:
+        field = "__name__" if "documentId" in parts[0] else parts[0]
+    keywords = {}
+    for part in parts[1:]:
+        match = _KEYWORD_RE.match(part)
+        if match:
+            keywords[match.group(1)] = part[match.end():].strip()
+    if name == "orderBy":
+        return ("orderBy", field,
+                "DESCENDING" if keywords.get("descending") == "true" else "ASCENDING")
+    for keyword in keywords:
+        if keyword in WHERE_OPERATORS:
+            return ("where", field, WHERE_OPERATORS[keyword])
+    return None
+
+
+def chain_target(calls, constants):
+    """(group, scope, clauses) after the last collection()/collectionGroup() call"""
+    last = max(i for i, (name, _) in enumerate(calls) if name in ("collection", "collectionGroup"))
+    name, args = calls[last]
+    group = resolve(args, constants) or args.strip()
+    scope = "COLLECTION_GROUP" if name == "collectionGroup" else "COLLECTION"
+    rest = calls[last + 1:]
+    if any(call_name in _WRITE_METHODS for call_name, _ in rest):
+        return None  # a single-document read or a write
+    clauses = [clause for clause in (to_clause(n, a, constants) for n, a in rest) if clause]
+    return group, scope, clauses
+
+
+def extract_queries(source, path, constants):
+    """Every query shape built in one Dart file"""
+    queries = []
+    consumed_until = 0
+    for match in _CHAIN_START_RE.finditer(source):
+        start = match.start()
+        if start < consumed_until:
+            continue
+        calls, end = read_chain(source, start)
+        consumed_until = end
+        target = chain_target(calls, constants) if calls else None
+        if target is None:
+            continue
+        group, scope, base = target
+
+        # Optional clauses: `var = var.where(...)` later in the same method
+        optional = []
+        line_start = source.rfind("\n", 0, start) + 1
+        before = re.sub(r"\s+", " ", source[max(0, line_start - 200):start])
+        assigned = _ASSIGN_RE.search(before)
+        if assigned:
+            variable = assigned.group(1)
+            method_end = _METHOD_END_RE.search(source, end)
+            body_end = method_end.start() if method_end else len(source)
+            update_re = re.compile(rf"\b{variable}\s*=\s*{variable}(?=\s*\.)")
+            for update in update_re.finditer(source, end, body_end):
+                more, _ = read_chain(source, update.end())
+                clauses = [c for c in (to_clause(n, a, constants) for n, a in more) if c]
+                if clauses:
+                    optional.append(clauses)
+
+        location = f"{os.path.relpath(path, PROJECT_ROOT)}:{line_number(source, start)}"
+        optional = optional[:MAX_OPTIONAL_CLAUSES]
+        for mask in itertools.product([False, True], repeat=len(optional)):
+            clauses = list(base)
+            for enabled, extra in zip(mask, optional):
+                if enabled:
+                    clauses.extend(extra)
+            queries.append(Query(group, scope, clauses, location))
+    return queries
+
+
+def scan_sources(source_dir):
+    """Query shapes from every .dart file under source_dir"""
+    files = []
+    for root, _, names in os.walk(source_dir):
+        files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(".dart"))
+    sources = {}
+    constants = {}
+    for path in sorted(files):
+        with open(path, "r", encoding="utf-8") as f:
+            sources[path] = f.read()
+        constants.update(_CONST_RE.findall(sources[path]))
+    queries = []
+    for path, source in sources.items():
+        queries.extend(extract_queries(source, path, constants))
+    return queries
+
+
+def _literal(node, constants):
+    """Value of a string constant or a module-level string name, else None"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        return constants.get(node.id)
+    return None
+
+
+def _where_clause(node, constants):
+    if not isinstance(node, ast.Tuple) or len(node.elts) != 3:
+        return None
+    field, op = _literal(node.elts[0], constants), _literal(node.elts[1], constants)
+    if field is None or op not in PYTHON_OPERATORS:
+        return None
+    return ("where", field, PYTHON_OPERATORS[op])
+
+
+def _order_clause(node, constants):
+    field, direction = _literal(node, constants), "asc"
+    if isinstance(node, ast.Tuple) and len(node.elts) == 2:
+        field, direction = _literal(node.elts[0], constants), _literal(node.elts[1], constants)
+    if field is None:
+        return None
+    return ("orderBy", field, "DESCENDING" if direction == "desc" else "ASCENDING")
+
+
+class _ScriptQueryFinder(ast.NodeVisitor):
+    """structured_query() calls of one script, with clause lists resolved per function
+
+    A where list held in a variable is read from its last literal assignment
+    in the same function, and every `variable.append((...))` on it is an
+    optional clause, like the `query = query.where(...)` chains in Dart.
+    """
+
+    def __init__(self, path, constants):
+        self.path = path
+        self.constants = constants
+        self.lists = [{}]  # per function: name -> (base clause nodes, appended clause nodes)
+        self.queries = []
+
+    def visit_FunctionDef(self, node):
+        self.lists.append({})
+        for child in ast.walk(node):
+            if isinstance(child, ast.Assign) and isinstance(child.value, ast.List):
+                for target in child.targets:
+                    if isinstance(target, ast.Name):
+                        self.lists[-1][target.id] = (child.value.elts, [])
+        for child in ast.walk(node):
+            if (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                    and child.func.attr == "append" and isinstance(child.func.value, ast.Name)
+                    and child.func.value.id in self.lists[-1] and child.args):
+                self.lists[-1][child.func.value.id][1].append(child.args[0])
+        self.generic_visit(node)
+        self.lists.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def _clauses(self, node, convert):
+        """(base clauses, optional clauses) of a list argument"""
+        base, optional = [], []
+        if isinstance(node, ast.Name):
+            for scope in reversed(self.lists):
+                if node.id in scope:
+                    base, optional = scope[node.id]
+                    break
+        elif isinstance(node, (ast.List, ast.Tuple)):
+            base = node.elts
+        convert_all = lambda nodes: [c for c in (convert(n, self.constants) for n in nodes) if c]
+        return convert_all(base), [[clause] for clause in convert_all(optional)]
+
+    def visit_Call(self, node):
+        name = node.func.attr if isinstance(node.func, ast.Attribute) else getattr(node.func, "id", None)
+        if name == "structured_query" and node.args:
+            self._add(node)
+        self.generic_visit(node)
+
+    def _add(self, node):
+        arguments = dict(zip(("collection", "where", "order_by"), node.args))
+        arguments.update((keyword.arg, keyword.value) for keyword in node.keywords if keyword.arg)
+        group = _literal(arguments["collection"], self.constants)
+        if group is None:
+            return
+        descendants = arguments.get("all_descendants")
+        scope = ("COLLECTION_GROUP" if isinstance(descendants, ast.Constant) and descendants.value
+                 else "COLLECTION")
+        where, optional = self._clauses(arguments.get("where"), _where_clause)
+        orders, _ = self._clauses(arguments.get("order_by"), _order_clause)
+        location = f"{os.path.relpath(self.path, PROJECT_ROOT)}:{node.lineno}"
+        optional = optional[:MAX_OPTIONAL_CLAUSES]
+        for mask in itertools.product([False, True], repeat=len(optional)):
+            clauses = list(where)
+            for enabled, extra in zip(mask, optional):
+                if enabled:
+                    clauses.extend(extra)
+            self.queries.append(Query(group, scope, clauses + orders, location))
+
+
+def scan_scripts(script_dir):
+    """Query shapes from the structured_query() calls in every .py file under script_dir"""
+    queries = []
+    for name in sorted(os.listdir(script_dir)):
+        if not name.endswith(".py"):
+            continue
+        path = os.path.join(script_dir, name)
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+        constants = {}
+        for statement in tree.body:
+            if (isinstance(statement, ast.Assign) and isinstance(statement.value, ast.Constant)
+                    and isinstance(statement.value.value, str)):
+                for target in statement.targets:
+                    if isinstance(target, ast.Name):
+                        constants[target.id] = statement.value.value
+        finder = _ScriptQueryFinder(path, constants)
+        finder.visit(tree)
+        queries.extend(finder.queries)
+    return queries
+
+
+def required_index(query):
+    """
+    Composite index a query needs as (equality_fields, ordered_fields), or None
+
+    None means automatic single-field indexes (or index merging) serve the
+    query. equality_fields may appear in any order in the index; the
+    ordered_fields that follow are (field_path, ASCENDING/DESCENDING/CONTAINS)
+    tuples: the array-contains field, then the sort order.
+    """
+    equality, array, ranges, orders = [], [], [], []
+    for clause, field, detail in query.clauses:
+        if clause == "orderBy":
+            if field not in [f for f, _ in orders]:
+                orders.append((field, detail))
+        elif detail == "equality" and field not in equality:
+            equality.append(field)
+        elif detail == "array" and field not in array:
+            array.append(field)
+        elif detail == "range" and field not in ranges:
+            ranges.append(field)
+
+    # An orderBy on an equality field is a no-op; range fields sort first
+    orders = [(field, direction) for field, direction in orders if field not in equality]
+    ordered_fields = [field for field, _ in orders]
+    orders = [(field, "ASCENDING") for field in ranges if field not in ordered_fields] + orders
+    orders = [(field, direction) for field, direction in orders if field != "__name__"]
+
+    if array:
+        needs_composite = bool(equality or orders or len(array) > 1)
+    else:
+        needs_composite = len(orders) > 1 or (bool(orders) and bool(equality))
+    if not needs_composite:
+        return None
+    return tuple(sorted(equality)), tuple([(field, "CONTAINS") for field in array] + orders)
+
+
+def index_fields(index):
+    """(field_path, order or arrayConfig) pairs of an index, without __name__"""
+    fields = []
+    for field in index.get("fields", []):
+        if field["fieldPath"] == "__name__":
+            continue
+        fields.append((field["fieldPath"], field.get("order") or field.get("arrayConfig")))
+    return fields
+
+
+def serves(index, group, scope, required):
+    """Whether an existing index can serve a required (equality, ordered) index"""
+    if index.get("collectionGroup") != group or index.get("queryScope", "COLLECTION") != scope:
+        return False
+    equality, ordered = required
+    fields = index_fields(index)
+    if len(fields) != len(equality) + len(ordered):
+        return False
+    head, tail = fields[:len(equality)], fields[len(equality):]
+    if {field for field, _ in head} != set(equality) or any(k == "CONTAINS" for _, k in head):
+        return False
+    if tail == list(ordered):
+        return True
+    # A composite index can also be scanned in reverse
+    flip = {"ASCENDING": "DESCENDING", "DESCENDING": "ASCENDING"}
+    return tail == [(field, flip.get(kind, kind)) for field, kind in ordered]
+
+
+def plan(queries, indexes):
+    """Return (rows, missing, unused) for query shapes against a list of indexes
+
+    rows are (query, status, required) with status "automatic", "index #N"
+    or "MISSING"; missing maps (group, scope, required) to the queries that
+    need it; unused lists positions of indexes no query needs.
+    """
+    used = set()
+    missing = {}
+    rows = []
+    for query in queries:
+        required = required_index(query)
+        if required is None:
+            rows.append((query, "automatic", None))
+            continue
+        match = next((i for i, index in enumerate(indexes)
+                      if serves(index, query.group, query.scope, required)), None)
+        if match is not None:
+            used.add(match)
+            rows.append((query, f"index #{match}", required))
+        else:
+            missing.setdefault((query.group, query.scope, required), []).append(query)
+            rows.append((query, "MISSING", required))
+    unused = [i for i in range(len(indexes)) if i not in used]
+    return rows, missing, unused
+
+
+def to_index(group, scope, required):
+    """firestore.indexes.json entry for a required index"""
+    equality, ordered = required
+    fields = [{"fieldPath": field, "order": "ASCENDING"} for field in equality]
+    for field, kind in ordered:
+        key = "arrayConfig" if kind == "CONTAINS" else "order"
+        fields.append({"fieldPath": field, key: kind})
+    return {"collectionGroup": group, "queryScope": scope, "fields": fields}
+
+
+def describe_index(index):
+    fields = ", ".join(f"{field} {kind.lower()}" for field, kind in index_fields(index))
+    return f"{index['collectionGroup']} ({fields})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check app queries against firestore.indexes.json")
+    parser.add_argument("--source-dir", default=DEFAULT_SOURCE_DIR,
+                        help="directory of Dart sources to scan (default: lib/)")
+    parser.add_argument("--script-dir", default=DEFAULT_SCRIPT_DIR,
+                        help="directory of Python scripts whose structured_query() calls are "
+                             "scanned too (default: scripts/)")
+    parser.add_argument("--indexes", default=DEFAULT_INDEX_FILE,
+                        help="index file to check (default: firestore.indexes.json)")
+    parser.add_argument("--write", metavar="PATH",
+                        help="write an index file with the missing indexes added to PATH")
+    parser.add_argument("--drop-unused", action="store_true",
+                        help="with --write, leave out indexes no scanned query needs "
+                             "(other clients may still use them)")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if an index is missing")
+    parser.add_argument("--verbose", action="store_true", help="list every query shape")
+    args = parser.parse_args()
+
+    with open(args.indexes, "r", encoding="utf-8") as f:
+        index_file = json.load(f)
+    indexes = index_file.get("indexes", [])
+    queries = scan_sources(args.source_dir) + scan_scripts(args.script_dir)
+    rows, missing, unused = plan(queries, indexes)
+
+    print(f"Scanned {len(queries)} query shapes against {len(indexes)} composite indexes")
+    if args.verbose:
+        for query, status, _ in rows:
+            print(f"  [{status}] {query.describe()}  ({query.location})")
+
+    for (group, scope, required), needed_by in missing.items():
+        print(f"[MISSING] {describe_index(to_index(group, scope, required))}")
+        for query in needed_by:
+            print(f"    {query.describe()}  ({query.location})")
+    for i in unused:
+        print(f"[UNUSED] #{i} {describe_index(indexes[i])}")
+    if not missing:
+        print("[OK] Every query shape is served by an index")
+
+    if args.write:
+        kept = [index for i, index in enumerate(indexes) if not (args.drop_unused and i in unused)]
+        added = [to_index(group, scope, required) for group, scope, required in missing]
+        updated = dict(index_file, indexes=kept + added)
+        with open(args.write, "w", encoding="utf-8") as f:
+            json.dump(updated, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {len(kept) + len(added)} indexes ({len(added)} added) to {args.write}")
+
+    if args.check and missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Streaming readers for JSON Lines files and large JSON arrays
+
+Records are yielded one at a time, so memory stays bounded by the largest
+single record rather than by the size of the file.
+"""
+
+import gzip
+import json
+
+CHUNK_SIZE = 1 << 16
+_WHITESPACE = " \t\r\n"
+_NUMBER_CHARS = set("0123456789+-.eE")
+# A decode error further than this from the end of the buffer cannot be
+# explained by a value that continues in the next chunk (the longest partial
+# token is a \uXXXX escape or a literal such as "fals")
+_PARTIAL_TOKEN = 8
+_decoder = json.JSONDecoder()
+
+
+class _JsonReader:
+    """Buffered reader that decodes one JSON value at a time from a text stream"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.dropped_bytes = 0  # UTF-8 size of the text already dropped from buf
+
+    def fill(self):
+        """Drop consumed text and append the next chunk; False at end of file"""
+        if self.eof:
+            return False
+        # Read at least as much as is already buffered so a value larger than
+        # chunk_size is re-scanned a logarithmic number of times, not linearly
+        chunk = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.dropped_bytes += len(self.buf[:self.pos].encode("utf-8"))
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def offset(self, pos=None):
+        """Byte offset in the (decompressed) stream of a position in buf"""
+        pos = self.pos if pos is None else pos
+        return self.dropped_bytes + len(self.buf[:pos].encode("utf-8"))
+
+    def peek(self):
+        """Next non-whitespace character, or '' at end of file"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found or 'end of file'!r} "
+                             f"at byte {self.offset()}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value
+
+        Raises ValueError with the byte offset as soon as the input cannot be
+        valid JSON; only a value that may continue in the next chunk makes
+        the reader read further.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                truncated = (e.pos >= len(self.buf) - _PARTIAL_TOKEN
+                             or e.msg.startswith("Unterminated string"))
+                if truncated and self.fill():
+                    continue
+                raise ValueError(f"Invalid JSON at byte {self.offset(e.pos)}: {e.msg}") from None
+            # A number ending at the buffer edge (or in a partial exponent) may continue
+            # in the next chunk
+            if set(self.buf[end:]) <= _NUMBER_CHARS and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(f, array_key=None, chunk_size=CHUNK_SIZE):
+    """Yield the items of a top-level JSON array, or of the array under array_key
+
+    With array_key, the top level must be an object; members before the key
+    are decoded and discarded one at a time.
+    """
+    reader = _JsonReader(f, chunk_size)
+    if array_key is not None:
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                raise KeyError(f"No '{array_key}' array in JSON object")
+            key = reader.value()
+            reader.expect(":")
+            if key == array_key:
+                break
+            reader.value()
+            if reader.peek() == ",":
+                reader.pos += 1
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value()
+        separator = reader.peek()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' in array but found {separator or 'end of file'!r} "
+                             f"at byte {reader.offset()}")
+        reader.pos += 1
+
+
+def iter_jsonl(f):
+    """Yield one record per non-empty line of a JSON Lines stream"""
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}") from None
+
+
+def open_text(path):
+    """Open a text file for reading, transparently decompressing .gz files"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def detect_format(path):
+    """'jsonl' for .jsonl/.ndjson files (optionally gzipped), otherwise 'json'"""
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".ndjson")) else "json"
+
+
+def iter_records(path, fmt="auto", array_key=None):
+    """Stream records from a JSON Lines file or a (possibly nested) JSON array"""
+    if fmt == "auto":
+        fmt = detect_format(path)
+    with open_text(path) as f:
+        if fmt == "jsonl":
+            yield from iter_jsonl(f)
+        else:
+            yield from iter_json_array(f, array_key)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Materialized quiz analytics and leaderboards built from quiz_attempts
+
+Completed attempts are folded into one summary document per quiz
+(quiz_stats/{quizId}) holding attempt and pass counts against the quiz's
+passingScore, average score and time, per-question correct rates with the
+hardest questions, and a top-N leaderboard of learners' best attempts.
+Course documents (course_quiz_stats/{courseId}) combine the summaries of the
+course's quizzes, so a dashboard reads one small document instead of every
+attempt.
+
+Runs are incremental: attempts are read from a watermark on completedAt,
+with an allowed-lateness window for attempts saved a little after they
+finished. Each quiz summary remembers the attempts it counted inside that
+window, so re-reading the window (or re-running after a crash) never
+counts an attempt twice. --full rebuilds everything from scratch.
+
+    python quiz_analytics.py --full
+    python quiz_analytics.py             # incremental once a checkpoint exists
+"""
+
+import argparse
+import heapq
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from add_data_rest import DEFAULT_TARGET, add_target_arguments, send_writes, target_from_args
+from firestore_codec import decode_document, encode_document
+from firestore_http import configure_session
+from firestore_query import QueryError, iter_query, structured_query
+from rollup_progress import checkpoint_path, load_checkpoint, save_checkpoint
+from upload_engine import DEFAULT_CONCURRENCY, DEFAULT_RATE, UploadEngine
+
+QUIZ_STATS_COLLECTION = "quiz_stats"
+COURSE_STATS_COLLECTION = "course_quiz_stats"
+DEFAULT_PASSING_SCORE = 70
+DEFAULT_LEADERBOARD_SIZE = 10
+HARDEST_QUESTIONS = 5
+DEFAULT_LATENESS_MINUTES = 10
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _rank(entry):
+    """Leaderboard order: higher percentage first, then whoever finished earlier"""
+    return entry["percentage"], -(entry["completedAt"] - _EPOCH).total_seconds()
+
+
+class Leaderboard:
+    """Best attempt of the top-N learners, kept in a bounded min-heap
+
+    The heap root is the weakest entry, so a new attempt only has to beat
+    it to get in. A learner appears once, with their best attempt.
+    """
+
+    def __init__(self, size, entries=()):
+        self.size = size
+        self.heap = []
+        self.members = {}
+        for entry in entries:
+            self.offer(entry)
+
+    def offer(self, entry):
+        rank = _rank(entry)
+        current = self.members.get(entry["userId"])
+        if current is not None:
+            if rank > _rank(current):
+                self.members[entry["userId"]] = entry
+                self.heap = [(_rank(e), e["userId"]) for e in self.members.values()]
+                heapq.heapify(self.heap)
+            return
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, (rank, entry["userId"]))
+        elif rank > self.heap[0][0]:
+            _, evicted = heapq.heapreplace(self.heap, (rank, entry["userId"]))
+            del self.members[evicted]
+        else:
+            return
+        self.members[entry["userId"]] = entry
+
+    def entries(self):
+        return sorted(self.members.values(), key=_rank, reverse=True)
+
+
+class QuizSummary:
+    """Running totals for one quiz, mergeable with new attempts"""
+
+    def __init__(self, quiz_id, course_id, passing_score, leaderboard_size, stored=None):
+        stored = stored or {}
+        self.quiz_id = quiz_id
+        self.course_id = course_id or stored.get("courseId", "")
+        self.passing_score = passing_score
+        self.attempts = stored.get("attempts", 0)
+        self.passed = stored.get("passed", 0)
+        self.percentage_sum = float(stored.get("percentageSum", 0.0))
+        self.time_spent_sum = stored.get("timeSpentSum", 0)
+        self.questions = {qid: dict(counts) for qid, counts in stored.get("questionStats", {}).items()}
+        self.leaderboard = Leaderboard(leaderboard_size, stored.get("leaderboard", []))
+        self.watermark = stored.get("watermark")
+        self.recent = dict(stored.get("recentAttempts", {}))  # attempt ID -> completedAt
+        self.dirty = False
+
+    def seen(self, attempt_id, completed_at, lateness):
+        """Whether an attempt was already counted by an earlier run"""
+        if self.watermark is None:
+            return False
+        return attempt_id in self.recent or completed_at < self.watermark - lateness
+
+    def add(self, attempt_id, attempt):
+        percentage = attempt_percentage(attempt)
+        self.attempts += 1
+        self.passed += percentage >= self.passing_score
+        self.percentage_sum += percentage
+        self.time_spent_sum += int(attempt.get("timeSpent") or 0)
+        for answer in attempt.get("answers") or []:
+            counts = self.questions.setdefault(answer.get("questionId", ""),
+                                               {"attempts": 0, "correct": 0})
+            counts["attempts"] += 1
+            counts["correct"] += bool(answer.get("isCorrect"))
+        self.leaderboard.offer({"userId": attempt.get("userId", ""), "attemptId": attempt_id,
+                                "percentage": percentage, "score": attempt.get("score", 0),
+                                "completedAt": attempt["completedAt"]})
+        self.recent[attempt_id] = attempt["completedAt"]
+        if self.watermark is None or attempt["completedAt"] > self.watermark:
+            self.watermark = attempt["completedAt"]
+        self.dirty = True
+
+    def hardest_questions(self):
+        rates = [(counts["correct"] / counts["attempts"], -counts["attempts"], qid)
+                 for qid, counts in self.questions.items() if counts["attempts"]]
+        return [{"questionId": qid, "correctRate": round(rate, 4), "attempts": -attempts}
+                for rate, attempts, qid in heapq.nsmallest(HARDEST_QUESTIONS, rates)]
+
+    def document(self, now):
+        return {
+            "id": self.quiz_id,
+            "quizId": self.quiz_id,
+            "courseId": self.course_id,
+            "passingScore": self.passing_score,
+            "attempts": self.attempts,
+            "passed": self.passed,
+            "passRate": round(self.passed / self.attempts, 4) if self.attempts else 0.0,
+            "averagePercentage": round(self.percentage_sum / self.attempts, 2) if self.attempts else 0.0,
+            "averageTimeSpent": round(self.time_spent_sum / self.attempts, 1) if self.attempts else 0.0,
+            "percentageSum": self.percentage_sum,
+            "timeSpentSum": self.time_spent_sum,
+            "questionStats": self.questions,
+            "hardestQuestions": self.hardest_questions(),
+            "leaderboard": self.leaderboard.entries(),
+            "watermark": self.watermark,
+            "recentAttempts": self.recent,
+            "updatedAt": now,
+        }
+
+    def trim_recent(self, lateness):
+        """Forget counted attempts that fell out of the lateness window"""
+        if self.watermark is not None:
+            self.recent = {attempt_id: completed_at for attempt_id, completed_at in self.recent.items()
+                           if completed_at >= self.watermark - lateness}
+
+
+def attempt_percentage(attempt):
+    percentage = attempt.get("percentage")
+    if percentage is None:
+        total = attempt.get("totalPoints") or 0
+        percentage = attempt.get("score", 0) / total * 100 if total else 0.0
+    return float(percentage)
+
+
+def course_document(course_id, summaries, leaderboard_size, now):
+    """Course-level rollup of the quiz summaries of one course"""
+    attempts = sum(s.attempts for s in summaries)
+    passed = sum(s.passed for s in summaries)
+    percentage_sum = sum(s.percentage_sum for s in summaries)
+    board = Leaderboard(leaderboard_size)
+    for summary in summaries:
+        for entry in summary.leaderboard.entries():
+            board.offer(dict(entry, quizId=summary.quiz_id))
+    hardest = heapq.nsmallest(HARDEST_QUESTIONS, (
+        dict(question, quizId=summary.quiz_id)
+        for summary in summaries for question in summary.hardest_questions()),
+        key=lambda q: (q["correctRate"], -q["attempts"]))
+    return {
+        "id": course_id,
+        "courseId": course_id,
+        "quizzes": sorted(s.quiz_id for s in summaries),
+        "attempts": attempts,
+        "passed": passed,
+        "passRate": round(passed / attempts, 4) if attempts else 0.0,
+        "averagePercentage": round(percentage_sum / attempts, 2) if attempts else 0.0,
+        "hardestQuestions": hardest,
+        "leaderboard": board.entries(),
+        "updatedAt": now,
+    }
+
+
+def load_quizzes(send):
+    """quiz ID -> (courseId, passingScore) from the quizzes collection"""
+    quizzes = {}
+    for document in iter_query(structured_query("quizzes"), send):
+        quiz = decode_document(document)
+        quizzes[document["name"].rsplit("/", 1)[1]] = (
+            quiz.get("courseId", ""), quiz.get("passingScore", DEFAULT_PASSING_SCORE))
+    return quizzes
+
+
+def main(target=None, full=False, leaderboard_size=DEFAULT_LEADERBOARD_SIZE,
+         lateness_minutes=DEFAULT_LATENESS_MINUTES, dry_run=False,
+         concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE):
+    target = target or DEFAULT_TARGET
+    session = configure_session(pool_size=max(concurrency, 4))
+    engine = UploadEngine(concurrency=concurrency, rate=rate)
+    lateness = timedelta(minutes=lateness_minutes)
+    now = datetime.now(timezone.utc)
+    start = time.perf_counter()
+
+    def send(body):
+        return engine.send_one(body, lambda job: session.post(target.run_query_url, json=job,
+                                                               headers=target.headers))
+
+    quizzes = load_quizzes(send)
+    path = checkpoint_path(target, "quiz_stats")
+    checkpoint = None if full else load_checkpoint(path)
+    summaries = {}
+    if checkpoint is not None:
+        for document in iter_query(structured_query(QUIZ_STATS_COLLECTION), send):
+            stored = decode_document(document)
+            quiz_id = document["name"].rsplit("/", 1)[1]
+            course_id, passing_score = quizzes.get(quiz_id, ("", DEFAULT_PASSING_SCORE))
+            summaries[quiz_id] = QuizSummary(quiz_id, course_id, passing_score, leaderboard_size,
+                                             stored)
+        since = checkpoint - lateness
+        print(f"Folding in quiz attempts completed since {since.isoformat()} ({target})...")
+    else:
+        since = _EPOCH
+        print(f"Rebuilding quiz analytics from every attempt in {target}...")
+
+    query = structured_query("quiz_attempts", [("completedAt", ">=", since)], ["completedAt"])
+    read = added = skipped = 0
+    watermark = checkpoint
+    for document in iter_query(query, send):
+        read += 1
+        attempt = decode_document(document)
+        attempt_id = document["name"].rsplit("/", 1)[1]
+        quiz_id = attempt.get("quizId")
+        if not quiz_id or not isinstance(attempt.get("completedAt"), datetime):
+            skipped += 1
+            continue
+        summary = summaries.get(quiz_id)
+        if summary is None:
+            course_id, passing_score = quizzes.get(
+                quiz_id, (attempt.get("courseId", ""), DEFAULT_PASSING_SCORE))
+            summary = summaries[quiz_id] = QuizSummary(quiz_id, course_id, passing_score,
+                                                       leaderboard_size)
+        if summary.seen(attempt_id, attempt["completedAt"], lateness):
+            skipped += 1
+            continue
+        summary.add(attempt_id, attempt)
+        added += 1
+        if watermark is None or attempt["completedAt"] > watermark:
+            watermark = attempt["completedAt"]
+
+    dirty = [summary for summary in summaries.values() if summary.dirty]
+    courses = {}
+    for summary in summaries.values():
+        courses.setdefault(summary.course_id, []).append(summary)
+    dirty_courses = sorted({summary.course_id for summary in dirty if summary.course_id})
+    documents = []
+    for summary in dirty:
+        summary.trim_recent(lateness)
+        documents.append((QUIZ_STATS_COLLECTION, summary.document(now)))
+    for course_id in dirty_courses:
+        documents.append((COURSE_STATS_COLLECTION,
+                          course_document(course_id, courses[course_id], leaderboard_size, now)))
+
+    if dry_run:
+        for collection, doc in documents:
+            print(f"[DRY RUN] Would write {collection}/{doc['id']}: {doc['attempts']} attempts, "
+                  f"pass rate {doc['passRate']:.0%}, average {doc['averagePercentage']}%")
+        failed = []
+    else:
+        writes = ((f"{collection}/{doc['id']}",
+                   {"update": dict(encode_document(doc),
+                                   name=target.document_name(f"{collection}/{doc['id']}"))})
+                  for collection, doc in documents)
+        failed = send_writes(writes, atomic=True, engine=engine, target=target)
+
+    seconds = time.perf_counter() - start
+    print(f"[ANALYTICS] {read} attempts read, {added} added, {skipped} skipped; "
+          f"{len(dirty)} quiz and {len(dirty_courses)} course summaries "
+          f"{'to write' if dry_run else 'written'} in {seconds:.2f} s "
+          f"({read / seconds if seconds else 0:.1f} attempts/s)")
+    if failed:
+        print(f"[ERROR] Checkpoint not advanced; {len(failed)} writes failed: {', '.join(failed)}")
+        return 1
+    if not dry_run and watermark is not None and watermark != checkpoint:
+        save_checkpoint(path, watermark)
+        print(f"[OK] Checkpoint saved at {watermark.isoformat()}")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build quiz and course analytics from quiz_attempts")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the checkpoint and rebuild every summary from all attempts")
+    parser.add_argument("--leaderboard-size", type=int, default=DEFAULT_LEADERBOARD_SIZE,
+                        help=f"learners kept on each leaderboard (default {DEFAULT_LEADERBOARD_SIZE})")
+    parser.add_argument("--lateness-minutes", type=float, default=DEFAULT_LATENESS_MINUTES,
+                        help="how late an attempt may be saved after it completed and still count "
+                             f"(default {DEFAULT_LATENESS_MINUTES})")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the summaries that would be written without writing them")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"requests in flight (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"initial requests per second (default {DEFAULT_RATE:g})")
+    add_target_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        status = main(target=target_from_args(args), full=args.full,
+                      leaderboard_size=args.leaderboard_size,
+                      lateness_minutes=args.lateness_minutes, dry_run=args.dry_run,
+                      concurrency=args.concurrency, rate=args.rate)
+    except QueryError as e:
+        print(f"[ERROR] {e}")
+        status = 1
+    sys.exit(status)
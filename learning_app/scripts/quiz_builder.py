@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Quiz build stage: turns quizzes.json topics into Firestore quiz documents
+
+Question and option IDs are derived from the topic and question text, so a
+quiz builds to the same document no matter which process builds it or in
+which order. That lets topics be transformed in a process pool and streamed
+to the uploader as soon as each one is finished.
+"""
+
+import hashlib
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+# topic -> (course_id, lesson_id, quiz_id)
+TOPIC_TO_COURSE_MAP = {
+    "Flutter": ("flutter_basics", "flutter_quiz_lesson", "flutter_quiz"),
+    "React": ("react_advanced", "react_hooks", "react_quiz"),
+    "UI/UX": ("ui_ux_design", "ux_research", "ui_ux_quiz"),
+    "C++": ("python_ml", "ml_intro", "cpp_quiz")  # Using python_ml course for C++ as placeholder
+}
+DEFAULT_COURSE = ("flutter_basics", "flutter_intro")
+
+# How questions are stored: inside the quiz document, or in quizzes/{id}/questions
+QUIZ_LAYOUTS = ("embedded", "subcollection")
+
+QUESTION_POINTS = 10
+ID_HASH_LENGTH = 12
+
+
+def topic_mapping(topic):
+    """(course_id, lesson_id, quiz_id) for a topic; unknown topics get their own quiz ID"""
+    if topic in TOPIC_TO_COURSE_MAP:
+        return TOPIC_TO_COURSE_MAP[topic]
+    slug = re.sub(r"[^a-z0-9]+", "_", topic.lower()).strip("_") or "topic"
+    return DEFAULT_COURSE + (f"{slug}_quiz",)
+
+
+def question_id(topic, question_text):
+    """Stable question ID from the topic and the question text"""
+    digest = hashlib.sha1(f"{topic}\0{question_text}".encode("utf-8")).hexdigest()
+    return f"q_{digest[:ID_HASH_LENGTH]}"
+
+
+def build_question(question_id, data, order):
+    options = [
+        {
+            "id": f"{question_id}_opt{opt_idx}",
+            "text": option_text,
+            "isCorrect": opt_idx == data["answer_index"],
+            "order": opt_idx + 1
+        }
+        for opt_idx, option_text in enumerate(data["options"])
+    ]
+    return {
+        "id": question_id,
+        "question": data["question"],
+        "type": "multipleChoice",
+        "options": options,
+        "points": QUESTION_POINTS,
+        "order": order
+    }
+
+
+def build_questions(topic, questions):
+    """Question maps of a topic, in source order"""
+    built = []
+    seen = {}
+    for order, data in enumerate(questions, 1):
+        qid = question_id(topic, data["question"])
+        # The same question text twice in a topic gets a positional suffix
+        if qid in seen:
+            seen[qid] += 1
+            qid = f"{qid}_{seen[qid]}"
+        else:
+            seen[qid] = 1
+        built.append(build_question(qid, data, order))
+    return built
+
+
+def build_quiz(topic_data):
+    """Quiz document for one quizzes.json topic"""
+    topic = topic_data["topic"]
+    course_id, lesson_id, quiz_id = topic_mapping(topic)
+    return {
+        "id": quiz_id,
+        "courseId": course_id,
+        "lessonId": lesson_id,
+        "title": f"{topic} Quiz",
+        "description": f"Test your understanding of {topic} fundamentals.",
+        "questions": build_questions(topic, topic_data["questions"]),
+        "timeLimit": 15,
+        "passingScore": 70,
+        "maxAttempts": 3,
+        "isPublished": True,
+        "createdAt": datetime.now(),
+        "updatedAt": datetime.now()
+    }
+
+
+def build_quizzes(topics, workers=1):
+    """
+    Yield quiz documents for a stream of topics
+
+    With workers > 1 topics are built in a process pool and yielded as they
+    finish (not in input order); at most 2 * workers topics are held at once.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for topic_data in topics:
+            yield build_quiz(topic_data)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for topic_data in topics:
+            pending.add(pool.submit(build_quiz, topic_data))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def quiz_documents(quiz, layout="embedded"):
+    """
+    (collection, document) pairs to write for one built quiz
+
+    In the sub-collection layout the quiz document keeps only a questionCount
+    and each question becomes its own quizzes/{id}/questions document, which
+    LearningService reads ordered by 'order'.
+    """
+    if layout == "embedded":
+        return [("quizzes", quiz)]
+    if layout != "subcollection":
+        raise ValueError(f"Unknown quiz layout: {layout}")
+
+    quiz_doc = {key: value for key, value in quiz.items() if key != "questions"}
+    quiz_doc["questionCount"] = len(quiz["questions"])
+    questions_collection = f"quizzes/{quiz['id']}/questions"
+    entries = [("quizzes", quiz_doc)]
+    entries.extend((questions_collection, dict(question, quizId=quiz["id"]))
+                   for question in quiz["questions"])
+    return entries
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Rebuild course_progress documents from per-lesson learning_progress
+
+A full run streams learning_progress ordered by (userId, courseId), so each
+learner's course arrives as one contiguous group and only that group is held
+in memory. An incremental run first collects the (userId, courseId) pairs
+whose progress was accessed since the last checkpoint and re-reads only
+those. Every rollup is compared with the stored course_progress document
+and only the ones that differ are written, in batched :commit requests whose
+updateMask leaves enrolledAt and any other fields alone.
+
+    python rollup_progress.py --full
+    python rollup_progress.py            # incremental once a checkpoint exists
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from add_data_rest import (DEFAULT_TARGET, add_target_arguments, chunked, send_writes,
+                           target_from_args)
+from firestore_codec import decode_document, encode_document, parse_timestamp
+from firestore_http import configure_session
+from firestore_query import QueryError, iter_query, structured_query
+from seed_manifest import manifest_path
+from upload_engine import DEFAULT_CONCURRENCY, DEFAULT_RATE, UploadEngine
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".checkpoints")
+# Stored documents fetched per :batchGet when looking for changes
+LOOKUP_CHUNK = 100
+# lastAccessed is set by the client's clock, so incremental runs re-read a margin
+DEFAULT_OVERLAP_MINUTES = 10
+
+
+def checkpoint_path(target, job):
+    return manifest_path(target.project_id, target.database, emulator=bool(target.emulator_host),
+                         directory=os.path.join(CHECKPOINT_DIR, job))
+
+
+def load_checkpoint(path):
+    """Watermark saved by the last successful run, or None"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return parse_timestamp(json.load(f)["watermark"])
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, watermark):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"watermark": watermark.isoformat(),
+                   "savedAt": datetime.now(timezone.utc).isoformat()}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class LessonTotals:
+    """Published lesson count per course, from the derived course field when present"""
+
+    def __init__(self, send):
+        self.send = send
+        self.totals = {}
+        for document in iter_query(structured_query("courses"), send):
+            total = decode_document(document).get("totalLessons")
+            if total is not None:
+                self.totals[document["name"].rsplit("/", 1)[1]] = int(total)
+
+    def __call__(self, course_id):
+        if course_id not in self.totals:
+            query = structured_query("lessons", [("courseId", "==", course_id),
+                                                 ("isPublished", "==", True)])
+            self.totals[course_id] = sum(1 for _ in iter_query(query, self.send))
+        return self.totals[course_id]
+
+
+def rollup(progress_list, total_lessons):
+    """course_progress fields for one learner's course, like _updateCourseProgress computes them"""
+    completed = [p for p in progress_list if p.get("isCompleted")]
+    overall = min(1.0, len(completed) / total_lessons) if total_lessons else 0.0
+    return {
+        "totalLessons": total_lessons,
+        "completedLessons": len(completed),
+        "overallProgress": overall,
+        "totalTimeSpent": sum(int(p.get("timeSpent") or 0) for p in progress_list),
+        "isCompleted": overall >= 1.0,
+        "lessonProgress": {p["lessonId"]: float(p.get("progress") or 0.0)
+                           for p in progress_list if p.get("lessonId")},
+    }
+
+
+def _same(old, new):
+    if isinstance(new, float) or isinstance(old, float):
+        return isinstance(old, (int, float)) and math.isclose(old, new, abs_tol=1e-9)
+    if isinstance(new, dict):
+        return (isinstance(old, dict) and old.keys() == new.keys()
+                and all(_same(old[key], value) for key, value in new.items()))
+    return old == new
+
+
+def changes(stored, fields, progress_list, now):
+    """Fields of the stored document that must change; completedAt follows isCompleted"""
+    update = {key: value for key, value in fields.items() if not _same(stored.get(key), value)}
+    if fields["isCompleted"] and not stored.get("completedAt"):
+        times = [p["completedAt"] for p in progress_list if p.get("completedAt")]
+        update["completedAt"] = max(times) if times else now
+    elif not fields["isCompleted"] and stored.get("completedAt"):
+        update["completedAt"] = None
+    return update
+
+
+class RollupStats:
+    def __init__(self):
+        self.progress = 0
+        self.groups = 0
+        self.unchanged = 0
+        self.updated = 0
+        self.created = 0
+        self.watermark = None
+
+    def observe(self, progress_list):
+        self.groups += 1
+        self.progress += len(progress_list)
+        for progress in progress_list:
+            accessed = progress.get("lastAccessed")
+            if accessed and (self.watermark is None or accessed > self.watermark):
+                self.watermark = accessed
+
+
+def progress_groups(send, stats):
+    """Every (userId, courseId, progress list) from one ordered scan of learning_progress"""
+    query = structured_query("learning_progress", order_by=["userId", "courseId"])
+    documents = (decode_document(document) for document in iter_query(query, send))
+    for (user_id, course_id), group in itertools.groupby(
+            documents, key=lambda p: (p.get("userId"), p.get("courseId"))):
+        progress_list = list(group)
+        stats.observe(progress_list)
+        yield user_id, course_id, progress_list
+
+
+def changed_groups(send, since, concurrency, stats):
+    """Groups with progress accessed after since, each re-read in full"""
+    query = structured_query("learning_progress", [("lastAccessed", ">", since)], ["lastAccessed"])
+    pairs = {(p.get("userId"), p.get("courseId"))
+             for p in map(decode_document, iter_query(query, send))}
+    pairs = sorted(pair for pair in pairs if all(pair))
+    print(f"[ROLLUP] {len(pairs)} learner courses have progress since {since.isoformat()}")
+
+    def read(pair):
+        user_id, course_id = pair
+        group_query = structured_query("learning_progress", [("userId", "==", user_id),
+                                                             ("courseId", "==", course_id)])
+        return [decode_document(document) for document in iter_query(group_query, send)]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in chunked(pairs, concurrency * 4):
+            for (user_id, course_id), progress_list in zip(batch, pool.map(read, batch)):
+                stats.observe(progress_list)
+                yield user_id, course_id, progress_list
+
+
+def rollup_writes(groups, totals, fetch, target, stats, now):
+    """(key, write) pairs for the course_progress documents whose rollup differs"""
+    for chunk in chunked(groups, LOOKUP_CHUNK):
+        names = [target.document_name(f"course_progress/{user_id}_{course_id}")
+                 for user_id, course_id, _ in chunk]
+        stored = fetch(names)
+        for name, (user_id, course_id, progress_list) in zip(names, chunk):
+            fields = rollup(progress_list, totals(course_id))
+            key = f"course_progress/{user_id}_{course_id}"
+            if name not in stored:
+                accessed = [p["lastAccessed"] for p in progress_list if p.get("lastAccessed")]
+                document = dict(fields, id=f"{user_id}_{course_id}", userId=user_id,
+                                courseId=course_id, enrolledAt=min(accessed) if accessed else now)
+                document.update(changes({}, fields, progress_list, now))
+                stats.created += 1
+                yield key, {"update": dict(encode_document(document), name=name)}
+                continue
+            update = changes(stored[name], fields, progress_list, now)
+            if not update:
+                stats.unchanged += 1
+                continue
+            stats.updated += 1
+            yield key, {"update": dict(encode_document(update), name=name),
+                        "updateMask": {"fieldPaths": sorted(update)}}
+
+
+def main(target=None, full=False, overlap_minutes=DEFAULT_OVERLAP_MINUTES, dry_run=False,
+         concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE):
+    target = target or DEFAULT_TARGET
+    session = configure_session(pool_size=max(concurrency, 4))
+    engine = UploadEngine(concurrency=concurrency, rate=rate)
+    now = datetime.now(timezone.utc)
+    start = time.perf_counter()
+
+    def send(body):
+        return engine.send_one(body, lambda job: session.post(target.run_query_url, json=job,
+                                                               headers=target.headers))
+
+    def fetch(names):
+        response = engine.send_one({"documents": names}, lambda job: session.post(
+            target.batch_get_url, json=job, headers=target.headers))
+        if response.status_code != 200:
+            raise QueryError(f"batchGet failed: HTTP {response.status_code} {response.text[:200]}")
+        return {result["found"]["name"]: decode_document(result["found"])
+                for result in response.json() if "found" in result}
+
+    path = checkpoint_path(target, "course_progress")
+    watermark = None if full else load_checkpoint(path)
+    stats = RollupStats()
+    if watermark is None:
+        print(f"Rebuilding every course_progress document in {target}...")
+        groups = progress_groups(send, stats)
+    else:
+        since = watermark - timedelta(minutes=overlap_minutes)
+        print(f"Rolling up progress changed since {since.isoformat()} in {target}...")
+        groups = changed_groups(send, since, concurrency, stats)
+
+    writes = rollup_writes(groups, LessonTotals(send), fetch, target, stats, now)
+    if dry_run:
+        for key, write in writes:
+            fields = write.get("updateMask", {}).get("fieldPaths", ["(new document)"])
+            print(f"[DRY RUN] Would write {key}: {', '.join(fields)}")
+        failed = []
+    else:
+        failed = send_writes(writes, atomic=True, engine=engine, target=target)
+
+    seconds = time.perf_counter() - start
+    print(f"[ROLLUP] {stats.progress} progress documents in {stats.groups} learner courses: "
+          f"{stats.updated} updated, {stats.created} created, {stats.unchanged} unchanged, "
+          f"{len(failed)} failed in {seconds:.2f} s "
+          f"({stats.progress / seconds if seconds else 0:.1f} progress docs/s)")
+    if failed:
+        print(f"[ERROR] Checkpoint not advanced; {len(failed)} writes failed: {', '.join(failed)}")
+        return 1
+    if not dry_run and stats.watermark is not None:
+        save_checkpoint(path, max(stats.watermark, watermark) if watermark else stats.watermark)
+        print(f"[OK] Checkpoint saved at {stats.watermark.isoformat()}")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild course_progress from learning_progress")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the checkpoint and rebuild every course_progress document")
+    parser.add_argument("--overlap-minutes", type=float, default=DEFAULT_OVERLAP_MINUTES,
+                        help="re-read progress this much older than the checkpoint, for clock skew "
+                             f"(default {DEFAULT_OVERLAP_MINUTES})")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the documents that would change without writing them")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"requests in flight (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"initial requests per second (default {DEFAULT_RATE:g})")
+    add_target_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        status = main(target=target_from_args(args), full=args.full,
+                      overlap_minutes=args.overlap_minutes, dry_run=args.dry_run,
+                      concurrency=args.concurrency, rate=args.rate)
+    except QueryError as e:
+        print(f"[ERROR] {e}")
+        status = 1
+    sys.exit(status)
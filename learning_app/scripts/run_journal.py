@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Write-ahead journal that makes seeding and import runs restartable
+
+Every document a run is about to send is recorded as planned, with its
+content hash, in a per-run SQLite file, and marked acknowledged once
+Firestore has confirmed the write. Restarting with the same run ID skips
+the documents acknowledged with the same content and sends the rest again,
+including the writes that were in flight when the run stopped. Losing the
+last few acknowledgements in a crash only means those documents are
+written a second time with the same content.
+"""
+
+import atexit
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+JOURNAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".journals")
+# Acknowledgements are committed in groups; at most this many are re-sent after a crash
+COMMIT_EVERY = 500
+COMMIT_INTERVAL = 1.0  # seconds
+
+
+class JournalError(Exception):
+    """The journal cannot be used by this run (another target or another run)"""
+
+
+def new_run_id():
+    """Timestamp plus a random suffix, so runs started in the same second never share a journal"""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(4)}"
+
+
+def journal_path(run_id, name=None):
+    """Journal file of a run; name separates the targets of a fan-out run"""
+    return os.path.join(JOURNAL_DIR, f"{run_id}.{name}.sqlite" if name else f"{run_id}.sqlite")
+
+
+class RunJournal:
+    """Planned and acknowledged writes of one run, keyed by collection/doc_id
+
+    With new=True the journal file is created exclusively and the run fails
+    if it already exists, instead of resuming someone else's run.
+    """
+
+    def __init__(self, run_id, target, name=None, new=False):
+        path = journal_path(run_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if new:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except FileExistsError:
+                raise JournalError(f"{path} already exists; pass --run-id to resume that run")
+        self.run_id = run_id
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.last_commit = time.monotonic()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS writes ("
+                        "key TEXT PRIMARY KEY, hash TEXT NOT NULL, acked INTEGER NOT NULL)")
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'target'").fetchone()
+        if row is None:
+            self.db.execute("INSERT INTO meta VALUES ('target', ?)", (str(target),))
+        elif row[0] != str(target):
+            self.db.close()
+            raise JournalError(f"{path} is a run against {row[0]}, not {target}")
+        self.db.commit()
+        self.acked, self.in_flight = self.counts()
+        atexit.register(self.flush)
+
+    def counts(self):
+        """(acknowledged, planned but not acknowledged) writes in the journal"""
+        with self.lock:
+            rows = dict(self.db.execute("SELECT acked, COUNT(*) FROM writes GROUP BY acked"))
+        return rows.get(1, 0), rows.get(0, 0)
+
+    def is_acked(self, key, digest):
+        """Whether this exact content was already written by the run"""
+        with self.lock:
+            row = self.db.execute("SELECT hash, acked FROM writes WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[1] == 1 and row[0] == digest
+
+    def plan(self, key, digest):
+        with self.lock:
+            self.db.execute("INSERT INTO writes VALUES (?, ?, 0) "
+                            "ON CONFLICT(key) DO UPDATE SET hash = excluded.hash, acked = 0",
+                            (key, digest))
+            self._maybe_commit()
+
+    def ack(self, key):
+        with self.lock:
+            self.db.execute("UPDATE writes SET acked = 1 WHERE key = ?", (key,))
+            self._maybe_commit()
+
+    def _maybe_commit(self):
+        self.pending += 1
+        now = time.monotonic()
+        if self.pending >= COMMIT_EVERY or now - self.last_commit >= COMMIT_INTERVAL:
+            self.db.commit()
+            self.pending = 0
+            self.last_commit = now
+
+    def flush(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.commit()
+                self.pending = 0
+
+    def close(self, remove=False):
+        """Commit and close; remove deletes the journal once the run has fully succeeded"""
+        self.flush()
+        with self.lock:
+            if self.db is None:
+                return
+            self.db.close()
+            self.db = None
+        atexit.unregister(self.flush)
+        if remove:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Per-run performance report for Firestore REST uploads
+
+RunReport listens to every request made through the shared session and
+aggregates, per collection, throughput, payload bytes, encode time, request
+latency (histogram and percentiles), retries and an error breakdown. The
+result is written as JSON and, optionally, as a Prometheus textfile for the
+node_exporter textfile collector.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from datetime import datetime
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+RETRIED_HTTP_STATUS = {408, 429, 500, 502, 503, 504}
+# Per-write gRPC codes the seeder retries (see add_data_rest.RETRYABLE_RPC_CODES)
+RETRIED_RPC_CODES = {4, 8, 10, 13, 14}
+METRIC_PREFIX = "firestore_seed"
+
+
+def collection_of(path):
+    """Collection of a collection/doc_id path; sub-collection parents become '*'"""
+    segments = path.split("/")[:-1]
+    return "/".join("*" if i % 2 else segment for i, segment in enumerate(segments))
+
+
+def _document_path(url_or_name):
+    path = url_or_name.split("?", 1)[0]
+    return path.split("/documents/", 1)[1] if "/documents/" in path else ""
+
+
+def _write_path(write):
+    if "update" in write:
+        return _document_path(write["update"].get("name", ""))
+    return _document_path(write.get("delete", ""))
+
+
+def _error_key(response):
+    try:
+        status = response.json()["error"]["status"]
+    except (ValueError, KeyError, TypeError):
+        status = None
+    return f"HTTP {response.status_code} {status}" if status else f"HTTP {response.status_code}"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted sequence: the ceil(fraction * n)-th value"""
+    if not sorted_values:
+        return 0.0
+    # Rounding first keeps float noise (0.07 * 100 = 7.000000000000001) from adding a rank
+    rank = math.ceil(round(fraction * len(sorted_values), 9))
+    return sorted_values[min(len(sorted_values) - 1, max(0, rank - 1))]
+
+
+class CollectionStats:
+    """Counters for one collection"""
+
+    def __init__(self):
+        self.requests = 0
+        self.written = 0
+        self.deleted = 0
+        self.failed = 0
+        self.retries = 0
+        self.bytes_sent = 0.0
+        self.encode_seconds = 0.0
+        self.latencies = array("d")
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.errors = {}
+        self.first_start = None
+        self.last_end = None
+
+    def observe(self, elapsed, start, end):
+        self.latencies.append(elapsed)
+        elapsed_ms = elapsed * 1000
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        self.first_start = start if self.first_start is None else min(self.first_start, start)
+        self.last_end = end if self.last_end is None else max(self.last_end, end)
+
+    def error(self, key, count=1):
+        self.errors[key] = self.errors.get(key, 0) + count
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        duration = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        cumulative, histogram = 0, {}
+        for bound, count in zip(LATENCY_BUCKETS_MS + ("+Inf",), self.buckets):
+            cumulative += count
+            histogram[str(bound)] = cumulative
+        return {
+            "requests": self.requests,
+            "documentsWritten": self.written,
+            "documentsDeleted": self.deleted,
+            "documentsFailed": self.failed,
+            "retries": self.retries,
+            "bytesSent": int(self.bytes_sent),
+            "encodeMs": round(self.encode_seconds * 1000, 2),
+            "seconds": round(duration, 3),
+            "docsPerSecond": round(self.written / duration, 1) if duration else 0.0,
+            "latencyMs": {
+                "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+                "p50": round(percentile(latencies, 0.50) * 1000, 2),
+                "p90": round(percentile(latencies, 0.90) * 1000, 2),
+                "p99": round(percentile(latencies, 0.99) * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            },
+            "latencyHistogramMs": histogram,
+            "errors": dict(sorted(self.errors.items())),
+        }
+
+
+class RunReport:
+    """Aggregates request events of one seeding/import run"""
+
+    def __init__(self, json_path=None, prometheus_path=None):
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.started = time.time()
+        self.collections = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def stats(self, collection):
+        stats = self.collections.get(collection)
+        if stats is None:
+            stats = self.collections[collection] = CollectionStats()
+        return stats
+
+    def attach(self, session):
+        """Start receiving events from a FirestoreSession"""
+        session.add_listener(self.on_request)
+
+    def add_encode_time(self, path, seconds):
+        """Account time spent converting a document to Firestore format"""
+        with self.lock:
+            self.stats(collection_of(path)).encode_seconds += seconds
+
+    def add_failures(self, keys):
+        """Count collection/doc_id keys that still failed after every retry"""
+        with self.lock:
+            for key in keys:
+                self.stats(collection_of(key)).failed += 1
+
+    def on_request(self, event):
+        """Session listener: attribute one request to the collections it touched"""
+        end = time.perf_counter()
+        start = end - event.elapsed
+        payload = event.payload or {}
+        writes = payload.get("writes") if isinstance(payload, dict) else None
+        paths = [_write_path(write) for write in writes] if writes else [_document_path(event.url)]
+        response = event.response
+
+        # A failed request counts once per collection; a batchWrite also
+        # reports a status for each of its writes
+        request_error = None
+        write_errors = [None] * len(paths)
+        if response is None:
+            request_error = type(event.error).__name__
+        elif response.status_code != 200:
+            request_error = _error_key(response)
+        elif writes and event.url.endswith(":batchWrite"):
+            try:
+                statuses = response.json().get("status", [])
+            except ValueError:
+                statuses = []
+            for i, status in enumerate(statuses[:len(paths)]):
+                if status.get("code"):
+                    write_errors[i] = f"RPC {status['code']}"
+
+        share = 1.0 / len(paths)
+        with self.lock:
+            self.requests += 1
+            touched = set()
+            for path, write_error in zip(paths, write_errors):
+                stats = self.stats(collection_of(path))
+                stats.bytes_sent += event.body_bytes * share
+                stats.encode_seconds += event.encode_seconds * share
+                if stats not in touched:
+                    touched.add(stats)
+                    stats.requests += 1
+                    stats.observe(event.elapsed, start, end)
+                    if request_error:
+                        stats.error(request_error)
+                        stats.retries += self._retried(response, request_error)
+                if request_error:
+                    continue
+                if write_error:
+                    stats.error(write_error)
+                    stats.retries += self._retried(response, write_error)
+                elif event.method == "DELETE":
+                    stats.deleted += 1
+                elif event.method != "GET":
+                    stats.written += 1
+
+    @staticmethod
+    def _retried(response, outcome):
+        if response is None:
+            return True
+        if outcome.startswith("RPC "):
+            return int(outcome[4:]) in RETRIED_RPC_CODES
+        return response.status_code in RETRIED_HTTP_STATUS
+
+    def summary(self, session_stats=None):
+        with self.lock:
+            collections = {name: stats.summary()
+                           for name, stats in sorted(self.collections.items())}
+        elapsed = time.time() - self.started
+        written = sum(c["documentsWritten"] for c in collections.values())
+        report = {
+            "startedAt": datetime.fromtimestamp(self.started).isoformat(),
+            "seconds": round(elapsed, 3),
+            "documentsWritten": written,
+            "documentsFailed": sum(c["documentsFailed"] for c in collections.values()),
+            "requests": self.requests,
+            "docsPerSecond": round(written / elapsed, 1) if elapsed else 0.0,
+            "collections": collections,
+        }
+        if session_stats is not None:
+            report["session"] = session_stats
+        return report
+
+    def write_json(self, path, session_stats=None):
+        _write_atomic(path, json.dumps(self.summary(session_stats), indent=2))
+
+    def prometheus_text(self):
+        """The run's metrics in the Prometheus text exposition format"""
+        summary = self.summary()
+        p = METRIC_PREFIX
+        lines = [
+            f"# HELP {p}_run_seconds Wall-clock duration of the last run",
+            f"# TYPE {p}_run_seconds gauge",
+            f"{p}_run_seconds {summary['seconds']}",
+            f"# HELP {p}_run_timestamp_seconds Unix time the last run started",
+            f"# TYPE {p}_run_timestamp_seconds gauge",
+            f"{p}_run_timestamp_seconds {self.started:.3f}",
+        ]
+        metrics = [
+            ("requests_total", "counter", "REST requests sent", "requests", 1),
+            ("documents_written_total", "counter", "Documents written", "documentsWritten", 1),
+            ("documents_failed_total", "counter", "Documents that failed after retries",
+             "documentsFailed", 1),
+            ("retries_total", "counter", "Retryable errors (throttling, transient failures)", "retries", 1),
+            ("payload_bytes_total", "counter", "Request body bytes sent", "bytesSent", 1),
+            ("encode_seconds_total", "counter", "Time spent encoding documents", "encodeMs", 0.001),
+            ("documents_per_second", "gauge", "Write throughput", "docsPerSecond", 1),
+        ]
+        for name, kind, help_text, field, scale in metrics:
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            for collection, stats in summary["collections"].items():
+                lines.append(f'{p}_{name}{{collection="{collection}"}} {stats[field] * scale:g}')
+
+        lines.append(f"# HELP {p}_errors_total Error responses by kind")
+        lines.append(f"# TYPE {p}_errors_total counter")
+        for collection, stats in summary["collections"].items():
+            for error, count in stats["errors"].items():
+                lines.append(f'{p}_errors_total{{collection="{collection}",error="{error}"}} {count}')
+
+        lines.append(f"# HELP {p}_request_duration_seconds Request latency")
+        lines.append(f"# TYPE {p}_request_duration_seconds histogram")
+        with self.lock:
+            for collection, stats in sorted(self.collections.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS_MS + (None,), stats.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound is None else f"{bound / 1000:g}"
+                    lines.append(f'{p}_request_duration_seconds_bucket'
+                                 f'{{collection="{collection}",le="{le}"}} {cumulative}')
+                lines.append(f'{p}_request_duration_seconds_sum{{collection="{collection}"}} '
+                             f'{sum(stats.latencies):.6f}')
+                lines.append(f'{p}_request_duration_seconds_count{{collection="{collection}"}} '
+                             f'{len(stats.latencies)}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        _write_atomic(path, self.prometheus_text())
+
+    def save(self, session_stats=None):
+        """Write the JSON report and/or Prometheus textfile to the configured paths"""
+        if self.json_path:
+            self.write_json(self.json_path, session_stats)
+            print(f"[REPORT] Run report written to {self.json_path}")
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
+            print(f"[REPORT] Prometheus metrics written to {self.prometheus_path}")
+
+    def print_summary(self):
+        for collection, stats in self.summary()["collections"].items():
+            latency = stats["latencyMs"]
+            errors = ", ".join(f"{key}: {count}" for key, count in stats["errors"].items())
+            print(f"[REPORT] {collection}: {stats['documentsWritten']} written, "
+                  f"{stats['documentsFailed']} failed, {stats['docsPerSecond']} docs/s, "
+                  f"p50 {latency['p50']} ms, p99 {latency['p99']} ms, "
+                  f"{stats['retries']} retries" + (f" ({errors})" if errors else ""))
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
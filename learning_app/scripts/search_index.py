@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Search tokens for courses
+
+Each course gets a `searchTokens` array holding the edge n-grams (prefixes)
+of every word in its title, tags and description, so the app can find
+courses with a single `array-contains` query instead of downloading the
+whole catalog. Description prefixes about double the size of a course
+document, but indexing only whole description words lost a third of the
+matches the old substring search found. Matches that start in the middle
+of a word (e.g. "utter" in "Flutter") are still not found. Normalization
+must match `_searchTokens` in lib/services/learning_service.dart.
+"""
+
+import re
+
+PREFIX_FIELDS = ("title", "tags", "description")  # every prefix of every word is indexed
+WORD_FIELDS = ()  # only whole words are indexed
+MIN_PREFIX = 2
+MAX_PREFIX = 15  # longer query words are clipped to this length before lookup
+
+_SPLIT_RE = re.compile(r"[\W_]+")
+
+
+def words(text):
+    """Lower-cased words of a string (letters and digits only)"""
+    return [word for word in _SPLIT_RE.split(text.lower()) if word]
+
+
+def edge_ngrams(word, min_prefix=MIN_PREFIX, max_prefix=MAX_PREFIX):
+    """Prefixes of a word from min_prefix up to max_prefix characters"""
+    return [word[:n] for n in range(min_prefix, min(len(word), max_prefix) + 1)]
+
+
+def _texts(doc, field):
+    value = doc.get(field)
+    for text in value if isinstance(value, list) else [value]:
+        if isinstance(text, str):
+            yield text
+
+
+def search_tokens(doc, prefix_fields=PREFIX_FIELDS, word_fields=WORD_FIELDS,
+                  min_prefix=MIN_PREFIX, max_prefix=MAX_PREFIX):
+    """Sorted, de-duplicated search tokens for the searchable fields of a document"""
+    tokens = set()
+    for field in prefix_fields:
+        for text in _texts(doc, field):
+            for word in words(text):
+                tokens.update(edge_ngrams(word, min_prefix, max_prefix))
+    for field in word_fields:
+        for text in _texts(doc, field):
+            tokens.update(word[:max_prefix] for word in words(text) if len(word) >= min_prefix)
+    return sorted(tokens)
+
+
+def with_search_tokens(doc, prefix_fields=PREFIX_FIELDS, word_fields=WORD_FIELDS):
+    """Copy of a document with its searchTokens field filled in"""
+    return dict(doc, searchTokens=search_tokens(doc, prefix_fields, word_fields))
+
+
+def query_token(query, max_prefix=MAX_PREFIX):
+    """
+    Token to look up for a query: its longest word, clipped to max_prefix
+
+    Returns None when no word is long enough to be indexed.
+    """
+    candidates = [word for word in words(query) if len(word) >= MIN_PREFIX]
+    if not candidates:
+        return None
+    return max(candidates, key=len)[:max_prefix]
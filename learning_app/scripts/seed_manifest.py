@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Local manifest of seeded documents for incremental (idempotent) seeding
+
+Each document is fingerprinted with a stable content hash that ignores
+volatile timestamps. The manifest remembers the hash last pushed for every
+collection/doc_id of a project, so unchanged documents are never re-sent.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+MANIFEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".seed_manifests")
+
+# Fields that change on every run and must not affect the content hash
+VOLATILE_FIELDS = {"createdAt", "updatedAt"}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def content_hash(data, volatile_fields=VOLATILE_FIELDS):
+    """Stable SHA-256 of a document, ignoring volatile top-level fields"""
+    stable = {key: value for key, value in data.items() if key not in volatile_fields}
+    encoded = json.dumps(stable, sort_keys=True, separators=(",", ":"),
+                         ensure_ascii=False, default=_json_default)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def manifest_name(project_id, database="(default)", emulator=False):
+    """File name stem for the per-project state of a project/database"""
+    name = project_id if database == "(default)" else f"{project_id}__{database}"
+    return f"{name}__emulator" if emulator else name
+
+
+def manifest_path(project_id, database="(default)", emulator=False, directory=MANIFEST_DIR):
+    """Default manifest location for a project/database"""
+    return os.path.join(directory, f"{manifest_name(project_id, database, emulator)}.json")
+
+
+class SeedManifest:
+    """Hashes of the documents last pushed to one project, keyed by collection/doc_id"""
+
+    def __init__(self, path):
+        self.path = path
+        self.hashes = {}
+        self.seen = set()
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.hashes = json.load(f).get("documents", {})
+
+    def is_changed(self, key, digest):
+        """Record that key is part of this run and say whether it must be written"""
+        with self.lock:
+            self.seen.add(key)
+            return self.hashes.get(key) != digest
+
+    def record(self, key, digest):
+        """Remember a successfully written document"""
+        with self.lock:
+            self.hashes[key] = digest
+
+    def forget(self, key):
+        """Drop a document that was deleted from Firestore"""
+        with self.lock:
+            self.hashes.pop(key, None)
+
+    def saw_any(self, collection):
+        """Whether any document of a collection was part of this run"""
+        prefix = f"{collection}/"
+        with self.lock:
+            return any(key.startswith(prefix) for key in self.seen)
+
+    def removed(self, collection):
+        """Keys of a collection that were pushed before but are absent from this run"""
+        prefix = f"{collection}/"
+        with self.lock:
+            return sorted(key for key in self.hashes
+                          if key.startswith(prefix) and key not in self.seen)
+
+    def save(self):
+        """Atomically write the manifest back to disk"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self.lock:
+            payload = {"updatedAt": datetime.now().isoformat(), "documents": self.hashes}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Workload simulator that replays the app's Firestore access patterns
+
+Creates synthetic learners with enrollments, lesson progress and quiz
+attempts, then runs many virtual users as asyncio tasks. Each virtual user
+repeatedly performs one of the LearningService operations below with the
+same queries and writes the app makes, pausing for a random think time in
+between. Throughput and latency percentiles are reported per operation;
+--baseline compares a run with a saved report to catch regressions.
+
+    python fake_firestore.py --port 8085 &
+    python add_data_rest.py --emulator-host localhost:8085 --batch
+    python simulate_load.py --emulator-host localhost:8085 --users 200 --duration 60
+
+Synthetic documents use IDs starting with "sim_", so this only runs against
+an emulator (--emulator-host or $FIRESTORE_EMULATOR_HOST) unless
+--allow-remote is given for a scratch project. Never point it at production.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import random
+import sys
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from add_data_rest import (DEFAULT_TARGET, add_target_arguments, finish_upload, start_upload,
+                           target_from_args, upload_entries)
+from firestore_codec import decode_document, encode_document
+from firestore_http import DEFAULT_TIMEOUT, configure_session, get_session, httpx
+from firestore_query import iter_query, merge_mask, query_documents, structured_query
+from run_report import percentile
+
+SIM_PREFIX = "sim_"
+# Operation -> share of the virtual users' actions (LearningService method names)
+DEFAULT_MIX = {
+    "getCourseLessons": 35,
+    "getUserProgress": 25,
+    "getUserQuizAttempts": 20,
+    "updateLessonProgress": 20,
+}
+
+
+class OperationError(Exception):
+    """A request of an operation was answered with an error status"""
+
+
+def parse_mix(text):
+    """Parse "op=weight,op=weight" into a dict, checking the operation names"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}; "
+                                             f"choose from {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def load_catalog(target):
+    """Published lessons grouped by course, and quizzes, read from the target database"""
+    session = get_session()
+
+    def send(body):
+        return session.post(target.run_query_url, json=body, headers=target.headers)
+
+    lessons = {}
+    for document in iter_query(structured_query("lessons", [("isPublished", "==", True)]), send):
+        lesson = decode_document(document)
+        if lesson.get("courseId"):
+            lessons.setdefault(lesson["courseId"], []).append(document["name"].rsplit("/", 1)[1])
+    quizzes = [dict(decode_document(document), id=document["name"].rsplit("/", 1)[1])
+               for document in iter_query(structured_query("quizzes"), send)]
+    return lessons, quizzes
+
+
+def synthetic_documents(users, lessons, quizzes, enrollments, attempts, rng):
+    """(collection, document) pairs for the synthetic learners, one user at a time"""
+    now = datetime.now(timezone.utc)
+    course_ids = sorted(lessons)
+    for index in range(users):
+        user_id = f"{SIM_PREFIX}user_{index:05d}"
+        created = now - timedelta(days=rng.randint(1, 365))
+        yield "users", {"id": user_id, "email": f"{user_id}@example.com",
+                        "name": f"Sim User {index}", "role": "intern",
+                        "createdAt": created, "profileImageUrl": None}
+
+        for course_id in rng.sample(course_ids, min(enrollments, len(course_ids))):
+            course_lessons = lessons[course_id]
+            done = rng.randint(0, len(course_lessons))
+            lesson_progress, time_spent = {}, 0
+            for position, lesson_id in enumerate(course_lessons):
+                if position > done:
+                    break
+                completed = position < done
+                progress = 1.0 if completed else round(rng.random(), 2)
+                seconds = rng.randint(60, 1800)
+                accessed = now - timedelta(minutes=rng.randint(1, 60 * 24 * 30))
+                lesson_progress[lesson_id] = progress
+                time_spent += seconds
+                yield "learning_progress", {
+                    "id": f"{user_id}_{lesson_id}", "userId": user_id, "courseId": course_id,
+                    "lessonId": lesson_id, "isCompleted": completed, "timeSpent": seconds,
+                    "progress": progress, "lastAccessed": accessed,
+                    "completedAt": accessed if completed else None, "metadata": {},
+                }
+            overall = done / len(course_lessons)
+            yield "course_progress", {
+                "id": f"{user_id}_{course_id}", "userId": user_id, "courseId": course_id,
+                "totalLessons": len(course_lessons), "completedLessons": done,
+                "overallProgress": overall, "totalTimeSpent": time_spent,
+                "enrolledAt": created, "completedAt": now if overall >= 1.0 else None,
+                "isCompleted": overall >= 1.0, "lessonProgress": lesson_progress,
+            }
+
+        for number in range(attempts if quizzes else 0):
+            quiz = rng.choice(quizzes)
+            yield "quiz_attempts", attempt_document(user_id, quiz, number + 1, rng, now)
+
+
+def attempt_document(user_id, quiz, attempt_number, rng, now):
+    """A finished quiz attempt with random answers, shaped like QuizAttemptModel.toMap()"""
+    questions = quiz.get("questions") or []
+    points = [question.get("points", 10) for question in questions] or [10] * quiz.get(
+        "questionCount", 5)
+    answers = []
+    for index, question_points in enumerate(points):
+        correct = rng.random() < 0.7
+        question = questions[index] if index < len(questions) else {}
+        answers.append({"questionId": question.get("id", f"q{index}"), "selectedOptionId": None,
+                        "textAnswer": None, "selectedOptionIds": None, "isCorrect": correct,
+                        "pointsEarned": question_points if correct else 0})
+    score = sum(answer["pointsEarned"] for answer in answers)
+    total = sum(points)
+    percentage = score / total * 100 if total else 0.0
+    started = now - timedelta(minutes=rng.randint(5, 60 * 24 * 60))
+    return {
+        "id": f"{user_id}_{quiz['id']}_{attempt_number}", "userId": user_id,
+        "quizId": quiz["id"], "courseId": quiz.get("courseId", ""),
+        "lessonId": quiz.get("lessonId", ""), "answers": answers, "score": score,
+        "totalPoints": total, "percentage": percentage,
+        "passed": percentage >= quiz.get("passingScore", 70), "timeSpent": rng.randint(60, 900),
+        "startedAt": started, "completedAt": started + timedelta(minutes=rng.randint(1, 15)),
+        "attemptNumber": attempt_number,
+    }
+
+
+class AsyncFirestore:
+    """
+    Async REST calls for the virtual users
+
+    Uses httpx.AsyncClient when httpx is installed; otherwise requests run on
+    the shared keep-alive session in a thread pool with one thread per
+    connection, which caps the requests in flight at --connections.
+    """
+
+    def __init__(self, target, connections, timeout=DEFAULT_TIMEOUT):
+        self.target = target
+        self.requests = 0
+        if httpx is not None:
+            connect, read = timeout
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(max_connections=connections,
+                                    max_keepalive_connections=connections))
+            self.session = self.executor = None
+        else:
+            self.client = None
+            self.session = configure_session(pool_size=connections, timeout=timeout,
+                                             gzip_requests=False)
+            self.executor = ThreadPoolExecutor(max_workers=connections)
+
+    async def request(self, method, url, body=None, params=None):
+        self.requests += 1
+        if self.client is not None:
+            response = await self.client.request(method, url, json=body, params=params,
+                                                 headers=self.target.headers)
+        else:
+            call = functools.partial(self.session.request, method, url, json=body, params=params,
+                                     headers=self.target.headers)
+            response = await asyncio.get_running_loop().run_in_executor(self.executor, call)
+        if response.status_code != 200:
+            raise OperationError(f"HTTP {response.status_code}")
+        return response
+
+    async def run_query(self, query):
+        response = await self.request("POST", self.target.run_query_url, {"structuredQuery": query})
+        return query_documents(response)
+
+    async def set_merge(self, path, data):
+        """set(data, SetOptions(merge: true)) on a document"""
+        await self.request("PATCH", self.target.document_url(path), encode_document(data),
+                           params={"updateMask.fieldPaths": merge_mask(data)})
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+        else:
+            self.executor.shutdown()
+
+
+async def get_course_lessons(db, course_id):
+    return await db.run_query(structured_query(
+        "lessons", [("courseId", "==", course_id), ("isPublished", "==", True)], ["order"]))
+
+
+async def get_user_progress(db, user_id, course_id=None):
+    where = [("userId", "==", user_id)]
+    if course_id is not None:
+        where.append(("courseId", "==", course_id))
+    return [decode_document(document)
+            for document in await db.run_query(structured_query("learning_progress", where))]
+
+
+async def get_user_quiz_attempts(db, user_id):
+    return await db.run_query(structured_query(
+        "quiz_attempts", [("userId", "==", user_id)], [("startedAt", "desc")]))
+
+
+async def update_lesson_progress(db, user_id, course_id, lesson_id, progress, time_spent,
+                                 is_completed):
+    """Write one lesson's progress, then recompute course progress like _updateCourseProgress"""
+    now = datetime.now(timezone.utc)
+    await db.set_merge(f"learning_progress/{user_id}_{lesson_id}", {
+        "id": f"{user_id}_{lesson_id}", "userId": user_id, "courseId": course_id,
+        "lessonId": lesson_id, "isCompleted": is_completed, "timeSpent": time_spent,
+        "progress": progress, "lastAccessed": now,
+        "completedAt": now if is_completed else None, "metadata": {},
+    })
+
+    lessons = await get_course_lessons(db, course_id)
+    progress_list = await get_user_progress(db, user_id, course_id)
+    completed = sum(1 for item in progress_list if item.get("isCompleted"))
+    overall = completed / len(lessons) if lessons else 0.0
+    await db.set_merge(f"course_progress/{user_id}_{course_id}", {
+        "id": f"{user_id}_{course_id}", "userId": user_id, "courseId": course_id,
+        "totalLessons": len(lessons), "completedLessons": completed,
+        "overallProgress": overall,
+        "totalTimeSpent": sum(item.get("timeSpent", 0) for item in progress_list),
+        "enrolledAt": now, "completedAt": now if overall >= 1.0 else None,
+        "isCompleted": overall >= 1.0,
+        "lessonProgress": {item["lessonId"]: float(item.get("progress", 0.0))
+                           for item in progress_list if item.get("lessonId")},
+    })
+
+
+class OperationStats:
+    """Latencies and error counts per operation"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def observe(self, operation, elapsed, error=None):
+        if error is not None:
+            counts = self.errors.setdefault(operation, {})
+            counts[error] = counts.get(error, 0) + 1
+        else:
+            self.latencies.setdefault(operation, array("d")).append(elapsed)
+
+    def summary(self, seconds):
+        operations = {}
+        for operation in sorted(set(self.latencies) | set(self.errors)):
+            latencies = sorted(self.latencies.get(operation, ()))
+            errors = self.errors.get(operation, {})
+            operations[operation] = {
+                "ops": len(latencies),
+                "errors": sum(errors.values()),
+                "opsPerSecond": round(len(latencies) / seconds, 1) if seconds else 0.0,
+                "latencyMs": {
+                    "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+                    "p50": round(percentile(latencies, 0.50) * 1000, 2),
+                    "p90": round(percentile(latencies, 0.90) * 1000, 2),
+                    "p99": round(percentile(latencies, 0.99) * 1000, 2),
+                    "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+                },
+                "errorBreakdown": dict(sorted(errors.items())),
+            }
+        return operations
+
+
+async def virtual_user(index, user_ids, lessons, db, stats, mix, think, deadline, start_delay, seed):
+    """One simulated learner acting until the deadline"""
+    rng = random.Random(seed * 100003 + index)
+    user_id = user_ids[index % len(user_ids)]
+    course_ids = sorted(lessons)
+    operations, weights = list(mix), list(mix.values())
+    await asyncio.sleep(start_delay)
+    while time.monotonic() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        course_id = rng.choice(course_ids)
+        if operation == "getCourseLessons":
+            call = get_course_lessons(db, course_id)
+        elif operation == "getUserProgress":
+            call = get_user_progress(db, user_id)
+        elif operation == "getUserQuizAttempts":
+            call = get_user_quiz_attempts(db, user_id)
+        else:
+            completed = rng.random() < 0.5
+            call = update_lesson_progress(db, user_id, course_id, rng.choice(lessons[course_id]),
+                                          1.0 if completed else round(rng.random(), 2),
+                                          rng.randint(30, 1800), completed)
+        start = time.perf_counter()
+        try:
+            await call
+            stats.observe(operation, time.perf_counter() - start)
+        except Exception as e:
+            key = str(e) if isinstance(e, OperationError) else type(e).__name__
+            stats.observe(operation, time.perf_counter() - start, key)
+        if think:
+            await asyncio.sleep(rng.expovariate(1.0 / think))
+
+
+async def replay(target, user_ids, lessons, users, duration, ramp_up, think, connections, mix,
+                 timeout, seed):
+    db = AsyncFirestore(target, connections, timeout)
+    stats = OperationStats()
+    start = time.monotonic()
+    deadline = start + ramp_up + duration
+    try:
+        await asyncio.gather(*(
+            virtual_user(i, user_ids, lessons, db, stats, mix, think, deadline,
+                         ramp_up * i / users, seed)
+            for i in range(users)))
+    finally:
+        await db.close()
+    return stats, time.monotonic() - start, db.requests
+
+
+def print_report(report):
+    print(f"{'operation':<22} {'ops':>7} {'errors':>7} {'ops/s':>8} {'p50 ms':>8} "
+          f"{'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for operation, stats in report["operations"].items():
+        latency = stats["latencyMs"]
+        print(f"{operation:<22} {stats['ops']:>7} {stats['errors']:>7} {stats['opsPerSecond']:>8} "
+              f"{latency['p50']:>8} {latency['p90']:>8} {latency['p99']:>8} {latency['max']:>8}")
+    print(f"[LOAD] {report['virtualUsers']} virtual users, {report['requests']} requests in "
+          f"{report['seconds']} s ({report['requestsPerSecond']} requests/s)")
+
+
+def compare_with_baseline(report, baseline, max_regression):
+    """Regression messages for operations slower or less frequent than in the baseline"""
+    regressions = []
+    for operation, stats in report["operations"].items():
+        before = baseline.get("operations", {}).get(operation)
+        if not before:
+            continue
+        for quantile in ("p50", "p99"):
+            old, new = before["latencyMs"][quantile], stats["latencyMs"][quantile]
+            if old and new > old * (1 + max_regression):
+                regressions.append(f"{operation} {quantile} {old} ms -> {new} ms "
+                                   f"(+{(new / old - 1) * 100:.0f}%)")
+        old, new = before["opsPerSecond"], stats["opsPerSecond"]
+        if old and new < old * (1 - max_regression):
+            regressions.append(f"{operation} throughput {old} -> {new} ops/s "
+                               f"({(new / old - 1) * 100:.0f}%)")
+        if stats["errors"] > before.get("errors", 0):
+            regressions.append(f"{operation} errors {before.get('errors', 0)} -> {stats['errors']}")
+    return regressions
+
+
+def main(target=None, users=50, learners=None, duration=30.0, ramp_up=5.0, think=0.5,
+         connections=32, mix=DEFAULT_MIX, enrollments=2, attempts=3, skip_setup=False,
+         timeout=DEFAULT_TIMEOUT, report_path=None, baseline_path=None, max_regression=0.2,
+         seed=42, allow_remote=False):
+    target = target or DEFAULT_TARGET
+    if not target.emulator_host and not allow_remote:
+        print(f"[ERROR] Refusing to write synthetic learners to {target}; pass --emulator-host, "
+              "or --allow-remote for a scratch project")
+        return 1
+    learners = learners or users
+    rng = random.Random(seed)
+    configure_session(pool_size=connections, timeout=timeout)
+    lessons, quizzes = load_catalog(target)
+    if not lessons:
+        print(f"[ERROR] No published lessons in {target}; seed the catalog first")
+        return 1
+    user_ids = [f"{SIM_PREFIX}user_{i:05d}" for i in range(learners)]
+
+    if not skip_setup:
+        print(f"Creating {learners} synthetic learners in {target}...")
+        upload_options = start_upload(batch=True, target=target)
+        failed = upload_entries(synthetic_documents(learners, lessons, quizzes, enrollments,
+                                                    attempts, rng),
+                                label="synthetic", **upload_options)
+        if finish_upload(upload_options, failed):
+            return 1
+
+    print(f"Replaying {', '.join(f'{op} {weight:g}' for op, weight in mix.items())} with "
+          f"{users} virtual users for {duration:g} s (ramp-up {ramp_up:g} s)...")
+    stats, seconds, requests = asyncio.run(replay(target, user_ids, lessons, users, duration,
+                                                  ramp_up, think, connections, mix, timeout, seed))
+    report = {
+        "startedAt": datetime.now().isoformat(),
+        "virtualUsers": users,
+        "seconds": round(seconds, 3),
+        "requests": requests,
+        "requestsPerSecond": round(requests / seconds, 1) if seconds else 0.0,
+        "thinkSeconds": think,
+        "transport": "httpx" if httpx is not None else "requests",
+        "operations": stats.summary(seconds),
+    }
+    print_report(report)
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[REPORT] Load report written to {report_path}")
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, max_regression)
+        for message in regressions:
+            print(f"[REGRESSION] {message}")
+        if regressions:
+            return 1
+        print(f"[OK] No regressions against {baseline_path}")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay the app's Firestore workload")
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users (default 50)")
+    parser.add_argument("--learners", type=int,
+                        help="synthetic learners to create and act as (default: --users)")
+    parser.add_argument("--duration", type=float, default=30.0,
+                        help="seconds to run after ramp-up (default 30)")
+    parser.add_argument("--ramp-up", type=float, default=5.0,
+                        help="seconds over which virtual users start (default 5)")
+    parser.add_argument("--think-ms", type=float, default=500.0,
+                        help="mean pause between a user's operations (default 500)")
+    parser.add_argument("--connections", type=int, default=32,
+                        help="maximum requests in flight (default 32)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="operation weights, e.g. getCourseLessons=35,updateLessonProgress=20")
+    parser.add_argument("--enrollments", type=int, default=2,
+                        help="courses each synthetic learner is enrolled in (default 2)")
+    parser.add_argument("--attempts", type=int, default=3,
+                        help="past quiz attempts per synthetic learner (default 3)")
+    parser.add_argument("--skip-setup", action="store_true",
+                        help="reuse the synthetic learners of a previous run")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT[1],
+                        help=f"per-request read timeout in seconds (default {DEFAULT_TIMEOUT[1]:g})")
+    add_target_arguments(parser)
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="allow running against a real project instead of an emulator "
+                             "(use a scratch project, never production)")
+    parser.add_argument("--report", metavar="PATH", help="write the results as JSON to PATH")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="compare with a previous --report and exit 1 on regressions")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed slowdown/throughput loss against --baseline (default 0.2)")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.exit(main(target=target_from_args(args),
+                  users=args.users, learners=args.learners, duration=args.duration,
+                  ramp_up=args.ramp_up, think=args.think_ms / 1000, connections=args.connections,
+                  mix=args.mix, enrollments=args.enrollments, attempts=args.attempts,
+                  skip_setup=args.skip_setup, timeout=(DEFAULT_TIMEOUT[0], args.timeout),
+                  report_path=args.report, baseline_path=args.baseline,
+                  max_regression=args.max_regression, seed=args.seed,
+                  allow_remote=args.allow_remote))
@@ -0,0 +1,56 @@
+"""
+Shared fixtures: an in-process fake Firestore server and per-test state directories
+
+Run from learning_app/scripts:
+
+    python -m pytest -q tests
+"""
+
+import functools
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import add_data_rest  # noqa: E402
+import run_journal  # noqa: E402
+import seed_manifest  # noqa: E402
+from fake_firestore import start_fake_server  # noqa: E402
+from firestore_http import FirestoreTarget  # noqa: E402
+
+
+@pytest.fixture
+def fake():
+    server = start_fake_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def target(fake):
+    return FirestoreTarget("test-project", emulator_host=f"127.0.0.1:{fake.server_port}")
+
+
+@pytest.fixture(autouse=True)
+def state_dirs(tmp_path, monkeypatch):
+    """Keep journals and manifests out of the scripts directory"""
+    monkeypatch.setattr(run_journal, "JOURNAL_DIR", str(tmp_path / "journals"))
+    manifest_dir = str(tmp_path / "manifests")
+    monkeypatch.setattr(add_data_rest, "manifest_path",
+                        functools.partial(seed_manifest.manifest_path, directory=manifest_dir))
+    return tmp_path
+
+
+@pytest.fixture
+def stored(fake, target):
+    """Function returning the encoded fields of a collection in the fake server, by doc ID"""
+    def documents(collection):
+        prefix = target.document_name(f"{collection}/")
+        return {name[len(prefix):]: document["fields"]
+                for name, document in fake.fake.documents.items()
+                if name.startswith(prefix) and "/" not in name[len(prefix):]}
+    return documents
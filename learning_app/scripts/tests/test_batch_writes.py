@@ -0,0 +1,77 @@
+import pytest
+
+from add_data_rest import batch_failures, build_write, send_writes
+from upload_engine import UploadEngine
+
+BATCH = [(f"courses/c{i}", {"update": {"name": f"c{i}"}}) for i in range(3)]
+
+
+class Response:
+    def __init__(self, status_code=200, body=None, text=""):
+        self.status_code = status_code
+        self.body = body
+        self.text = text
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("not JSON")
+        return self.body
+
+
+def failed_keys(failures):
+    return [key for key, *_ in failures]
+
+
+def test_all_written():
+    assert batch_failures(BATCH, Response(body={"status": [{}, {}, {}]})) == []
+
+
+def test_failed_write_is_reported():
+    response = Response(body={"status": [{}, {"code": 9, "message": "precondition"}, {}]})
+    failures = batch_failures(BATCH, response)
+    assert failures == [("courses/c1", BATCH[1][1], "precondition", False, False)]
+
+
+def test_retryable_and_throttled_codes():
+    response = Response(body={"status": [{"code": 14}, {"code": 8}, {}]})
+    assert [(key, retryable, throttled) for key, _, _, retryable, throttled
+            in batch_failures(BATCH, response)] == [("courses/c0", True, False),
+                                                    ("courses/c1", True, True)]
+
+
+@pytest.mark.parametrize("body", [{}, {"status": None}, {"status": [{}]}])
+def test_writes_without_status_fail(body):
+    failures = batch_failures(BATCH, Response(body=body))
+    expected = [key for key, _ in BATCH][len(body.get("status") or []):]
+    assert failed_keys(failures) == expected
+    assert all(retryable for _, _, _, retryable, _ in failures)
+
+
+def test_non_json_response_fails_every_write():
+    failures = batch_failures(BATCH, Response(text="<html>"))
+    assert failed_keys(failures) == [key for key, _ in BATCH]
+    assert all(retryable for _, _, _, retryable, _ in failures)
+
+
+def test_http_errors():
+    throttled = batch_failures(BATCH, Response(429, text="slow down"))
+    assert all(retryable and is_throttled for *_, retryable, is_throttled in throttled)
+    rejected = batch_failures(BATCH, Response(400, text="bad request"))
+    assert failed_keys(rejected) == [key for key, _ in BATCH]
+    assert not any(retryable for _, _, _, retryable, _ in rejected)
+    assert failed_keys(batch_failures(BATCH, None)) == [key for key, _ in BATCH]
+
+
+def test_atomic_success():
+    assert batch_failures(BATCH, Response(body={"writeResults": []}), atomic=True) == []
+
+
+def test_send_writes_reports_only_failed_keys(target, stored):
+    writes = [(f"courses/c{i}", build_write("courses", f"c{i}", {"n": i}, target)) for i in range(3)]
+    # The second write requires a document that does not exist
+    writes[1][1]["currentDocument"] = {"exists": True}
+    written = []
+    failed = send_writes(writes, engine=UploadEngine(), on_written=written.append, target=target)
+    assert failed == ["courses/c1"]
+    assert sorted(written) == ["courses/c0", "courses/c2"]
+    assert sorted(stored("courses")) == ["c0", "c2"]
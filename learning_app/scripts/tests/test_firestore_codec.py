@@ -0,0 +1,56 @@
+import math
+from datetime import datetime, timezone
+
+import pytest
+import requests
+
+from firestore_codec import (GeoPoint, Reference, decode_document, decode_value, encode_document,
+                             encode_value)
+
+SAMPLE = {
+    "title": "Flutter Development Fundamentals",
+    "rating": 4.8,
+    "enrolledCount": 1250,
+    "isPublished": True,
+    "thumbnailUrl": None,
+    "tags": ["flutter", "dart", 3, 2.5, False],
+    "meta": {"level": {"name": "beginner", "order": 1}, "empty": {}},
+    "createdAt": datetime(2026, 10, 17, 12, 30, 5, 123456, tzinfo=timezone.utc),
+    "thumbnail": b"\x89PNG\x00\xff",
+    "location": GeoPoint(52.52, 13.405),
+    "course": Reference("projects/p/databases/(default)/documents/courses/flutter_basics"),
+    "big": 2 ** 63 - 1,
+}
+
+
+def test_round_trip():
+    assert decode_document(encode_document(SAMPLE)) == SAMPLE
+
+
+def test_round_trip_through_server(target):
+    url = target.document_url("courses/flutter_basics")
+    response = requests.patch(url, json=encode_document(SAMPLE), headers=target.headers)
+    assert response.status_code == 200
+    fetched = requests.get(url, headers=target.headers).json()
+    assert decode_document(fetched) == SAMPLE
+
+
+def test_non_finite_floats():
+    assert math.isnan(decode_value(encode_value(float("nan"))))
+    assert decode_value(encode_value(float("inf"))) == float("inf")
+    assert decode_value(encode_value(float("-inf"))) == float("-inf")
+
+
+def test_naive_datetimes_are_utc():
+    decoded = decode_value(encode_value(datetime(2026, 1, 2, 3, 4, 5)))
+    assert decoded == datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+def test_integer_overflow():
+    with pytest.raises(OverflowError):
+        encode_value(2 ** 63)
+
+
+def test_non_string_keys():
+    with pytest.raises(TypeError):
+        encode_document({1: "one"})
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+import import_data
+from add_data_rest import finish_upload, start_upload, upload_documents
+
+
+def seed(target, documents, collection="courses", prune=True, **options):
+    upload_options = start_upload(batch=True, incremental=True, prune=prune, target=target,
+                                  **options)
+    failed = upload_documents(collection, iter(documents), **upload_options)
+    return finish_upload(upload_options, failed, [collection] if prune else [])
+
+
+def batch_writes(fake):
+    return fake.fake.counts.get("POST batchWrite", 0)
+
+
+def test_only_changed_documents_are_sent(fake, target, stored):
+    documents = [{"id": "a", "n": 1}, {"id": "b", "n": 2}, {"id": "c", "n": 3}]
+    assert seed(target, documents) == []
+    assert sorted(stored("courses")) == ["a", "b", "c"]
+
+    fake.fake.documents.clear()
+    assert seed(target, documents) == []
+    assert stored("courses") == {}  # nothing changed, so nothing was re-sent
+
+    assert seed(target, [{"id": "a", "n": 1}, {"id": "b", "n": 20}, {"id": "c", "n": 3}]) == []
+    assert stored("courses") == {"b": {"id": {"stringValue": "b"}, "n": {"integerValue": "20"}}}
+
+
+def test_prune_deletes_removed_documents(target, stored):
+    seed(target, [{"id": "a"}, {"id": "b"}, {"id": "c"}])
+    assert seed(target, [{"id": "a"}, {"id": "c"}]) == []
+    assert sorted(stored("courses")) == ["a", "c"]
+
+    # b is forgotten by the manifest, so bringing it back writes it again
+    seed(target, [{"id": "a"}, {"id": "b"}, {"id": "c"}])
+    assert sorted(stored("courses")) == ["a", "b", "c"]
+
+
+def test_empty_run_never_prunes(target, stored):
+    seed(target, [{"id": "a"}, {"id": "b"}])
+    assert seed(target, []) == []
+    assert sorted(stored("courses")) == ["a", "b"]
+
+
+def test_import_with_wrong_id_field_never_prunes(target, stored, tmp_path):
+    path = tmp_path / "courses.jsonl"
+    path.write_text("".join(json.dumps({"id": doc_id}) + "\n" for doc_id in ("a1", "a2")))
+    assert import_data.main("impt", str(path), batch=True, incremental=True, prune=True,
+                            target=target) == []
+    with pytest.raises(SystemExit):
+        import_data.main("impt", str(path), id_field="key", batch=True, incremental=True,
+                         prune=True, target=target)
+    assert sorted(stored("impt")) == ["a1", "a2"]
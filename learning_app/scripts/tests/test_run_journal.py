@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from add_data_rest import finish_upload, start_upload, upload_documents
+from firestore_http import FirestoreTarget
+from run_journal import JournalError, RunJournal, new_run_id
+from seed_manifest import content_hash
+
+DOCUMENTS = [{"id": f"d{i}", "n": i} for i in range(4)]
+
+
+def test_acknowledgements_survive_reopening(target):
+    journal = RunJournal("run-1", target)
+    journal.plan("courses/a", "h1")
+    journal.ack("courses/a")
+    journal.plan("courses/b", "h2")
+    journal.close()
+
+    reopened = RunJournal("run-1", target)
+    assert (reopened.acked, reopened.in_flight) == (1, 1)
+    assert reopened.is_acked("courses/a", "h1")
+    assert not reopened.is_acked("courses/a", "changed")
+    assert not reopened.is_acked("courses/b", "h2")
+    reopened.close(remove=True)
+    assert not os.path.exists(reopened.path)
+
+
+def test_new_run_refuses_an_existing_journal(target):
+    RunJournal("run-1", target, new=True).close()
+    with pytest.raises(JournalError):
+        RunJournal("run-1", target, new=True)
+
+
+def test_journal_belongs_to_one_target(target):
+    RunJournal("run-1", target).close()
+    with pytest.raises(JournalError):
+        RunJournal("run-1", FirestoreTarget("other-project", emulator_host="127.0.0.1:1"))
+
+
+def test_generated_run_ids_are_unique():
+    assert len({new_run_id() for _ in range(100)}) == 100
+
+
+def test_resume_skips_written_documents(fake, target, stored):
+    journal = RunJournal("run-1", target)
+    for doc in DOCUMENTS[:2]:
+        journal.plan(f"courses/{doc['id']}", content_hash(doc))
+        journal.ack(f"courses/{doc['id']}")
+    journal.close()
+
+    upload_options = start_upload(batch=True, incremental=True, target=target, run_id="run-1")
+    failed = upload_documents("courses", iter(DOCUMENTS), **upload_options)
+    assert finish_upload(upload_options, failed) == []
+    assert sorted(stored("courses")) == ["d2", "d3"]
+    # The finished run removes its journal
+    assert not os.path.exists(upload_options["journal"].path)
+
+    # Documents skipped on resume are in the manifest, so the next run sends nothing
+    fake.fake.documents.clear()
+    upload_options = start_upload(batch=True, incremental=True, target=target)
+    failed = upload_documents("courses", iter(DOCUMENTS), **upload_options)
+    assert finish_upload(upload_options, failed) == []
+    assert stored("courses") == {}
+
+
+def test_upload_without_journal(target, state_dirs):
+    upload_options = start_upload(batch=True, target=target, journal=False)
+    assert upload_options["journal"] is None
+    failed = upload_documents("courses", iter(DOCUMENTS), **upload_options)
+    assert finish_upload(upload_options, failed) == []
+    assert not (state_dirs / "journals").exists()
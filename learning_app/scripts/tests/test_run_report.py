@@ -0,0 +1,23 @@
+import pytest
+
+from run_report import percentile
+
+
+@pytest.mark.parametrize("values, fraction, expected", [
+    ([1, 2, 3, 4, 5], 0.5, 3),
+    (list(range(1, 22)), 0.5, 11),
+    (list(range(1, 101)), 0.5, 50),
+    (list(range(1, 101)), 0.07, 7),
+    (list(range(1, 101)), 0.99, 99),
+    ([1, 2, 3, 4], 0.25, 1),
+    ([1, 2, 3, 4], 0.26, 2),
+    ([7], 0.99, 7),
+    ([1, 2], 0.0, 1),
+    ([1, 2], 1.0, 2),
+])
+def test_nearest_rank(values, fraction, expected):
+    assert percentile(values, fraction) == expected
+
+
+def test_empty():
+    assert percentile([], 0.5) == 0.0
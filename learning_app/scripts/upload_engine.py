@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Concurrent upload engine with token-bucket rate limiting and AIMD backoff
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+# Responses that mean "slow down" and shrink the request rate
+THROTTLE_HTTP_STATUS = {429, 503}
+# Transient errors that are retried without touching the rate
+TRANSIENT_HTTP_STATUS = {408, 500, 502, 504}
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 20.0  # requests per second to start with
+MIN_RATE = 1.0
+MAX_RATE = 500.0
+MAX_RETRIES = 6
+MAX_BACKOFF = 30.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate can be changed on the fly"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def set_rate(self, rate):
+        """Change the refill rate, keeping the tokens earned so far"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            self.capacity = max(1.0, rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def pause(self, seconds):
+        """Hand out no tokens for the given number of seconds"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class AimdController:
+    """Additive-increase / multiplicative-decrease control of a token bucket
+
+    Every success adds increase/rate to the rate, so it grows by roughly
+    `increase` requests per second for each second of clean traffic. A throttle
+    response multiplies the rate by `decrease`, at most once per `cooldown`
+    seconds so a burst of concurrent 429s only counts as one signal.
+    """
+
+    def __init__(self, bucket, min_rate=MIN_RATE, max_rate=MAX_RATE,
+                 increase=1.0, decrease=0.5, cooldown=1.0):
+        self.bucket = bucket
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+
+    def on_success(self):
+        with self.lock:
+            rate = self.bucket.rate
+            new_rate = min(self.max_rate, rate + self.increase / rate)
+        if new_rate != rate:
+            self.bucket.set_rate(new_rate)
+
+    def on_throttle(self, retry_after=None):
+        with self.lock:
+            now = time.monotonic()
+            new_rate = None
+            if now - self.last_decrease >= self.cooldown:
+                self.last_decrease = now
+                new_rate = max(self.min_rate, self.bucket.rate * self.decrease)
+        if new_rate is not None:
+            self.bucket.set_rate(new_rate)
+            print(f"[THROTTLE] Backing off to {new_rate:.1f} requests/s")
+        if retry_after:
+            self.bucket.pause(retry_after)
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def error_status(response):
+    """google.rpc status name (e.g. RESOURCE_EXHAUSTED) of an error response, or None"""
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    # runQuery reports errors as a one-element array
+    if isinstance(body, list) and body:
+        body = body[0]
+    error = body.get("error") if isinstance(body, dict) else None
+    return error.get("status") if isinstance(error, dict) else None
+
+
+def is_throttled(response):
+    """Whether a response asks the client to slow down
+
+    Only error responses count, so a successful response whose data happens
+    to contain the text RESOURCE_EXHAUSTED is never mistaken for throttling.
+    """
+    if response.status_code in THROTTLE_HTTP_STATUS:
+        return True
+    return response.status_code >= 400 and error_status(response) == "RESOURCE_EXHAUSTED"
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(MAX_BACKOFF, 0.5 * 2 ** attempt))
+
+
+class UploadEngine:
+    """Bounded worker pool that sends jobs through a shared adaptive rate limit"""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                 min_rate=MIN_RATE, max_rate=MAX_RATE, max_retries=MAX_RETRIES):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(min(max(rate, min_rate), max_rate))
+        self.controller = AimdController(self.bucket, min_rate, max_rate)
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def send_one(self, job, send):
+        """Send one job through the rate limit, retrying throttled and transient responses
+
+        Also used directly for requests that must run in sequence, such as
+        the pages of a paged read.
+        """
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                response = send(job)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                print(f"[RETRY] Request error: {e}")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            if attempt >= self.max_retries:
+                return response
+            if is_throttled(response):
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                self.controller.on_throttle(retry_after)
+                if retry_after is None:
+                    time.sleep(backoff_delay(attempt))
+            elif response.status_code in TRANSIENT_HTTP_STATUS:
+                time.sleep(backoff_delay(attempt))
+            else:
+                if response.status_code < 400:
+                    self.controller.on_success()
+                return response
+            attempt += 1
+
+    def run(self, jobs, send, on_done):
+        """Send every (key, job) pair and call on_done(key, job, response)
+
+        At most `concurrency` requests are in flight and at most twice that
+        many jobs are pulled from `jobs`, so it can be an arbitrarily long
+        generator. Requests that still raise after all retries are reported
+        to on_done with a response of None. If on_done itself raises, no new
+        jobs are started and the first such exception is re-raised once the
+        jobs in flight have finished, so no outcome is silently lost.
+        """
+        slots = threading.Semaphore(self.concurrency * 2)
+        errors = []
+
+        def work(key, job):
+            try:
+                try:
+                    response = self.send_one(job, send)
+                except Exception as e:
+                    print(f"[ERROR] Request for {key} failed: {e}")
+                    response = None
+                on_done(key, job, response)
+            except Exception as e:
+                print(f"[ERROR] Handling the response for {key} failed: {e!r}")
+                errors.append(e)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for key, job in jobs:
+                if errors:
+                    break
+                slots.acquire()
+                pool.submit(work, key, job)
+        if errors:
+            raise errors[0]